@@ -0,0 +1,57 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from src.core.models.factory import create_detection_model
+from src.core.models.model_registry import ModelRegistry
+from src.core.toml_config import TOMLConfig
+
+config = TOMLConfig(os.path.join(os.path.dirname(__file__), "config.toml"))
+benchmark_env = config.env["benchmark"]
+model_path = config.env["yolo"][benchmark_env["model"]]
+
+resources = os.path.join(os.path.dirname(__file__), "..", "..", "..", "resources")
+images = {}
+for name in benchmark_env["images"]:
+    image = cv2.imread(os.path.join(resources, name))
+    if image is None:
+        raise FileNotFoundError(f"Source path {name} does not exist.")
+    images[name] = image
+
+results = {}
+for backend in benchmark_env["backends"]:
+    config.env["yolo"]["backend"] = backend
+    start = time.perf_counter()
+    model = create_detection_model(config, model_path, benchmark_env["sliced"])
+    # 切片預測的模型呼叫時進行切片，其他模型只預測整張圖片
+    predict = model if benchmark_env["sliced"] else model.predict
+    print(f"{backend}: loaded in {time.perf_counter() - start:.2f}s")
+
+    for name, image in images.items():
+        for _ in range(benchmark_env["warmup"]):
+            predict(image)
+
+        latencies = []
+        for _ in range(benchmark_env["iterations"]):
+            start = time.perf_counter()
+            prediction_list = predict(image)
+            latencies.append((time.perf_counter() - start) * 1000)
+        results[backend, name] = (np.array(latencies), len(prediction_list))
+
+# 每張圖片每個後端的延遲（毫秒），第一個後端為比較基準
+baseline = benchmark_env["backends"][0]
+print(f"\n{'image':<14}{'backend':<14}{'mean':>8}{'p50':>8}{'p95':>8}{'boxes':>7}{'speedup':>9}")
+for name in images:
+    for backend in benchmark_env["backends"]:
+        latencies, count = results[backend, name]
+        speedup = results[baseline, name][0].mean() / latencies.mean()
+        print(
+            f"{name:<14}{backend:<14}{latencies.mean():8.1f}"
+            f"{np.percentile(latencies, 50):8.1f}{np.percentile(latencies, 95):8.1f}"
+            f"{count:7d}{speedup:8.2f}x"
+        )
+
+print()
+ModelRegistry.print_memory_report()
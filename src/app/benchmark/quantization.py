@@ -0,0 +1,90 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from src.core.models.factory import create_detection_model
+from src.core.models.metrics import as_labels, load_labels, mean_average_precision
+from src.core.models.quantization import IMAGE_EXTENSIONS, load_images
+from src.core.toml_config import TOMLConfig
+
+config = TOMLConfig(os.path.join(os.path.dirname(__file__), "config.toml"))
+quantization_env = config.env["quantization"]
+model_path = config.env["yolo"][quantization_env["model"]]
+count = quantization_env["count"]
+
+# 有標註的樣本計算mAP，否則只比較與第一個精度（FP32）的一致性
+samples = quantization_env["samples"]
+resources = os.path.join(os.path.dirname(__file__), "..", "..", "..", "resources")
+labels = None
+if samples:
+    # 圖片與標註以檔名一起讀取，無法讀取的圖片連同標註一起略過
+    image_dir = os.path.join(samples, "images")
+    names = sorted(
+        name for name in os.listdir(image_dir) if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    images, labels = [], []
+    for name in names:
+        image = cv2.imread(os.path.join(image_dir, name))
+        if image is None:
+            continue
+        images.append(image)
+        labels.append(
+            load_labels(
+                os.path.join(samples, "labels", f"{os.path.splitext(name)[0]}.txt"),
+                image.shape,
+            )
+        )
+        if len(images) == count:
+            break
+else:
+    images = list(load_images(resources, count))
+
+iou_thresholds = np.arange(0.5, 0.96, 0.05)
+config.env["yolo"]["backend"] = "onnxruntime"
+if not config.env["yolo"].get("calibration", ""):
+    # 沒有設定校正資料時，int8_static以比較用的圖片校正（結果會偏樂觀，僅供參考）
+    config.env["yolo"]["calibration"] = (
+        os.path.join(samples, "images") if samples else resources
+    )
+    if "int8_static" in quantization_env["precisions"]:
+        print(
+            f"[yolo]沒有設定calibration，int8_static改用 "
+            f"{config.env['yolo']['calibration']} 校正"
+        )
+
+print(
+    f"\n{'precision':<14}{'mean':>8}{'p95':>8}{'speedup':>9}{'RSS':>9}{'file':>9}"
+    f"{'agree50':>9}{'mAP50':>8}{'mAP50-95':>10}"
+)
+baseline_latencies, baseline_detections = None, None
+for precision in quantization_env["precisions"]:
+    config.env["yolo"]["precision"] = precision
+    model = create_detection_model(config, model_path)
+
+    model.detect(images[0])  # 預熱
+    latencies = []
+    detections = []
+    for image in images:
+        for _ in range(quantization_env["iterations"]):
+            start = time.perf_counter()
+            result = model.detect(image)
+            latencies.append((time.perf_counter() - start) * 1000)
+        detections.append(result)
+    latencies = np.array(latencies)
+
+    # 第一個精度為比較基準，每個精度量測完就輸出一行
+    if baseline_latencies is None:
+        baseline_latencies, baseline_detections = latencies, detections
+    agreement = mean_average_precision(detections, as_labels(baseline_detections))
+    line = (
+        f"{precision:<14}{latencies.mean():8.1f}{np.percentile(latencies, 95):8.1f}"
+        f"{baseline_latencies.mean() / latencies.mean():8.2f}x"
+        f"{model.handle.memory / 2 ** 20:7.1f}MB"
+        f"{os.path.getsize(model.onnx_path) / 2 ** 20:7.1f}MB{agreement:9.3f}"
+    )
+    if labels is not None:
+        line += f"{mean_average_precision(detections, labels):8.3f}"
+        line += f"{mean_average_precision(detections, labels, iou_thresholds):10.3f}"
+    print(line, flush=True)
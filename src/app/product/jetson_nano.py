@@ -8,7 +8,8 @@ from src.core.detect_crosswalk_signal.detect_crosswalk_signal import (
     DetectCrosswalkSignal,
 )
 from src.core.detect_obstacle.detect_obstacle import DetectObstacle
-from src.core.models.yolov8 import Yolov8DetectionModel
+from src.core.models.model_registry import ModelRegistry
+from src.core.models.factory import create_detection_model
 from src.core.realsense_camera.realsense_camera import RealsenseCamera
 from src.core.toml_config import TOMLConfig
 from src.utils.detect_blur import detect_blur_fft
@@ -16,10 +17,11 @@ from src.utils.detect_blur import detect_blur_fft
 config = TOMLConfig(os.path.join(os.path.dirname(__file__), "config.toml"))
 
 rs_camera = RealsenseCamera(config)
-yolov8 = Yolov8DetectionModel(config, config.env["yolo"]["cs_model"])
+yolov8 = create_detection_model(config, config.env["yolo"]["cs_model"])
 detect_obstacle = DetectObstacle(config)
 alarm = Alarm(config)
 detect_cs = DetectCrosswalkSignal(config)
+ModelRegistry.print_memory_report()
 
 last_process_frame = 0
 blurry = False
@@ -66,7 +68,7 @@ def slow_processing(c_image, d_image, n):
 
 try:
     while 1:
-        frames = rs_camera.pipeline.wait_for_frames()
+        frames = rs_camera.wait_for_frames()
         depth_frame = frames.get_depth_frame()
         color_frame = frames.get_color_frame()
 
@@ -80,13 +82,17 @@ try:
         depth_image = np.asanyarray(depth_frame.get_data())
         color_image = np.asanyarray(color_frame.get_data())
 
+        rs_camera.update_camera_height(depth_frame)
         bottom_point = rs_camera.auto_camera_height(depth_frame)
 
         detect_obstacle(depth_frame, color_image)
 
         frame_number = frames.get_frame_number()
-        slow_processing(color_image, depth_image, frame_number)
+        slow_processing(
+            color_image, rs_camera.color_depth_image(depth_image), frame_number
+        )
         print(frame_number)
 finally:
-    rs_camera.pipeline.stop()
+    rs_camera.stop()
+    detect_obstacle.stop()
     alarm.cleanup()
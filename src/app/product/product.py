@@ -11,7 +11,8 @@ from src.core.detect_crosswalk_signal.detect_crosswalk_signal import (
     DetectCrosswalkSignal,
 )
 from src.core.detect_obstacle.detect_obstacle import DetectObstacle
-from src.core.models.yolov8sahi import Yolov8SahiDetectionModel
+from src.core.models.factory import create_detection_model
+from src.core.models.model_registry import ModelRegistry
 from src.core.realsense_camera.realsense_camera import RealsenseCamera
 from src.core.toml_config import TOMLConfig
 from src.utils.detect_blur import detect_blur_fft
@@ -20,17 +21,19 @@ from src.core.detect_object.detect_object import DetectObject
 config = TOMLConfig(os.path.join(os.path.dirname(__file__), "config.toml"))
 
 rs_camera = RealsenseCamera(config)
-yolov8_sahi = Yolov8SahiDetectionModel(config, config.env["yolo"]["cs_model"])
+yolov8_sahi = create_detection_model(
+    config, config.env["yolo"]["cs_model"], sliced=True
+)
 detect_obstacle = DetectObstacle(config)
 alarm = Alarm(config)
 detect_cs = DetectCrosswalkSignal(config)
 detect_object = DetectObject(config, config.env["yolo"]["model"])
+ModelRegistry.print_memory_report()
 
 last_process_frame = 0
 blurry = False
 slow_thread = None
 finished = True
-frame_number = 0
 
 
 def slow_processing(image, n):
@@ -68,29 +71,64 @@ def slow_processing(image, n):
     slow_thread.start()
 
 
+def color_processing(frames):
+    """
+    需要彩度圖片的偵測（物件偵測與行人號誌）
+    """
+    depth_frame = frames.get_depth_frame()
+    color_frame = frames.get_color_frame()
+    if not depth_frame or not color_frame:
+        return
+
+    color_image = np.asanyarray(color_frame.get_data())
+    detect_object(color_image, depth_frame)
+    slow_processing(color_image, frames.get_frame_number())
+
+
+def color_loop():
+    # 深度與彩度分開處理時，彩度以自己的fps在另一個執行緒處理最新的一幀
+    while running:
+        try:
+            color_processing(rs_camera.wait_for_color_frames())
+        except RuntimeError:
+            continue
+
+
+running = True
+color_thread = None
+if rs_camera.split_streams:
+    color_thread = Thread(target=color_loop, daemon=True)
+    color_thread.start()
+
 try:
     while 1:
-        frames = rs_camera.pipeline.wait_for_frames()
+        frames = rs_camera.wait_for_frames()
         depth_frame = frames.get_depth_frame()
-        color_frame = frames.get_color_frame()
 
-        if not depth_frame or not color_frame:
+        if not depth_frame:
+            continue
+        # 沒有分開處理時，每一幀都需要同時有深度與彩度
+        if not rs_camera.split_streams and not frames.get_color_frame():
             continue
 
         motion = rs_camera.combined_angle(frames)
         if not motion:
             continue
 
-        depth_image = np.asanyarray(depth_frame.get_data())
-        color_image = np.asanyarray(color_frame.get_data())
-
+        rs_camera.update_camera_height(depth_frame)
         bottom_point = rs_camera.auto_camera_height(depth_frame)
 
+        # 障礙物偵測只需要深度，以深度的fps執行（彩度圖片只在除錯模式繪製時使用）
+        color_frame = frames.get_color_frame()
+        color_image = np.asanyarray(color_frame.get_data()) if color_frame else None
         detect_obstacle(depth_frame, color_image)
-        detect_object(color_image, depth_frame)
 
-        frame_number = frames.get_frame_number()
-        slow_processing(color_image, frame_number)
+        if not rs_camera.split_streams:
+            color_processing(frames)
 finally:
-    rs_camera.pipeline.stop()
+    running = False
+    rs_camera.stop()
+    if color_thread is not None:
+        color_thread.join()
+    detect_obstacle.stop()
     alarm.cleanup()
@@ -20,7 +20,7 @@ frame_number = 0
 
 try:
     while 1:
-        frames = rs_camera.pipeline.wait_for_frames()
+        frames = rs_camera.wait_for_frames()
         depth_frame = frames.get_depth_frame()
         color_frame = frames.get_color_frame()
 
@@ -31,6 +31,8 @@ try:
         if not motion:
             continue
 
+        rs_camera.update_camera_height(depth_frame)
+
         depth_image = np.asanyarray(depth_frame.get_data())
         color_image = np.asanyarray(color_frame.get_data())
 
@@ -38,5 +40,6 @@ try:
 
         frame_number = frames.get_frame_number()
 finally:
-    rs_camera.pipeline.stop()
+    rs_camera.stop()
+    detect_obstacle.stop()
     alarm.cleanup()
@@ -88,7 +88,7 @@ try:
         and cv2.getWindowProperty(dcs_window_name, cv2.WND_PROP_VISIBLE) >= 1
         and cv2.getWindowProperty(objd_window_name, cv2.WND_PROP_VISIBLE) >= 1
     ):
-        frames = rs_camera.pipeline.wait_for_frames(60 * 1000)  # timeout時間設為1分鐘
+        frames = rs_camera.wait_for_frames(60 * 1000)  # timeout時間設為1分鐘
         depth_frame = frames.get_depth_frame()
         color_frame = frames.get_color_frame()
 
@@ -99,6 +99,7 @@ try:
         if not motion:
             continue
 
+        rs_camera.update_camera_height(depth_frame)
         bottom_point, camera_height = rs_camera.auto_camera_height(depth_frame)
 
         depth_image = np.asanyarray(depth_frame.get_data())
@@ -107,13 +108,14 @@ try:
             cv2.convertScaleAbs(depth_image, alpha=0.03), cv2.COLORMAP_JET
         )
 
+        detect_obstacle(depth_frame, color_image, depth_colormap)
         (
             combined_img,
             combined_depth_colormap,
             border_img,
             elevation_view_img,
             heatmap,
-        ) = detect_obstacle(depth_frame, color_image, depth_colormap)
+        ) = detect_obstacle.debug_images()
 
         prediction_list = detect_object(color_image, depth_frame)
 
@@ -123,7 +125,9 @@ try:
             )
 
         frame_number = frames.get_frame_number()
-        slow_processing(color_image, depth_image, frame_number)
+        slow_processing(
+            color_image, rs_camera.color_depth_image(depth_image), frame_number
+        )
 
         if dcs_img is None:
             dcs_img = color_image.copy()
@@ -153,6 +157,7 @@ try:
         if key & 0xFF == ord("v"):
             detect_cs.vision_countdown(Image.fromarray(color_image))
 finally:
-    rs_camera.pipeline.stop()
+    rs_camera.stop()
+    detect_obstacle.stop()
     alarm.cleanup()
     cv2.destroyAllWindows()
@@ -90,7 +90,7 @@ def slow_processing(image, depth_image, n):
 def update_frame(main_window: Gui):
     if RealsenseCamera.instance is None:
         return
-    frames = RealsenseCamera.instance.pipeline.wait_for_frames(60 * 1000)  # timeout時間設為1分鐘
+    frames = RealsenseCamera.instance.wait_for_frames(60 * 1000)  # timeout時間設為1分鐘
     depth_frame = frames.get_depth_frame()
     color_frame = frames.get_color_frame()
 
@@ -101,6 +101,7 @@ def update_frame(main_window: Gui):
     if not motion:
         return
 
+    RealsenseCamera.instance.update_camera_height(depth_frame)
     bottom_point, camera_height = RealsenseCamera.instance.auto_camera_height(depth_frame)
     # if camera_height is not None:
     #     config.env["obstacle_detection"]["camera_height"] = camera_height
@@ -119,20 +120,24 @@ def update_frame(main_window: Gui):
         cv2.convertScaleAbs(depth_image, alpha=0.03), cv2.COLORMAP_JET
     )
 
+    detect_obstacle(depth_frame, color_image, depth_colormap)
     (
         combined_img,
         combined_depth_colormap,
         border_img,
         elevation_view_img,
         heatmap,
-    ) = detect_obstacle(depth_frame, color_image, depth_colormap)
+    ) = detect_obstacle.debug_images()
 
     prediction_list = detect_object(color_image, depth_frame)
     detect_object_img = color_image.copy()
 
     if len(prediction_list) > 0:
         detect_object_img = detect_object.draw_detections(
-            detect_object_img, prediction_list, depth_image, 0
+            detect_object_img,
+            prediction_list,
+            RealsenseCamera.instance.color_depth_image(depth_image),
+            0,
         )
 
     frame_number = frames.get_frame_number()
@@ -159,4 +164,5 @@ def update_frame(main_window: Gui):
 gui = Gui(config, update_frame)
 gui.setWindowTitle("盲人輔助系統 Blind Assistance")
 gui.show()
+app.aboutToQuit.connect(detect_obstacle.stop)
 sys.exit(app.exec_())
@@ -16,7 +16,7 @@ app = QApplication(sys.argv)
 def update_frame(main_window: Gui):
     if RealsenseCamera.instance is None:
         return
-    frames = RealsenseCamera.instance.pipeline.wait_for_frames(60 * 1000)  # timeout時間設為1分鐘
+    frames = RealsenseCamera.instance.wait_for_frames(60 * 1000)  # timeout時間設為1分鐘
     depth_frame = frames.get_depth_frame()
     color_frame = frames.get_color_frame()
     if not depth_frame or not color_frame:
@@ -0,0 +1,87 @@
+import os
+from threading import Thread
+
+import cv2
+import imutils
+import numpy as np
+
+from src.core.alarm.alarm import Alarm
+from src.core.detect_crosswalk_signal.detect_crosswalk_signal import (
+    DetectCrosswalkSignal,
+)
+from src.core.models.factory import create_detection_model
+from src.core.multi_camera.multi_camera import MultiCamera
+from src.core.toml_config import TOMLConfig
+
+config = TOMLConfig(os.path.join(os.path.dirname(__file__), "config.toml"))
+
+alarm = Alarm(config)
+# 所有攝影機共用同一個模型，權重只載入一次
+model = create_detection_model(config, config.env["yolo"]["model"])
+multi_camera = MultiCamera(config, alarm, model)
+# 行人號誌只看第一台（朝前）攝影機，播放提示音時暫停所有攝影機的障礙物警報
+yolov8_sahi = create_detection_model(
+    config, config.env["yolo"]["cs_model"], sliced=True
+)
+detect_cs = DetectCrosswalkSignal(config, multi_camera.obstacle_detectors, alarm)
+cs_thread = None
+
+
+def crosswalk_processing(image):
+    prediction_list = yolov8_sahi(image)
+    if len(prediction_list) > 0:
+        detect_cs(image, prediction_list, yolov8_sahi.category)
+    else:
+        detect_cs.invalid()
+
+
+for pipeline in multi_camera.pipelines:
+    cv2.namedWindow(pipeline.name, cv2.WINDOW_AUTOSIZE)
+
+multi_camera.start()
+
+try:
+    while all(
+        cv2.getWindowProperty(pipeline.name, cv2.WND_PROP_VISIBLE) >= 1
+        for pipeline in multi_camera.pipelines
+    ):
+        # 切片預測比較慢，在另一個執行緒處理，上一次處理完才取下一張
+        if cs_thread is None or not cs_thread.is_alive():
+            color_image = multi_camera.pipelines[0].latest_color_image()
+            if color_image is not None:
+                cs_thread = Thread(target=crosswalk_processing, args=(color_image,))
+                cs_thread.start()
+
+        for pipeline in multi_camera.pipelines:
+            images, prediction_list = pipeline.latest()
+            if images is None:
+                continue
+
+            combined_img, combined_depth_colormap = images[:2]
+            if len(prediction_list) > 0:
+                combined_img = pipeline.detect_object.draw_detections(
+                    combined_img, prediction_list
+                )
+
+            combined_depth_colormap = pipeline.camera.draw_motion(
+                combined_depth_colormap
+            )
+            cv2.imshow(
+                pipeline.name,
+                np.hstack(
+                    (
+                        imutils.resize(combined_img, height=480),
+                        imutils.resize(combined_depth_colormap, height=480),
+                    )
+                ),
+            )
+
+        key = cv2.waitKey(1)
+        if key & 0xFF == ord("q") or key == 27:
+            break
+finally:
+    multi_camera.stop()
+    if cs_thread is not None:
+        cs_thread.join()
+    alarm.cleanup()
+    cv2.destroyAllWindows()
@@ -23,7 +23,7 @@ finished = True
 
 try:
     while cv2.getWindowProperty(objd_window_name, cv2.WND_PROP_VISIBLE) >= 1:
-        frames = rs_camera.pipeline.wait_for_frames()
+        frames = rs_camera.wait_for_frames()
         depth_frame = frames.get_depth_frame()
         color_frame = frames.get_color_frame()
 
@@ -34,6 +34,7 @@ try:
         if not motion:
             continue
 
+        rs_camera.update_camera_height(depth_frame)
         bottom_point, camera_height = rs_camera.auto_camera_height(depth_frame)
 
         depth_image = np.asanyarray(depth_frame.get_data())
@@ -59,6 +60,6 @@ try:
                 "camera_height"
             ] = camera_height
 finally:
-    rs_camera.pipeline.stop()
+    rs_camera.stop()
     alarm.cleanup()
     cv2.destroyAllWindows()
@@ -20,7 +20,7 @@ rs_setting.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
 rs_setting.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
 rs_setting.enable_stream(rs.stream.accel)
 rs_setting.enable_stream(rs.stream.gyro)
-rs_camera = RealsenseCamera(config, rs_setting)
+rs_camera = RealsenseCamera(config, setting=rs_setting)
 
 detect_obstacle = DetectObstacle(config)
 alarm = Alarm(config)
@@ -40,7 +40,7 @@ try:
         and cv2.getWindowProperty(safe_area_window_name, cv2.WND_PROP_VISIBLE) >= 1
         and cv2.getWindowProperty(ev_window_name, cv2.WND_PROP_VISIBLE) >= 1
     ):
-        frames = rs_camera.pipeline.wait_for_frames()
+        frames = rs_camera.wait_for_frames()
         depth_frame = frames.get_depth_frame()
         color_frame = frames.get_color_frame()
 
@@ -57,15 +57,17 @@ try:
             cv2.convertScaleAbs(depth_image, alpha=0.03), cv2.COLORMAP_JET
         )
 
+        rs_camera.update_camera_height(depth_frame)
         bottom_point, camera_height = rs_camera.auto_camera_height(depth_frame)
 
+        detect_obstacle(depth_frame, color_image, depth_colormap)
         (
             combined_img,
             combined_depth_colormap,
             border_img,
             elevation_view_img,
             heatmap,
-        ) = detect_obstacle(depth_frame, color_image, depth_colormap)
+        ) = detect_obstacle.debug_images()
         safe_area_img = detect_obstacle.draw_border(color_image, border_img)
 
         if bottom_point:
@@ -90,6 +92,7 @@ try:
                 "camera_height"
             ] = camera_height
 finally:
-    rs_camera.pipeline.stop()
+    rs_camera.stop()
+    detect_obstacle.stop()
     alarm.cleanup()
     cv2.destroyAllWindows()
@@ -33,7 +33,7 @@ track_history = defaultdict(lambda: [])
 
 try:
     while cv2.getWindowProperty(dcs_window_name, cv2.WND_PROP_VISIBLE) >= 1:
-        frames = rs_camera.pipeline.wait_for_frames()
+        frames = rs_camera.wait_for_frames()
         depth_frame = frames.get_depth_frame()
         color_frame = frames.get_color_frame()
 
@@ -44,6 +44,7 @@ try:
         if not motion:
             continue
 
+        rs_camera.update_camera_height(depth_frame)
         bottom_point, camera_height = rs_camera.auto_camera_height(depth_frame)
 
         depth_image = np.asanyarray(depth_frame.get_data())
@@ -56,7 +57,9 @@ try:
             nearst_box = detect_cs(color_image, sahi_prediction_list, yolov8_sahi.category)
             if nearst_box is not None:
                 dcs_img = detect_cs.draw_line(dcs_img, nearst_box)
-            dcs_img = yolov8_sahi.draw_detections(dcs_img, sahi_prediction_list, depth_image)
+            dcs_img = yolov8_sahi.draw_detections(
+                dcs_img, sahi_prediction_list, rs_camera.color_depth_image(depth_image)
+            )
         else:
             detect_cs.invalid()
 
@@ -73,6 +76,6 @@ try:
         if key & 0xFF == ord("v"):
             detect_cs.vision_countdown(color_image)
 finally:
-    rs_camera.pipeline.stop()
+    rs_camera.stop()
     alarm.cleanup()
     cv2.destroyAllWindows()
@@ -35,7 +35,7 @@ threading.Thread(target=slow_processing).start()
 
 try:
     while cv2.getWindowProperty(v_window_name, cv2.WND_PROP_VISIBLE) >= 1:
-        frames = rs_camera.pipeline.wait_for_frames()
+        frames = rs_camera.wait_for_frames()
         depth_frame = frames.get_depth_frame()
         color_frame = frames.get_color_frame()
 
@@ -46,6 +46,7 @@ try:
         if not motion:
             continue
 
+        rs_camera.update_camera_height(depth_frame)
         bottom_point, camera_height = rs_camera.auto_camera_height(depth_frame)
 
         depth_image = np.asanyarray(depth_frame.get_data())
@@ -66,6 +67,6 @@ try:
                 "camera_height"
             ] = camera_height
 finally:
-    rs_camera.pipeline.stop()
+    rs_camera.stop()
     alarm.cleanup()
     cv2.destroyAllWindows()
@@ -64,7 +64,7 @@ try:
         cv2.getWindowProperty(dcs_window_name, cv2.WND_PROP_VISIBLE) >= 1
         and cv2.getWindowProperty(od_window_name, cv2.WND_PROP_VISIBLE) >= 1
     ):
-        frames = rs_camera.pipeline.wait_for_frames()
+        frames = rs_camera.wait_for_frames()
         depth_frame = frames.get_depth_frame()
         color_frame = frames.get_color_frame()
 
@@ -75,12 +75,13 @@ try:
         if not motion:
             continue
 
+        rs_camera.update_camera_height(depth_frame)
         bottom_point, camera_height = rs_camera.auto_camera_height(depth_frame)
 
         depth_image = np.asanyarray(depth_frame.get_data())
         color_image = np.asanyarray(color_frame.get_data())
 
-        slow_processing(color_image, depth_image)
+        slow_processing(color_image, rs_camera.color_depth_image(depth_image))
 
         if dcs_img is None:
             dcs_img = color_image.copy()
@@ -91,7 +92,7 @@ try:
 
         if len(prediction_list) > 0:
             yolov8_img = detect_object.draw_detections(
-                yolov8_img, prediction_list, depth_image
+                yolov8_img, prediction_list, rs_camera.color_depth_image(depth_image)
             )
 
         cv2.imshow(dcs_window_name, imutils.resize(dcs_img, height=480))
@@ -106,6 +107,6 @@ try:
                 "camera_height"
             ] = camera_height
 finally:
-    rs_camera.pipeline.stop()
+    rs_camera.stop()
     alarm.cleanup()
     cv2.destroyAllWindows()
@@ -22,6 +22,8 @@ class Alarm:
         self.duration = 1
         self.frequency = 2500
         self.loop = False
+        # 正在要求警報的來源（多台攝影機共用警報時，全部解除才停止）
+        self.sources = set()
 
         # self.pwm = buzzer.setup()
 
@@ -56,7 +58,18 @@ class Alarm:
     def speak_async(self, message: str):
         threading.Thread(target=self.speak, args=(message,)).start()
 
-    def start(self, message: str = "警報！", duration: float = 1, frequency: int = 2500):
+    def start(
+        self,
+        message: str = "警報！",
+        duration: float = 1,
+        frequency: int = 2500,
+        source: Any = None,
+    ):
+        """
+        開始警報（已在警報中時只更新訊息與間隔）
+        :param source: 要求警報的來源
+        """
+        self.sources.add(source)
         self.duration = duration
         self.frequency = frequency
         self.message = message
@@ -78,7 +91,18 @@ class Alarm:
             time.sleep(self.duration * 2)
         self.loop = False
 
-    def stop(self):
+    def stop(self, source: Any = None):
+        """
+        停止警報
+        :param source: 解除警報的來源（None為停止所有來源的警報）
+        """
+        if source is None:
+            self.sources.clear()
+        else:
+            self.sources.discard(source)
+            if self.sources:
+                return
+
         if not self.exec_status:
             return
         self.exec_status = False
@@ -1,7 +1,7 @@
 import threading
 import time
 from enum import Enum
-from typing import Any
+from typing import Any, List
 
 import cv2
 import imutils
@@ -10,7 +10,6 @@ from PIL import Image
 from .utils import find_nearest
 from ..alarm.alarm import Alarm
 from ..detect_obstacle.detect_obstacle import DetectObstacle
-from ..toml_config import TOMLConfig
 from ..vision.vision import Vision
 
 
@@ -23,10 +22,23 @@ class SignalStatus(Enum):
 class DetectCrosswalkSignal:
     instance = None
 
-    def __init__(self, config: Any):
+    def __init__(
+        self,
+        config: Any,
+        obstacle_detectors: List[DetectObstacle] = None,
+        alarm: Alarm = None,
+    ):
+        """
+        :param config: toml設定檔
+        :param obstacle_detectors: 播放提示音時要暫停警報的障礙物偵測（預設為DetectObstacle.instance）
+        :param alarm: 使用的警報（預設為Alarm.instance）
+        """
         DetectCrosswalkSignal.instance = self
 
         self.dcs_env = config.env["detect_crosswalk_signal"]
+        self.alarm_env = config.env["alarm"]
+        self.obstacle_detectors = obstacle_detectors
+        self.alarm = alarm
         self.signal_status = SignalStatus.NONE
         self.invalid_time = -1
         self.is_alarm = False
@@ -86,7 +98,7 @@ class DetectCrosswalkSignal:
         if self.signal_status == SignalStatus.NONE:
             return
 
-        if TOMLConfig.instance.env["alarm"]["tts_enable"]:
+        if self.alarm_env["tts_enable"]:
             if self.signal_status == SignalStatus.RED:
                 message = "注意前方紅燈"
             else:
@@ -139,7 +151,7 @@ class DetectCrosswalkSignal:
             self.invalid_time = -1
             self.signal_status = SignalStatus.NONE
 
-            if TOMLConfig.instance.env["alarm"]["tts_enable"]:
+            if self.alarm_env["tts_enable"]:
                 threading.Thread(target=self._speak, args=("行人號誌已離開視線",)).start()
 
             else:
@@ -152,21 +164,27 @@ class DetectCrosswalkSignal:
 
     def _speak(self, message):
         self.is_alarm = True
-        Alarm.instance.speak(message)
+        (self.alarm or Alarm.instance).speak(message)
         self.is_alarm = False
 
     def play_notes(self, *args):
-        if DetectObstacle.instance:
-            DetectObstacle.instance.pause_alarm()
+        detectors = self.obstacle_detectors
+        if detectors is None:
+            detectors = [DetectObstacle.instance] if DetectObstacle.instance else []
+
+        for detector in detectors:
+            detector.pause_alarm()
+        if detectors:
             time.sleep(0.5)
 
         notes = [note for note in args]
 
-        Alarm.instance.play_notes(notes)
+        (self.alarm or Alarm.instance).play_notes(notes)
         self.invalid_time = -1
 
-        if DetectObstacle.instance:
+        if detectors:
             time.sleep(0.5)
-            DetectObstacle.instance.resume_alarm()
+        for detector in detectors:
+            detector.resume_alarm()
 
         self.is_alarm = False
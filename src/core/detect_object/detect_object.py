@@ -10,25 +10,47 @@ from src.core.alarm.alarm import Alarm
 from src.core.detect_crosswalk_signal.detect_crosswalk_signal import DetectCrosswalkSignal
 from src.core.gui.gui import Gui
 from src.core.models.class_names import class_names
-from src.core.models.yolov8 import Yolov8DetectionModel
+from src.core.models.base import DetectionModel
+from src.core.models.factory import create_detection_model
 from src.core.realsense_camera.realsense_camera import RealsenseCamera
 from src.core.toml_config import TOMLConfig
 
-track_history = defaultdict(lambda: [])
-alarmed_objects_time = defaultdict(lambda: 0)
-
 
 class DetectObject:
-    def __init__(self, config: TOMLConfig, model_path):
+    def __init__(
+        self,
+        config: TOMLConfig,
+        model_path,
+        camera: RealsenseCamera = None,
+        model: DetectionModel = None,
+        alarm: Alarm = None,
+    ):
+        """
+        :param config: toml設定檔
+        :param model_path: 模型檔案路徑
+        :param camera: 使用的深度攝影機（預設為最後建立的RealsenseCamera）
+        :param model: 共用的物件偵測模型（多台攝影機共用時不需要重複載入權重）
+        :param alarm: 使用的警報（預設為Alarm.instance）
+        """
+        self.config = config
         self.model_path = model_path
-        self.yolov8 = Yolov8DetectionModel(config, config.env["yolo"]["model"])
+        self.yolov8 = model or create_detection_model(config, config.env["yolo"]["model"])
+        self.camera = camera
+        self.alarm = alarm
+        # 每個偵測器各自的追蹤記錄
+        self.track_history = defaultdict(lambda: [])
+        self.alarmed_objects_time = defaultdict(lambda: 0)
         self.detection_times = {}
         self.last_alarm_time = 0
         self.object_queue = []
         self.speaking = False
 
     def __call__(self, color_image, depth_frame=None):
-        prediction_list = self.yolov8(color_image, track_history)
+        track_history = self.track_history
+        alarmed_objects_time = self.alarmed_objects_time
+        camera = self.camera or RealsenseCamera.instance
+        # 以偵測器區分追蹤器，共用模型時不同攝影機的追蹤編號不會混在一起
+        prediction_list = self.yolov8(color_image, track_history, self)
         closest_object = None
 
         for class_id, box, score, track_id in prediction_list:
@@ -61,7 +83,7 @@ class DetectObject:
             object_center = (int((box[2] - box[0]) / 2 + box[0]), int((box[3] - box[1]) / 2 + box[1]))
 
             if depth_frame is not None:
-                depth_pixel = RealsenseCamera.instance.project_color_pixel_to_depth_pixel(
+                depth_pixel = camera.project_color_pixel_to_depth_pixel(
                     depth_frame.get_data(),
                     object_center)
                 if not depth_pixel:
@@ -69,8 +91,8 @@ class DetectObject:
 
                 depth_image = np.asanyarray(depth_frame.get_data())
 
-                result = RealsenseCamera.instance.depth_pixel_to_height(
-                    depth_image, depth_pixel, TOMLConfig.instance.env["obstacle_detection"]["camera_height"]
+                result = camera.depth_pixel_to_height(
+                    depth_image, depth_pixel, self.config.env["obstacle_detection"]["camera_height"]
                 )
 
                 if not result:
@@ -78,14 +100,14 @@ class DetectObject:
 
                 height, dist, lateral_dist, depth_point = result
 
-                max_dist = TOMLConfig.instance.env["detect_object"]["max_distance_threshold"]
+                max_dist = self.config.env["detect_object"]["max_distance_threshold"]
                 if dist > max_dist:
                     continue
 
                 if dist == -1:
                     continue  # 消失點不警報
 
-                max_lateral_dist = TOMLConfig.instance.env["detect_object"]["lateral_distance_threshold"]
+                max_lateral_dist = self.config.env["detect_object"]["lateral_distance_threshold"]
                 if lateral_dist < -max_lateral_dist:
                     direction = "左側方"
                 elif lateral_dist > max_lateral_dist:
@@ -138,7 +160,7 @@ class DetectObject:
         if Gui.instance is not None:
             Gui.instance.statusbar.showMessage(message)
 
-        Alarm.instance.speak(message)
+        (self.alarm or Alarm.instance).speak(message)
         self.speaking = False
         self.last_alarm_time = int(time.time() * 1000)
 
@@ -149,4 +171,7 @@ class DetectObject:
         #         center = (int(x + w / 2), int(y + h / 2))
         #         yolov8_img = cv2.circle(yolov8_img, center, 2, (0, 0, 255), -1)
 
-        return self.yolov8.draw_detections(image, prediction_list, depth_image, mask_alpha)
+        # 標籤顯示與語音提示相同的中文類別名稱
+        return self.yolov8.draw_detections(
+            image, prediction_list, depth_image, mask_alpha, class_names
+        )
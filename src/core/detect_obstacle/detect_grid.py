@@ -0,0 +1,160 @@
+import numpy as np
+
+from .utils import is_hole, is_obstacle, is_safe_area
+
+
+class DetectGrid:
+    def __init__(self, detect_points, spilt_count: int = 1, refine_factor: int = 1):
+        """
+        將偵測點攤平成陣列，方便一次計算整個網格
+        :param detect_points: init_detect_points產生的偵測點（每一列的點數可以不同）
+        :param spilt_count: 偵測點的間距（像素）
+        :param refine_factor: 粗網格的間距是細網格的幾倍（1代表不使用粗細網格）
+        """
+        self.detect_points = detect_points
+        self.shape = (
+            len(detect_points),
+            max((len(row) for row in detect_points), default=0),
+        )
+
+        points, rows, cols = [], [], []
+        for i, row in enumerate(detect_points):
+            for j, color_pixel in enumerate(row):
+                points.append(color_pixel)
+                rows.append(i)
+                cols.append(j)
+
+        self.points = np.array(points, np.int32).reshape(-1, 2)
+        self.rows = np.array(rows, np.int32)
+        self.cols = np.array(cols, np.int32)
+
+        # 偵測點在網格上的座標，以及所屬的粗網格格子（格子的四個角是粗網格的點）
+        self.refine_factor = refine_factor
+        self.lattice = self.points // spilt_count
+        self.coarse = np.all(self.lattice % refine_factor == 0, axis=1)
+        self.cells = self.lattice // refine_factor
+        self.cell_shape = tuple(self.cells.max(axis=0)[::-1] + 1) if len(self) else (0, 0)
+
+    def __len__(self):
+        return len(self.points)
+
+    @staticmethod
+    def evaluate(od_env, heights, dists, lateral_dists, valid):
+        """
+        一次判斷所有偵測點是否為坑洞、障礙物或安全區域
+        :param od_env: 障礙物偵測設定
+        :param heights: 高度
+        :param dists: 水平距離
+        :param lateral_dists: 橫向距離
+        :param valid: 有取得深度資料的偵測點
+        :return: 坑洞、障礙物與安全區域的遮罩
+        """
+        measured = valid & (dists > 0)
+        holes = measured & is_hole(od_env, heights, lateral_dists)
+        obstacles = measured & is_obstacle(od_env, heights, dists, lateral_dists)
+        safe = measured & ~holes & ~obstacles & is_safe_area(od_env, heights)
+        return holes, obstacles, safe
+
+    def heatmap(self, holes, obstacles):
+        """
+        產生熱力圖資料（坑洞為1，障礙物為0.5，兩者皆是時以障礙物為準）
+        """
+        heatmap_data = np.zeros(self.shape)
+        heatmap_data[self.rows[holes], self.cols[holes]] = 1
+        heatmap_data[self.rows[obstacles], self.cols[obstacles]] = 0.5
+        return heatmap_data
+
+    def closest_per_row(self, dists, measured):
+        """
+        找出每一列距離最近的偵測點（同距離時取較前面的點）
+        :return: 偵測點索引
+        """
+        indices = np.flatnonzero(measured)
+        if len(indices) == 0:
+            return indices
+        order = indices[np.lexsort((indices, dists[indices], self.rows[indices]))]
+        _, first = np.unique(self.rows[order], return_index=True)
+        return order[first]
+
+    def select_refinement(
+        self, od_env, heights, dists, valid, holes, obstacles, budget: int
+    ) -> np.ndarray:
+        """
+        根據粗網格的結果挑出需要加密取樣的細網格點
+        格子的角點有坑洞、障礙物、缺失或不在安全高度內，或角點之間高度差過大時才加密，
+        越危險、越近的格子越優先，直到用完每幀的點數預算
+        :param od_env: 障礙物偵測設定
+        :param heights: 高度（只使用粗網格點）
+        :param dists: 水平距離
+        :param valid: 有取得深度資料的偵測點
+        :param holes: 坑洞遮罩
+        :param obstacles: 障礙物遮罩
+        :param budget: 每幀最多計算的偵測點數量（包含粗網格點）
+        :return: 需要加密的偵測點索引
+        """
+        remaining = budget - int(self.coarse.sum())
+        if remaining <= 0 or self.refine_factor <= 1:
+            return np.zeros(0, np.int64)
+
+        # 將粗網格點的結果放到二維陣列，多補一列與一行方便取格子的四個角
+        rows, cols = self.cell_shape[0] + 1, self.cell_shape[1] + 1
+        coarse = np.flatnonzero(self.coarse)
+        cy, cx = self.cells[coarse, 1], self.cells[coarse, 0]
+        measured = valid[coarse] & (dists[coarse] > 0)
+
+        exists = np.zeros((rows, cols), bool)
+        grid_heights = np.full((rows, cols), np.nan)
+        grid_dists = np.full((rows, cols), np.inf)
+        hazard = np.zeros((rows, cols), bool)
+        unusual = np.zeros((rows, cols), bool)
+
+        exists[cy, cx] = True
+        grid_heights[cy[measured], cx[measured]] = heights[coarse][measured]
+        grid_dists[cy[measured], cx[measured]] = dists[coarse][measured]
+        hazard[cy, cx] = holes[coarse] | obstacles[coarse]
+        unusual[cy, cx] = ~measured | ~is_safe_area(od_env, heights[coarse])
+
+        def corners(array):
+            return np.stack(
+                (array[:-1, :-1], array[:-1, 1:], array[1:, :-1], array[1:, 1:])
+            )
+
+        corner_exists = corners(exists)
+        corner_heights = corners(grid_heights)
+        height_range = np.fmax.reduce(corner_heights) - np.fmin.reduce(corner_heights)
+        height_range[np.isnan(height_range)] = 0
+
+        # 格子的優先順序：危險（距離越近越優先） > 異常 > 角點高度差
+        score = np.where(
+            height_range > od_env.get("refine_height_threshold", 5), height_range, 0
+        )
+        score = np.where(
+            (corners(unusual) & corner_exists).any(axis=0), 1e6, score
+        )
+        score = np.where(
+            corners(hazard).any(axis=0),
+            2e6 + 1e5 / (1 + np.min(corners(grid_dists), axis=0)),
+            score,
+        )
+
+        candidates = np.flatnonzero(~self.coarse)
+        candidate_cy, candidate_cx = self.cells[candidates, 1], self.cells[candidates, 0]
+        candidate_scores = score[candidate_cy, candidate_cx]
+        candidate_cells = candidate_cy * cols + candidate_cx
+        keep = candidate_scores > 0
+        candidates = candidates[keep]
+        candidate_scores = candidate_scores[keep]
+        candidate_cells = candidate_cells[keep]
+
+        # 分數相同時依格子排序，同一個格子的點排在一起
+        order = np.lexsort((candidate_cells, -candidate_scores))
+        candidates, candidate_cells = candidates[order], candidate_cells[order]
+        if len(candidates) <= remaining:
+            return candidates
+
+        # 預算不足時只加密完整的格子（連一個格子都放不下時才加密部分的點）
+        changes = np.flatnonzero(
+            candidate_cells[1 : remaining + 1] != candidate_cells[:remaining]
+        )
+        end = changes[-1] + 1 if len(changes) else remaining
+        return candidates[:end]
@@ -1,21 +1,17 @@
 import math
+import time
 from typing import Any
 
 import cv2
 import numpy as np
 
-from .elevation_view import draw_elevation_view, draw_elevation_view_points
-from .utils import (
-    process_missing_points,
-    draw_square,
-    draw_circle,
-    alert,
-    draw_text,
-    init_detect_points,
-    is_hole,
-    is_obstacle,
-    is_safe_area,
-)
+from .detect_grid import DetectGrid
+from .elevation_map import ElevationMap, MapSamples
+from .floor_plane import FloorPlaneEstimator
+from .missing_point_buffer import MissingPointBuffer
+from .obstacle_tracker import ObstacleTracker
+from .overlay import ObstacleOverlay, OverlayFrame, POINT_DTYPE
+from .utils import alert, init_detect_points, is_hole, is_obstacle
 from ..alarm.alarm import Alarm
 from ..realsense_camera.realsense_camera import RealsenseCamera
 
@@ -23,14 +19,37 @@ from ..realsense_camera.realsense_camera import RealsenseCamera
 class DetectObstacle:
     instance = None
 
-    def __init__(self, config: Any):
+    def __init__(
+        self, config: Any, camera: RealsenseCamera = None, alarm: Alarm = None
+    ):
+        """
+        :param config: toml設定檔（多台攝影機時為該攝影機的設定，見multi_camera.camera_config）
+        :param camera: 使用的深度攝影機（預設為最後建立的RealsenseCamera）
+        :param alarm: 使用的警報（預設為Alarm.instance，多台攝影機可以共用同一個警報）
+        """
         DetectObstacle.instance = self
         self.config_env = config.env["config"]
         self.do_env = config.env["obstacle_detection"]
-        if self.do_env["missing_point_alarm"]:
-            self.missing_points_buffer = []
+        self.camera = camera
+        self.alarm_device = alarm
+        self.missing_points_buffer = None
         self.alarm = True
+        self.alarming = False
         self.detect_points = None
+        self.detect_grid = None
+        self.detect_area = None
+        self.floor_plane = FloorPlaneEstimator(self.do_env)
+        self.elevation_map = None
+        self.map_samples = None
+        self.obstacle_tracker = None
+        self.obstacles = []
+        self.result = np.zeros(0, POINT_DTYPE)
+        # 除錯模式時最新一幀的繪製資料，顯示畫面時才由debug_images繪製
+        self.overlay_frame = None
+        self.overlay = ObstacleOverlay(
+            self.do_env.get("async_overlay", True),
+            self.do_env.get("overlay_buffers", 2),
+        )
 
     def __call__(
             self,
@@ -40,165 +59,278 @@ class DetectObstacle:
     ):
         """
         :param depth_frame: 深度影像
-        :param color_img: 彩度圖片
-        :param depth_img: 深度圖片
-        :return: 繪製過後的彩度圖片與深度圖片
+        :param color_img: 彩度圖片（只在除錯模式繪製時需要，深度與彩度分開處理時可以省略）
+        :param depth_img: 深度圖片（只在除錯模式繪製時需要）
+        除錯模式且有彩度與深度圖片時保存這一幀的繪製資料（不在這裡繪製，見debug_images），
+        圖片在下一次呼叫之前不能被修改或釋放
         """
         debug = self.config_env["debug"]
         missing_point_alarm = self.do_env["missing_point_alarm"]
-
-        if debug:
-            orig_color_img = color_img.copy()
-            color_img, depth_img = color_img.copy(), depth_img.copy()
-
-        min_hole_distance = math.inf
-        min_obstacle_distance = math.inf
-
-        if missing_point_alarm:
-            missing_points = []
+        camera = self.camera or RealsenseCamera.instance
 
         depth_image = np.asanyarray(depth_frame.get_data())
 
         area = np.array(self.do_env["area"], np.int32)
-        color_img = cv2.polylines(color_img, [area], True, (255, 255, 255), 2)
-        img_height, img_width = color_img.shape[:2]
+        # 偵測點為彩度座標，沒有彩度圖片時使用彩度攝影機的解析度
+        if color_img is not None:
+            img_height, img_width = color_img.shape[:2]
+        else:
+            img_height, img_width = camera.color_intrin.height, camera.color_intrin.width
 
-        if self.detect_points is None:
-            spilt_count = 40 if img_height == 480 else 60
+        # 偵測點間距與粗細網格設定
+        spilt_count = self.do_env.get("spilt_count") or (40 if img_height == 480 else 60)
+        adaptive = self.do_env.get("adaptive_sampling", False)
+        refine_factor = self.do_env.get("refine_factor", 3) if adaptive else 1
+        grid_setting = (area.tolist(), spilt_count, refine_factor)
+
+        # 檢測區域或網格設定改變時重新產生偵測點
+        if self.detect_points is None or self.detect_area != grid_setting:
+            spacing = max(spilt_count // refine_factor, 1)
             self.detect_points = init_detect_points(
-                self.do_env, img_height, img_width, area, spilt_count
+                self.do_env, img_height, img_width, area, spacing
             )
-
-        if debug:
-            border_img = np.zeros((img_height, img_width, 3), np.uint8)
-            elevation_view_img = draw_elevation_view(
-                RealsenseCamera.instance.pitch,
-                640,
-                480,
+            self.detect_grid = DetectGrid(self.detect_points, spacing, refine_factor)
+            self.detect_area = grid_setting
+
+        grid = self.detect_grid
+
+        # 跨幀融合的高度地圖
+        elevation_map = None
+        now = time.time()
+        if self.do_env.get("elevation_map", False):
+            if self.elevation_map is None:
+                self.elevation_map = ElevationMap(self.do_env)
+            if self.map_samples is None or len(self.map_samples) != len(grid):
+                self.map_samples = MapSamples(len(grid))
+            elevation_map = self.elevation_map
+
+        # 擬合地板平面作為高度基準，失敗時使用IMU俯仰角與攝影機高度
+        floor_plane = None
+        if self.do_env.get("floor_plane", False):
+            floor_plane = self.floor_plane.fit(
+                depth_image, camera.depth_intrin, camera.pitch
             )
 
-        index = -1
-        elevation_view_points = []
-
-        heatmap_data = np.zeros((len(self.detect_points), len(self.detect_points[0])))
-
-        border_circle_size = 25 if img_height == 480 else 50
-        for i in range(len(self.detect_points)):
-            closest_point = None
-            for j in range(len(self.detect_points[i])):
-                index += 1
-                color_pixel = self.detect_points[i][j]
-                depth_pixel = (
-                    RealsenseCamera.instance.project_color_pixel_to_depth_pixel(
-                        depth_frame.get_data(), color_pixel
-                    )
+        depth_pixels = np.full((len(grid), 2), -1, np.int32)
+        heights = np.zeros(len(grid))
+        dists = np.zeros(len(grid), np.int64)
+        lateral_dists = np.zeros(len(grid), np.int64)
+        depth_points = np.zeros((len(grid), 3), np.float32)
+        valid = np.zeros(len(grid), bool)
+        sampled = np.zeros(len(grid), bool)
+        projected = False  # 這一幀是否已經投影過（粗細網格分兩次投影時只算一幀）
+
+        def measure(indices):
+            """
+            投影並計算指定偵測點的高度、水平距離與橫向距離
+            """
+            nonlocal projected
+            if elevation_map is not None and self.do_env.get("map_reuse", False):
+                indices = reuse_map(indices)
+                if len(indices) == 0:
+                    return
+
+            depth_pixels[indices] = camera.project_color_pixels_to_depth_pixels(
+                depth_frame.get_data(), grid.points, indices, not projected
+            )
+            projected = True
+            (
+                heights[indices],
+                dists[indices],
+                lateral_dists[indices],
+                depth_points[indices],
+                valid[indices],
+            ) = camera.depth_pixels_to_height(
+                depth_image,
+                depth_pixels[indices],
+                self.do_env["camera_height"],
+                floor_plane,
+            )
+            sampled[indices] = True
+
+            if elevation_map is not None:
+                update_map(indices)
+
+        def reuse_map(indices):
+            """
+            偵測點上一次量測的位置落在剛觀測過的格子，且俯仰角沒有明顯變化時，
+            直接使用地圖的高度與上一次的距離
+            沒有位移資訊，上一次的距離在行走時會過時，所以只重複使用平坦的格子，
+            坑洞與障礙物一律重新量測（只適合站立或緩慢移動時使用）
+            :return: 仍需要量測的偵測點索引
+            """
+            samples = self.map_samples
+            world = elevation_map.to_world(
+                samples.dists[indices], samples.lateral_dists[indices], camera.yaw
+            )
+            reuse = (
+                samples.known[indices]
+                & (
+                    np.abs(samples.pitch[indices] - camera.pitch)
+                    < self.do_env.get("map_pitch_tolerance", 2)
                 )
-                if not depth_pixel:
-                    continue
+                & elevation_map.is_fresh(world, now)
+            )
+            map_heights = elevation_map.heights_at(world)
+            forward = samples.dists[indices]
+            right = samples.lateral_dists[indices]
+            reuse &= ~is_hole(self.do_env, map_heights, right) & ~is_obstacle(
+                self.do_env, map_heights, forward, right
+            )
 
-                result = RealsenseCamera.instance.depth_pixel_to_height(
-                    depth_image, depth_pixel, self.do_env["camera_height"]
-                )
+            reused = indices[reuse]
+            depth_pixels[reused] = samples.depth_pixels[reused]
+            heights[reused] = map_heights[reuse]
+            dists[reused] = samples.dists[reused]
+            lateral_dists[reused] = samples.lateral_dists[reused]
+            depth_points[reused] = samples.depth_points[reused]
+            valid[reused] = True
+            sampled[reused] = True
+            return indices[~reuse]
+
+        def update_map(indices):
+            """
+            將新量測的偵測點融合進地圖，並記錄量測結果
+            """
+            measured = indices[valid[indices] & (dists[indices] > 0)]
+            samples = self.map_samples
+            samples.known[indices] = False
+            samples.known[measured] = True
+            samples.pitch[measured] = camera.pitch
+            samples.depth_pixels[measured] = depth_pixels[measured]
+            samples.dists[measured] = dists[measured]
+            samples.lateral_dists[measured] = lateral_dists[measured]
+            samples.depth_points[measured] = depth_points[measured]
+
+            elevation_map.fuse(
+                elevation_map.to_world(
+                    dists[measured], lateral_dists[measured], camera.yaw
+                ),
+                heights[measured],
+                now,
+            )
 
-                if not result:
-                    if missing_point_alarm:
-                        missing_points.append(index)
-                    continue
-
-                height, dist, lateral_dist, depth_point = result
-                color = (0, 255, 0)
-
-                if dist > 0:
-                    is_safe = True
-
-                    if closest_point is None or dist < closest_point[1]:
-                        closest_point = result
-
-                    # 如果高度低於最高坑洞的判斷標準，則代表有坑洞
-                    if is_hole(self.do_env, height, lateral_dist):
-                        is_safe = False
-                        color = (0, 0, 255)
-                        heatmap_data[i, j] = 1
-                        if dist < min_hole_distance:
-                            min_hole_distance = dist
-                    # 如果高度低於身高，又高於最低障礙物的判斷標準，則代表有障礙物
-                    if is_obstacle(self.do_env, height, dist, lateral_dist):
-                        is_safe = False
-                        color = (0, 255, 255)
-                        heatmap_data[i, j] = 0.5
-                        if dist < min_obstacle_distance:
-                            min_obstacle_distance = dist
-
-                    if debug and is_safe and is_safe_area(self.do_env, height):
-                        border_img = cv2.circle(border_img, color_pixel, 50, color, -1)
-
-                if debug:
-                    x, y = color_pixel
-
-                    square_size = 20 if img_height == 480 else 30
-                    color_img = draw_square(
-                        color_img, color_pixel, color, size=square_size
-                    )
-
-                    font_scale = 0.3 if img_height == 480 else 0.5
-                    color_img = draw_text(
-                        color_img,
-                        str(int(height)),
-                        (x, y + 15),
-                        (255, 255, 255),
-                        font_scale,
-                    )
-                    color_img = draw_text(
-                        color_img, str(dist), (x, y), (255, 200, 255), font_scale
-                    )
-                    color_img = draw_text(
-                        color_img,
-                        str(lateral_dist),
-                        (x, y - 15),
-                        (255, 0, 0),
-                        font_scale,
-                    )
-                    depth_img = draw_circle(depth_img, depth_pixel, color)
-
-            if closest_point is not None and debug:
-                elevation_view_points.append(closest_point)
-        if debug:
-            elevation_view_img = draw_elevation_view_points(
-                elevation_view_img, elevation_view_points
+        if adaptive:
+            # 先計算粗網格，再只加密異常的格子
+            measure(np.flatnonzero(grid.coarse))
+            holes, obstacles, _ = grid.evaluate(
+                self.do_env, heights, dists, lateral_dists, valid
+            )
+            refine = grid.select_refinement(
+                self.do_env,
+                heights,
+                dists,
+                valid,
+                holes,
+                obstacles,
+                self.do_env.get("point_budget", 400),
             )
+            if len(refine):
+                measure(refine)
+        else:
+            measure(np.arange(len(grid)))
 
-        if missing_point_alarm:
-            # 緩存消失點，如果所有緩存的消失點都有該點，則警告
-            self.missing_points_buffer.append(missing_points)
-            if len(self.missing_points_buffer) > self.do_env["missing_point_threshold"]:
-                self.missing_points_buffer = self.missing_points_buffer[1:]
+        # 判斷坑洞、障礙物與安全區域
+        holes, obstacles, safe = grid.evaluate(
+            self.do_env, heights, dists, lateral_dists, valid
+        )
 
-            missing_point = process_missing_points(self.missing_points_buffer)
+        # 將坑洞與障礙物分群為物體
+        if self.do_env.get("obstacle_clustering", False):
+            if self.obstacle_tracker is None:
+                self.obstacle_tracker = ObstacleTracker(self.do_env)
+            self.obstacles = self.obstacle_tracker(
+                grid, holes, obstacles, heights, dists, lateral_dists, now
+            )
         else:
-            missing_point = None
-
-        if Alarm.instance is not None and self.alarm:
-            alert(self.do_env, min_hole_distance, min_obstacle_distance, missing_point)
+            self.obstacle_tracker = None
+            self.obstacles = []
 
-        if debug:
-            # 放大熱力圖資料
-            large_data = cv2.resize(
-                heatmap_data, (img_width, img_height), interpolation=cv2.INTER_LINEAR
+        if elevation_map is not None:
+            # 從地圖判斷（融合過的高度，只使用這一幀重新觀測過的格子）
+            min_hole_distance, min_obstacle_distance = elevation_map.hazard_distances(
+                self.do_env, camera.yaw, now
             )
-            large_data[0, 0] = 1
+        elif self.obstacle_tracker is not None:
+            # 從物體判斷，同一個物體不重複警告
+            (
+                min_hole_distance,
+                min_obstacle_distance,
+            ) = self.obstacle_tracker.alert_distances(self.obstacles, now)
+        else:
+            min_hole_distance = int(dists[holes].min()) if holes.any() else math.inf
+            min_obstacle_distance = (
+                int(dists[obstacles].min()) if obstacles.any() else math.inf
+            )
+
+        # 每個偵測點的結果（除錯畫面與其他模組使用）
+        self.result = np.zeros(len(grid), POINT_DTYPE)
+        self.result["color_pixel"] = grid.points
+        self.result["depth_pixel"] = depth_pixels
+        self.result["height"] = heights
+        self.result["dist"] = dists
+        self.result["lateral_dist"] = lateral_dists
+        self.result["depth_point"] = depth_points
+        self.result["valid"] = valid
+        self.result["hole"] = holes
+        self.result["obstacle"] = obstacles
+        self.result["safe"] = safe
+
+        if missing_point_alarm:
+            # 緩存消失點，如果所有緩存的消失點都有該點，則警告
+            buffer_shape = (self.do_env["missing_point_threshold"], len(grid))
+            if (
+                self.missing_points_buffer is None
+                or self.missing_points_buffer.shape != buffer_shape
+            ):
+                self.missing_points_buffer = MissingPointBuffer(*buffer_shape)
+
+            # 沒有取樣的偵測點不視為消失
+            self.missing_points_buffer.append(sampled & ~valid)
+            missing_point = self.missing_points_buffer.persistent_missing_point()
+        else:
+            missing_point = None
 
-            # 將資料轉換為8位元灰階影像
-            heatmap_data_normalized = cv2.normalize(
-                large_data, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U
+        alarm = self.alarm_device or Alarm.instance
+        if alarm is not None and self.alarm:
+            self.alarming = alert(
+                self.do_env,
+                alarm,
+                self.alarming,
+                min_hole_distance,
+                min_obstacle_distance,
+                missing_point,
+                self,
             )
 
-            # 將灰階圖轉換為熱力圖
-            heatmap = cv2.applyColorMap(heatmap_data_normalized, cv2.COLORMAP_JET)
-            heatmap = cv2.addWeighted(heatmap, 0.1, np.zeros_like(heatmap), 1, 0)
+        if debug and color_img is not None and depth_img is not None:
+            status = None
+            if self.do_env.get("floor_plane", False):
+                status = (
+                    f"floor {'plane' if floor_plane else 'imu'} "
+                    f"{self.floor_plane.fit_time:.1f}ms"
+                )
 
-            heatmap = cv2.addWeighted(orig_color_img, 1, heatmap, 1, 0)
+            self.overlay_frame = OverlayFrame(
+                color_img,
+                depth_img,
+                area,
+                grid,
+                self.result,
+                camera.pitch,
+                self.obstacles,
+                status,
+            )
 
-            return color_img, depth_img, border_img, elevation_view_img, heatmap
+    def debug_images(self):
+        """
+        最新一幀的除錯畫面（顯示畫面時才繪製，背景繪製時可能是上一幀的結果）
+        :return: 繪製過後的彩度圖片、深度圖片、安全區域、平視圖與熱力圖（還沒有資料時為None）
+        """
+        frame = self.overlay_frame
+        if frame is None:
+            return None
+        return self.overlay(frame)
 
     @staticmethod
     def draw_border(image, border_img, color=(0, 255, 0), mask_alpha: float = 0.2):
@@ -216,9 +348,18 @@ class DetectObstacle:
 
         return cv2.addWeighted(mask_img, mask_alpha, image, 1 - mask_alpha, 0)
 
+    def stop(self):
+        """
+        停止背景繪製除錯畫面
+        """
+        self.overlay.stop()
+
     def pause_alarm(self):
         self.alarm = False
-        Alarm.instance.stop()
+        self.alarming = False
+        alarm = self.alarm_device or Alarm.instance
+        if alarm is not None:
+            alarm.stop(self)
 
     def resume_alarm(self):
         self.alarm = True
@@ -0,0 +1,158 @@
+import math
+from typing import Any
+
+import numpy as np
+
+from .utils import is_hole, is_obstacle
+
+
+class ElevationMap:
+    def __init__(self, od_env: Any):
+        """
+        以行走者為中心的固定大小高度地圖（環形網格），跨幀融合偵測點的高度
+        世界座標為 (前方, 右方)，以開始偵測時的方向為準，單位為毫米
+        格子以絕對座標取餘數放進網格，超出範圍的舊格子會被新的格子覆蓋，不需要搬移資料
+        :param od_env: 障礙物偵測設定
+        """
+        self.cell_size = od_env.get("map_cell_size", 50)
+        self.size = od_env.get("map_size", 80)
+        self.decay = od_env.get("map_decay", 1.0)
+        self.refresh = od_env.get("map_refresh", 0.2)
+        self.alpha = od_env.get("map_alpha", 0.5)
+
+        # 行走者在世界座標的位置（目前沒有位移資訊，固定在原點，
+        # 行走時舊格子的位置會失準，所以警告只使用這一幀重新觀測過的格子）
+        self.position = np.zeros(2)
+
+        self.heights = np.zeros((self.size, self.size))
+        self.coords = np.zeros((self.size, self.size, 2), np.int64)
+        self.observed = np.full((self.size, self.size), -np.inf)
+
+    def to_world(self, dists, lateral_dists, yaw: float) -> np.ndarray:
+        """
+        將攝影機方向的水平距離與橫向距離轉換為世界座標
+        :param dists: 水平距離（前方）
+        :param lateral_dists: 橫向距離（右方）
+        :param yaw: 攝影機偏航角（角度）
+        :return: 世界座標 (N, 2)
+        """
+        yaw_radians = math.radians(yaw)
+        cos, sin = math.cos(yaw_radians), math.sin(yaw_radians)
+        forward = np.asarray(dists, np.float64)
+        right = np.asarray(lateral_dists, np.float64)
+        return np.stack(
+            (forward * cos - right * sin, forward * sin + right * cos), axis=-1
+        ) + self.position
+
+    def to_camera(self, world: np.ndarray, yaw: float):
+        """
+        將世界座標轉換回攝影機方向的水平距離與橫向距離
+        """
+        yaw_radians = math.radians(yaw)
+        cos, sin = math.cos(yaw_radians), math.sin(yaw_radians)
+        relative = world - self.position
+        forward = relative[..., 0] * cos + relative[..., 1] * sin
+        right = -relative[..., 0] * sin + relative[..., 1] * cos
+        return forward, right
+
+    def _locate(self, world: np.ndarray):
+        """
+        取得世界座標所在格子的絕對座標、環形網格索引與是否在地圖範圍內
+        """
+        coords = np.floor(world / self.cell_size).astype(np.int64)
+        center = np.floor(self.position / self.cell_size).astype(np.int64)
+        inside = np.all(np.abs(coords - center) < self.size // 2, axis=-1)
+        return coords, coords % self.size, inside
+
+    def _known(self, coords, index, now: float, max_age: float):
+        return (
+            np.all(self.coords[index[:, 0], index[:, 1]] == coords, axis=-1)
+            & (now - self.observed[index[:, 0], index[:, 1]] < max_age)
+        )
+
+    def fuse(self, world: np.ndarray, heights: np.ndarray, now: float):
+        """
+        將新的高度樣本融合進地圖（同一格的樣本先取平均，再與舊的高度加權平均）
+        :param world: 世界座標 (N, 2)
+        :param heights: 高度 (N,)
+        :param now: 目前時間（秒）
+        """
+        coords, index, inside = self._locate(world)
+        coords, index, heights = coords[inside], index[inside], heights[inside]
+        if len(heights) == 0:
+            return
+
+        flat = index[:, 0] * self.size + index[:, 1]
+        _, first, inverse = np.unique(flat, return_index=True, return_inverse=True)
+        mean = np.bincount(inverse, heights) / np.bincount(inverse)
+        coords, index = coords[first], index[first]
+
+        # 過期或被其他位置佔用的格子直接使用新的高度
+        known = self._known(coords, index, now, self.decay)
+        rows, cols = index[:, 0], index[:, 1]
+        old = self.heights[rows, cols]
+        self.heights[rows, cols] = np.where(
+            known, (1 - self.alpha) * old + self.alpha * mean, mean
+        )
+        self.coords[rows, cols] = coords
+        self.observed[rows, cols] = now
+
+    def is_fresh(self, world: np.ndarray, now: float) -> np.ndarray:
+        """
+        世界座標所在的格子是否剛觀測過（不需要重新取樣）
+        """
+        coords, index, inside = self._locate(world)
+        return inside & self._known(coords, index, now, self.refresh)
+
+    def heights_at(self, world: np.ndarray) -> np.ndarray:
+        """
+        取得世界座標所在格子的高度
+        """
+        _, index, _ = self._locate(world)
+        return self.heights[index[:, 0], index[:, 1]]
+
+    def hazard_distances(self, od_env: Any, yaw: float, now: float):
+        """
+        從地圖中找出最近的坑洞與障礙物距離（只使用這一幀重新觀測過的格子，
+        沒有位移資訊時，之前觀測的格子在行走後位置已經不正確）
+        :param od_env: 障礙物偵測設定
+        :param yaw: 攝影機偏航角（角度）
+        :param now: 目前時間（秒），與這一幀融合時使用的時間相同
+        :return: 最近的坑洞距離與障礙物距離，沒有時為inf
+        """
+        coords = self.coords.reshape(-1, 2)
+        center = np.floor(self.position / self.cell_size).astype(np.int64)
+        known = (self.observed.ravel() == now) & np.all(
+            np.abs(coords - center) < self.size // 2, axis=-1
+        )
+
+        world = (coords[known] + 0.5) * self.cell_size
+        heights = self.heights.ravel()[known]
+        forward, right = self.to_camera(world, yaw)
+
+        ahead = forward > 0
+        holes = ahead & is_hole(od_env, heights, right)
+        obstacles = ahead & is_obstacle(od_env, heights, forward, right)
+
+        min_hole_distance = int(forward[holes].min()) if holes.any() else math.inf
+        min_obstacle_distance = (
+            int(forward[obstacles].min()) if obstacles.any() else math.inf
+        )
+        return min_hole_distance, min_obstacle_distance
+
+
+class MapSamples:
+    def __init__(self, point_count: int):
+        """
+        每個偵測點最近一次量測的結果，用來判斷偵測點是否落在剛觀測過的格子
+        :param point_count: 偵測點數量
+        """
+        self.known = np.zeros(point_count, bool)
+        self.pitch = np.zeros(point_count)
+        self.depth_pixels = np.full((point_count, 2), -1, np.int32)
+        self.dists = np.zeros(point_count, np.int64)
+        self.lateral_dists = np.zeros(point_count, np.int64)
+        self.depth_points = np.zeros((point_count, 3), np.float32)
+
+    def __len__(self):
+        return len(self.known)
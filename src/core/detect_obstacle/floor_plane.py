@@ -0,0 +1,155 @@
+import math
+import time
+from typing import Any
+
+import numpy as np
+
+from ..realsense_camera.camera_model import CameraIntrinsics, get_ray_grid
+
+
+class FloorPlaneEstimator:
+    def __init__(self, od_env: Any):
+        """
+        從深度圖擬合地板平面，作為坑洞與障礙物的高度基準
+        平面以 normal · point + offset 表示（法向量朝上，單位與深度相同為毫米），
+        點到平面的有號距離就是高度
+        :param od_env: 障礙物偵測設定
+        """
+        self.decimation = od_env.get("floor_plane_decimation", 8)
+        self.iterations = od_env.get("floor_plane_iterations", 64)
+        self.threshold = od_env.get("floor_plane_threshold", 20)
+        self.min_inliers = od_env.get("floor_plane_min_inliers", 0.2)
+        self.max_tilt = od_env.get("floor_plane_max_tilt", 30)
+        self.score_points = od_env.get("floor_plane_score_points", 1000)
+
+        self.normal = None
+        self.offset = None
+        self.inlier_ratio = 0.0
+        self.fit_time = 0.0  # 最近一次擬合花費的時間（毫秒）
+        self.rng = np.random.default_rng()
+
+    @property
+    def plane(self):
+        """
+        目前的地板平面 (normal, offset)，擬合失敗時為None
+        """
+        if self.normal is None:
+            return None
+        return self.normal, self.offset
+
+    @property
+    def camera_height(self):
+        """
+        攝影機距離地板平面的高度（公分）
+        """
+        return None if self.offset is None else self.offset / 10
+
+    @staticmethod
+    def imu_up_vector(pitch: float) -> np.ndarray:
+        """
+        由IMU俯仰角推算攝影機座標系中朝上的方向（與depth_pixel_to_height相同的假設，不考慮翻滾角）
+        :param pitch: 俯仰角（-90為水平）
+        """
+        pitch_radians = math.radians(pitch + 90)
+        return np.array([0, -math.cos(pitch_radians), math.sin(pitch_radians)])
+
+    def fit(
+        self,
+        depth_image: np.ndarray,
+        depth_intrin: CameraIntrinsics,
+        pitch: float,
+    ):
+        """
+        以RANSAC擬合地板平面，上一幀的平面會作為候選平面（warm start）
+        :param depth_image: 深度圖片
+        :param depth_intrin: 深度攝影機內參
+        :param pitch: 攝影機俯仰角，只用來限制候選平面的傾斜角度
+        :return: 地板平面 (normal, offset)，擬合失敗時為None
+        """
+        start_time = time.perf_counter()
+        try:
+            self._fit(depth_image, depth_intrin, pitch)
+        finally:
+            self.fit_time = (time.perf_counter() - start_time) * 1000
+        return self.plane
+
+    def _fit(self, depth_image, depth_intrin, pitch):
+        step = max(int(self.decimation), 1)
+        depths = depth_image[::step, ::step].astype(np.float32)
+        rays = get_ray_grid(depth_intrin)[::step, ::step]
+        points = (rays * depths[..., None])[depths > 0]
+
+        if len(points) < 3:
+            self._reset()
+            return
+
+        up = self.imu_up_vector(pitch)
+        min_cos = math.cos(math.radians(self.max_tilt))
+
+        # 有上一幀的平面時只需要較少的隨機候選平面
+        iterations = self.iterations
+        if self.normal is not None:
+            iterations = max(iterations // 4, 1)
+
+        # 一次產生所有隨機候選平面
+        samples = points[self.rng.integers(0, len(points), (iterations, 3))]
+        normals = np.cross(
+            samples[:, 1] - samples[:, 0], samples[:, 2] - samples[:, 0]
+        )
+        lengths = np.linalg.norm(normals, axis=1)
+        usable = lengths > 1e-6
+        normals = normals[usable] / lengths[usable, None]
+        normals *= np.where(normals @ up < 0, -1, 1)[:, None]
+        offsets = -np.sum(normals * samples[usable, 0], axis=1)
+
+        # 只保留接近水平的平面
+        horizontal = normals @ up >= min_cos
+        normals, offsets = normals[horizontal], offsets[horizontal]
+
+        if self.normal is not None:
+            normals = np.vstack((self.normal, normals))
+            offsets = np.concatenate(([self.offset], offsets))
+
+        if len(normals) == 0:
+            self._reset()
+            return
+
+        # 在部分點上計算每個候選平面的內點數量
+        scored = points
+        if len(points) > self.score_points:
+            scored = points[self.rng.choice(len(points), self.score_points, False)]
+        residuals = np.abs(scored @ normals.T + offsets)
+        best = np.argmax(np.count_nonzero(residuals < self.threshold, axis=0))
+
+        inliers = np.abs(points @ normals[best] + offsets[best]) < self.threshold
+        inlier_ratio = np.count_nonzero(inliers) / len(points)
+        if inlier_ratio < self.min_inliers or np.count_nonzero(inliers) < 3:
+            self._reset()
+            return
+
+        # 用所有內點以最小平方法修正平面
+        inlier_points = points[inliers].astype(np.float64)
+        centroid = inlier_points.mean(axis=0)
+        normal = np.linalg.svd(inlier_points - centroid, full_matrices=False)[2][2]
+        if normal @ up < 0:
+            normal = -normal
+        if normal @ up < min_cos:
+            self._reset()
+            return
+
+        self.normal = normal
+        self.offset = float(-normal @ centroid)
+        self.inlier_ratio = inlier_ratio
+
+    def _reset(self):
+        self.normal = None
+        self.offset = None
+        self.inlier_ratio = 0.0
+
+    def heights(self, depth_points: np.ndarray) -> np.ndarray:
+        """
+        計算三維點距離地板平面的高度
+        :param depth_points: 深度攝影機座標系的三維座標 (N, 3)，單位為毫米
+        :return: 高度 (N,)，單位為公分
+        """
+        return (np.asarray(depth_points, np.float64) @ self.normal + self.offset) / 10
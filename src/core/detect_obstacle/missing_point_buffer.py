@@ -0,0 +1,39 @@
+import numpy as np
+
+
+class MissingPointBuffer:
+    def __init__(self, frame_count: int, point_count: int):
+        """
+        固定大小的消失點環形緩衝區（幀數 x 偵測點數）
+        :param frame_count: 緩存的幀數（missing_point_threshold）
+        :param point_count: 偵測點數量
+        """
+        self.ring = np.zeros((max(frame_count, 1), point_count), bool)
+        self.position = 0
+        self.count = 0
+
+    @property
+    def shape(self):
+        return self.ring.shape
+
+    def append(self, missing: np.ndarray):
+        """
+        寫入一幀的消失點遮罩，覆蓋最舊的一幀
+        :param missing: 每個偵測點是否消失 (point_count,)
+        """
+        self.ring[self.position] = missing
+        self.position = (self.position + 1) % len(self.ring)
+        self.count = min(self.count + 1, len(self.ring))
+
+    def persistent_missing_point(self) -> int:
+        """
+        找出所有緩存的幀都消失的第一個偵測點
+        :return: 偵測點索引，沒有時回傳-1
+        """
+        if self.count == 0:
+            return -1
+
+        # 尚未填滿時只有前count列是有效資料
+        persistent = np.logical_and.reduce(self.ring[: self.count], axis=0)
+        indices = np.flatnonzero(persistent)
+        return int(indices[0]) if len(indices) else -1
@@ -0,0 +1,215 @@
+import math
+from typing import Any, List
+
+import cv2
+import numpy as np
+
+HOLE = "hole"
+OBSTACLE = "obstacle"
+
+
+class ObstacleRecord:
+    def __init__(self, record_id: int, kind: str, indices: np.ndarray, now: float):
+        """
+        一個連通的坑洞或障礙物
+        :param record_id: 跨幀穩定的編號
+        :param kind: 種類（HOLE或OBSTACLE）
+        :param indices: 屬於此物體的偵測點索引
+        :param now: 目前時間（秒）
+        """
+        self.id = record_id
+        self.kind = kind
+        self.indices = indices
+        self.extent = (0, 0, 0, 0)  # 彩度圖上的範圍 (x1, y1, x2, y2)
+        self.distance = math.inf  # 最近的水平距離
+        self.lateral_distance = 0  # 最近點的橫向距離
+        self.min_height = 0.0
+        self.max_height = 0.0
+        self.first_seen = now
+        self.last_seen = now
+        self.alerted_at = None
+        self.alerted_distance = math.inf
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __repr__(self):
+        return (
+            f"ObstacleRecord({self.id}, {self.kind}, {self.distance}mm, "
+            f"lateral={self.lateral_distance}mm, "
+            f"height=[{self.min_height:.1f}, {self.max_height:.1f}], points={len(self)})"
+        )
+
+
+class ObstacleTracker:
+    def __init__(self, od_env: Any):
+        """
+        將坑洞與障礙物遮罩分群為物體，並跨幀維持物體編號
+        :param od_env: 障礙物偵測設定
+        """
+        self.memory = od_env.get("cluster_memory", 1.0)
+        self.match_distance = od_env.get("cluster_match_distance", 300)
+        self.suppress_interval = od_env.get("alert_suppress_interval", 0)
+        self.realert_distance = od_env.get("alert_realert_distance", 200)
+        self.alert_range = {
+            HOLE: max(preset["distance"] for preset in od_env["hole_preset"]),
+            OBSTACLE: max(preset["distance"] for preset in od_env["obstacle_preset"]),
+        }
+
+        self.records = {}
+        self.next_id = 0
+        self.point_ids = None
+        self.point_seen = None
+
+    def __call__(
+        self,
+        grid,
+        holes: np.ndarray,
+        obstacles: np.ndarray,
+        heights: np.ndarray,
+        dists: np.ndarray,
+        lateral_dists: np.ndarray,
+        now: float,
+    ) -> List[ObstacleRecord]:
+        """
+        :param grid: 偵測網格（DetectGrid）
+        :param holes: 坑洞遮罩
+        :param obstacles: 障礙物遮罩
+        :param heights: 高度
+        :param dists: 水平距離
+        :param lateral_dists: 橫向距離
+        :param now: 目前時間（秒）
+        :return: 這一幀的物體
+        """
+        if self.point_ids is None or len(self.point_ids) != len(grid):
+            self.point_ids = np.full(len(grid), -1, np.int64)
+            self.point_seen = np.full(len(grid), -np.inf)
+            self.records = {}
+
+        # 太久沒看到的偵測點不再延續舊的編號
+        self.point_ids[now - self.point_seen > self.memory] = -1
+
+        records = []
+        for kind, mask in ((HOLE, holes), (OBSTACLE, obstacles)):
+            for indices in self._components(grid, mask):
+                records.append(ObstacleRecord(-1, kind, indices, now))
+
+        self._assign_ids(records, dists, lateral_dists)
+
+        for record in records:
+            indices = record.indices
+            points = grid.points[indices]
+            nearest = indices[np.argmin(dists[indices])]
+            record.extent = (*points.min(axis=0).tolist(), *points.max(axis=0).tolist())
+            record.distance = int(dists[nearest])
+            record.lateral_distance = int(lateral_dists[nearest])
+            record.min_height = float(heights[indices].min())
+            record.max_height = float(heights[indices].max())
+
+            self.point_ids[indices] = record.id
+            self.point_seen[indices] = now
+            self.records[record.id] = record
+
+        # 保留最近看到的物體，短暫消失後仍可以延續編號與警告狀態
+        self.records = {
+            record_id: record
+            for record_id, record in self.records.items()
+            if now - record.last_seen <= self.memory
+        }
+        return records
+
+    @staticmethod
+    def _components(grid, mask: np.ndarray):
+        """
+        在偵測網格上找出連通的偵測點（八方向相鄰）
+        :return: 每個連通區域的偵測點索引
+        """
+        indices = np.flatnonzero(mask)
+        if len(indices) == 0:
+            return []
+
+        lattice = grid.lattice[indices]
+        image = np.zeros(tuple(lattice.max(axis=0)[::-1] + 1), np.uint8)
+        image[lattice[:, 1], lattice[:, 0]] = 1
+        count, labels = cv2.connectedComponents(image, connectivity=8)
+
+        point_labels = labels[lattice[:, 1], lattice[:, 0]]
+        order = np.argsort(point_labels, kind="stable")
+        bounds = np.searchsorted(point_labels[order], np.arange(1, count + 1))
+        return np.split(indices[order], bounds[1:-1])
+
+    def _assign_ids(self, records, dists, lateral_dists):
+        """
+        以偵測點重疊數量配對上一幀的物體，沒有重疊時再以最近點的位置配對
+        """
+        taken = set()
+        unmatched = []
+        for record in sorted(records, key=len, reverse=True):
+            ids = self.point_ids[record.indices]
+            ids, counts = np.unique(ids[ids >= 0], return_counts=True)
+            candidates = [
+                record_id
+                for record_id in ids[np.argsort(-counts, kind="stable")].tolist()
+                if record_id in self.records
+                and record_id not in taken
+                and self.records[record_id].kind == record.kind
+            ]
+
+            if candidates:
+                self._inherit(record, candidates[0])
+                taken.add(candidates[0])
+            else:
+                unmatched.append(record)
+
+        for record in unmatched:
+            nearest = record.indices[np.argmin(dists[record.indices])]
+            best, best_distance = None, self.match_distance
+            for record_id, previous in self.records.items():
+                if record_id in taken or previous.kind != record.kind:
+                    continue
+                distance = math.hypot(
+                    previous.distance - dists[nearest],
+                    previous.lateral_distance - lateral_dists[nearest],
+                )
+                if distance < best_distance:
+                    best, best_distance = record_id, distance
+
+            if best is None:
+                record.id = self.next_id
+                self.next_id += 1
+            else:
+                self._inherit(record, best)
+                taken.add(best)
+
+    def _inherit(self, record, record_id):
+        previous = self.records[record_id]
+        record.id = record_id
+        record.first_seen = previous.first_seen
+        record.alerted_at = previous.alerted_at
+        record.alerted_distance = previous.alerted_distance
+
+    def should_alert(self, record: ObstacleRecord, now: float) -> bool:
+        """
+        同一個物體在抑制時間內不重複警告，除非距離明顯變近
+        """
+        if not self.suppress_interval or record.alerted_at is None:
+            return True
+        return (
+            now - record.alerted_at >= self.suppress_interval
+            or record.alerted_distance - record.distance >= self.realert_distance
+        )
+
+    def alert_distances(self, records: List[ObstacleRecord], now: float):
+        """
+        從需要警告的物體中找出最近的坑洞與障礙物距離，在警告範圍內的物體記錄為已警告
+        :return: 最近的坑洞距離與障礙物距離，沒有時為inf
+        """
+        distances = {HOLE: math.inf, OBSTACLE: math.inf}
+        for record in records:
+            if not self.should_alert(record, now):
+                continue
+            distances[record.kind] = min(distances[record.kind], record.distance)
+            if record.distance < self.alert_range[record.kind]:
+                record.alerted_at = now
+                record.alerted_distance = record.distance
+        return distances[HOLE], distances[OBSTACLE]
@@ -0,0 +1,252 @@
+import threading
+from typing import Any, List
+
+import cv2
+import numpy as np
+
+from .elevation_view import draw_elevation_view, draw_elevation_view_points
+from .obstacle_tracker import HOLE
+from .utils import draw_square, draw_circle, draw_text, draw_texts
+
+# 每個偵測點的結果
+POINT_DTYPE = np.dtype(
+    [
+        ("color_pixel", np.int32, 2),
+        ("depth_pixel", np.int32, 2),
+        ("height", np.float64),
+        ("dist", np.int64),
+        ("lateral_dist", np.int64),
+        ("depth_point", np.float32, 3),
+        ("valid", bool),
+        ("hole", bool),
+        ("obstacle", bool),
+        ("safe", bool),
+    ]
+)
+
+
+class OverlayFrame:
+    def __init__(
+        self,
+        color_img: np.ndarray,
+        depth_img: np.ndarray,
+        area: np.ndarray,
+        grid: Any,
+        points: np.ndarray,
+        pitch: float,
+        obstacles: List[Any] = (),
+        status: str = None,
+    ):
+        """
+        繪製除錯畫面需要的一幀資料（不會修改傳入的圖片）
+        :param color_img: 彩度圖片
+        :param depth_img: 深度圖片
+        :param area: 檢測區域
+        :param grid: 偵測網格（DetectGrid）
+        :param points: 偵測點結果（POINT_DTYPE）
+        :param pitch: 攝影機俯仰角
+        :param obstacles: 物體（ObstacleRecord）
+        :param status: 顯示在深度圖片上的狀態文字
+        """
+        self.color_img = color_img
+        self.depth_img = depth_img
+        self.area = area
+        self.grid = grid
+        self.points = points
+        self.pitch = pitch
+        self.obstacles = obstacles
+        self.status = status
+
+
+class ObstacleOverlay:
+    def __init__(self, async_render: bool = True, buffer_count: int = 2):
+        """
+        障礙物偵測的除錯畫面（由顯示畫面的一方在需要時呼叫，偵測本身不繪製）
+        回傳的圖片是重複使用的緩衝區，繪製buffer_count - 1次之後會被覆蓋，
+        需要保留更久的呼叫端（例如直接引用圖片記憶體的GUI）要自己複製或增加緩衝區數量
+        :param async_render: 在背景執行緒繪製，呼叫時回傳最近繪製完成的畫面（可能延遲一幀）
+        :param buffer_count: 輪流使用的緩衝區數量（背景繪製時回傳畫面後可能再繪製一次，至少使用3組）
+        """
+        self.async_render = async_render
+
+        # 多組緩衝區輪流使用，回傳的畫面在之後的buffer_count - 1次繪製時不會被覆蓋
+        buffer_count = max(buffer_count, 3 if async_render else 2)
+        self.buffers = [{} for _ in range(buffer_count)]
+        self.buffer_index = 0
+
+        self.latest = None
+        self.requested = None  # 最近一次要求繪製的幀
+        self.pending = None
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+
+    def __call__(self, frame: OverlayFrame):
+        """
+        取得除錯畫面（同一幀重複要求時不重新繪製）
+        :return: 彩度圖片、深度圖片、安全區域、平視圖與熱力圖
+        """
+        if frame is self.requested and self.latest is not None:
+            return self.latest
+        self.requested = frame
+
+        if not self.async_render or self.latest is None:
+            self.latest = self.render(frame)
+            return self.latest
+
+        # 背景繪製時呼叫端可能已經開始修改下一幀的圖片，先複製一份
+        frame.color_img = frame.color_img.copy()
+        frame.depth_img = frame.depth_img.copy()
+        with self.condition:
+            self.pending = frame
+            self.condition.notify()
+        if self.thread is None:
+            self.running = True
+            self.thread = threading.Thread(target=self._render_loop, daemon=True)
+            self.thread.start()
+        return self.latest
+
+    def _render_loop(self):
+        while self.running:
+            with self.condition:
+                while self.pending is None and self.running:
+                    self.condition.wait()
+                frame, self.pending = self.pending, None
+            if frame is not None:
+                self.latest = self.render(frame)
+
+    def stop(self):
+        """
+        停止背景繪製
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _buffer(self, name: str, image: np.ndarray) -> np.ndarray:
+        """
+        將圖片複製到可重複使用的緩衝區
+        """
+        buffers = self.buffers[self.buffer_index]
+        buffer = buffers.get(name)
+        if buffer is None or buffer.shape != image.shape or buffer.dtype != image.dtype:
+            buffer = buffers[name] = np.empty_like(image)
+        np.copyto(buffer, image)
+        return buffer
+
+    def render(self, frame: OverlayFrame):
+        """
+        繪製除錯畫面
+        :return: 彩度圖片、深度圖片、安全區域、平視圖與熱力圖
+        """
+        self.buffer_index = (self.buffer_index + 1) % len(self.buffers)
+        points = frame.points
+        img_height, img_width = frame.color_img.shape[:2]
+
+        color_img = self._buffer("color", frame.color_img)
+        depth_img = self._buffer("depth", frame.depth_img)
+        border_img = self.buffers[self.buffer_index].get("border")
+        if border_img is None or border_img.shape[:2] != (img_height, img_width):
+            border_img = np.zeros((img_height, img_width, 3), np.uint8)
+            self.buffers[self.buffer_index]["border"] = border_img
+        border_img.fill(0)
+
+        color_img = cv2.polylines(color_img, [frame.area], True, (255, 255, 255), 2)
+        elevation_view_img = draw_elevation_view(frame.pitch, 640, 480)
+
+        square_size = 20 if img_height == 480 else 30
+        font_scale = 0.3 if img_height == 480 else 0.5
+
+        valid_points = points[points["valid"]]
+        for point in valid_points:
+            color_pixel = tuple(point["color_pixel"].tolist())
+
+            color = (0, 255, 0)
+            if point["hole"]:
+                color = (0, 0, 255)
+            if point["obstacle"]:
+                color = (0, 255, 255)
+            if point["safe"]:
+                border_img = cv2.circle(border_img, color_pixel, 50, color, -1)
+
+            color_img = draw_square(color_img, color_pixel, color, size=square_size)
+            depth_img = draw_circle(
+                depth_img, tuple(point["depth_pixel"].tolist()), color
+            )
+
+        # 高度、水平距離與橫向距離的文字一次繪製
+        color_pixels = valid_points["color_pixel"]
+        for texts, offset, color in (
+            (valid_points["height"].astype(int), 15, (255, 255, 255)),
+            (valid_points["dist"], 0, (255, 200, 255)),
+            (valid_points["lateral_dist"], -15, (255, 0, 0)),
+        ):
+            color_img = draw_texts(
+                color_img,
+                [str(text) for text in texts.tolist()],
+                color_pixels + [0, offset],
+                color,
+                font_scale,
+            )
+
+        if frame.status:
+            depth_img = draw_text(
+                depth_img, frame.status, (80, 15), (255, 255, 255), font_scale
+            )
+
+        for record in frame.obstacles:
+            x1, y1, x2, y2 = record.extent
+            color = (0, 0, 255) if record.kind == HOLE else (0, 255, 255)
+            color_img = cv2.rectangle(
+                color_img,
+                (x1 - square_size, y1 - square_size),
+                (x2 + square_size, y2 + square_size),
+                color,
+                2,
+            )
+            color_img = draw_text(
+                color_img,
+                f"#{record.id} {record.distance}mm",
+                (x1, y1 - square_size - 10),
+                color,
+                font_scale,
+            )
+
+        # 每一列距離最近的點用於繪製平視圖
+        elevation_view_points = [
+            (
+                points["height"][i],
+                points["dist"][i],
+                points["lateral_dist"][i],
+                points["depth_point"][i],
+            )
+            for i in frame.grid.closest_per_row(
+                points["dist"], points["valid"] & (points["dist"] > 0)
+            )
+        ]
+        elevation_view_img = draw_elevation_view_points(
+            elevation_view_img, elevation_view_points
+        )
+
+        # 放大熱力圖資料
+        heatmap_data = frame.grid.heatmap(points["hole"], points["obstacle"])
+        large_data = cv2.resize(
+            heatmap_data, (img_width, img_height), interpolation=cv2.INTER_LINEAR
+        )
+        large_data[0, 0] = 1
+
+        # 將資料轉換為8位元灰階影像
+        heatmap_data_normalized = cv2.normalize(
+            large_data, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U
+        )
+
+        # 將灰階圖轉換為熱力圖
+        heatmap = cv2.applyColorMap(heatmap_data_normalized, cv2.COLORMAP_JET)
+        heatmap = cv2.addWeighted(heatmap, 0.1, np.zeros_like(heatmap), 1, 0)
+
+        heatmap = cv2.addWeighted(frame.color_img, 1, heatmap, 1, 0)
+
+        return color_img, depth_img, border_img, elevation_view_img, heatmap
@@ -5,35 +5,35 @@ import numpy as np
 
 from src.core.alarm.alarm import Alarm
 from src.core.gui.gui import Gui
+from src.utils.glyph_atlas import GlyphAtlas
 
-alarm = False
-max_obstacle_dist = 0
 
-
-# 是否為有效的坑洞
-def is_hole(od_env, height: int, lateral_dist: float):
-    return abs(lateral_dist) < od_env["lateral_distance_threshold"] and height < od_env["highest_hole_height"]
+# 是否為有效的坑洞（可傳入單一數值或NumPy陣列）
+def is_hole(od_env, height, lateral_dist):
+    return (np.abs(lateral_dist) < od_env["lateral_distance_threshold"]) & (
+        height < od_env["highest_hole_height"]
+    )
 
 
-# 是否為有效的障礙物
-def is_obstacle(od_env, height: int, dist: float, lateral_dist: float):
+# 是否為有效的障礙物（可傳入單一數值或NumPy陣列）
+def is_obstacle(od_env, height, dist, lateral_dist):
     return (
-        abs(lateral_dist) < od_env["lateral_distance_threshold"]
-        and od_env["my_height"] + 5 > height > od_env["lowest_obstacle_height"]
-        and dist < get_max_obstacle_distance(od_env)
+        (np.abs(lateral_dist) < od_env["lateral_distance_threshold"])
+        & (od_env["my_height"] + 5 > height)
+        & (height > od_env["lowest_obstacle_height"])
+        & (dist < get_max_obstacle_distance(od_env))
     )
 
 
-# 是否為有效的安全區域
+# 是否為有效的安全區域（可傳入單一數值或NumPy陣列）
 def is_safe_area(od_env, height):
-    return od_env["lowest_obstacle_height"] > height > od_env["highest_hole_height"]
+    return (od_env["lowest_obstacle_height"] > height) & (
+        height > od_env["highest_hole_height"]
+    )
 
 
 # 初始化偵測點
 def init_detect_points(od_env, img_height, img_width, area, spilt_count=60):
-    global max_obstacle_dist
-    max_obstacle_dist = get_max_obstacle_distance(od_env)
-
     area = np.array(od_env["area"], np.int32)
     detect_points = []
 
@@ -48,27 +48,19 @@ def init_detect_points(od_env, img_height, img_width, area, spilt_count=60):
     return detect_points
 
 
-# 處理消失點（通常會是過遠、過近導致無法取得距離的偵測點）
-def process_missing_points(missing_points_buffer):  # 消失點防抖處理
-    for mp in missing_points_buffer[0]:
-        if all(mp in _ for _ in missing_points_buffer):
-            return mp
-    return -1
-
-
 # 是否需要警報
-def is_warning(warning_preset, distance, message, frequency):
+def is_warning(
+    alarm: Alarm, warning_preset, distance, message, frequency, source=None
+):
     if distance == math.inf:
         return False
     for preset in warning_preset:
         dist, interval, string = preset["distance"], preset["interval"], preset["name"]
 
         if distance < dist:
-            global alarm
-            alarm = True
-
-            Gui.instance.alert_label_1.setText(message.format(distance, string))
-            Alarm.instance.start(message.format(distance, string), interval, frequency)
+            if Gui.instance is not None:
+                Gui.instance.alert_label_1.setText(message.format(distance, string))
+            alarm.start(message.format(distance, string), interval, frequency, source)
             return True
     return False
 
@@ -94,46 +86,62 @@ def draw_circle(image, pixel, color, thickness=1):
     return cv2.circle(image, pixel, 3, color, -1)
 
 
-# 繪製文字
+# 繪製文字（以pixel為中心）
 def draw_text(image, text, pixel, color, font_scale=0.5, thickness=1):
-    font = cv2.FONT_HERSHEY_SIMPLEX
+    atlas = GlyphAtlas.get(font_scale, thickness)
 
     pos_x, pos_y = pixel
-    text_size = cv2.getTextSize(text, font, font_scale, thickness)[0]
-    text_w, text_h = text_size
+    text_w, text_h = atlas.text_size(text)
     text_x, text_y = int(pos_x - text_w / 2), int(pos_y + text_h / 2)
-    return cv2.putText(
-        image,
-        text,
-        (text_x, text_y),
-        font,
-        font_scale,
-        color,
-        thickness,
-    )
+    return atlas.put_text(image, text, (text_x, text_y), color)
+
 
+# 一次繪製多個文字（以pixels為中心）
+def draw_texts(image, texts, pixels, colors, font_scale=0.5, thickness=1):
+    atlas = GlyphAtlas.get(font_scale, thickness)
 
-# 開始警報
+    pixels = np.asarray(pixels, np.float64).reshape(-1, 2)
+    text_sizes = atlas.text_sizes(texts)
+    orgs = (pixels + text_sizes * [-0.5, 0.5]).astype(np.int32)
+    return atlas.put_texts(image, texts, orgs, colors)
+
+
+# 開始警報，回傳是否正在警報（每個偵測器各自保存，多台攝影機可以共用警報）
 def alert(
     od_env,
+    alarm: Alarm,
+    alarming: bool,
     min_hole_distance: float,
     min_obstacle_distance: float,
     missing_point: int = None,
-):
-    global alarm
+    source=None,
+) -> bool:
     if missing_point is not None and missing_point != -1:
-        alarm = True
-        Alarm.instance.start(
-            f"警報：第{missing_point}點缺失", od_env["missing_point_alarm_interval"], 2000
+        alarm.start(
+            f"警報：第{missing_point}點缺失",
+            od_env["missing_point_alarm_interval"],
+            2000,
+            source,
         )
-    elif is_warning(
-        od_env["hole_preset"], min_hole_distance, "距離最近的坑洞\n{}mm ({})", 2500
+        return True
+    if is_warning(
+        alarm,
+        od_env["hole_preset"],
+        min_hole_distance,
+        "距離最近的坑洞\n{}mm ({})",
+        2500,
+        source,
     ):
-        pass
-    elif is_warning(
-        od_env["obstacle_preset"], min_obstacle_distance, "距離最近的障礙\n{}mm ({})", 3000
+        return True
+    if is_warning(
+        alarm,
+        od_env["obstacle_preset"],
+        min_obstacle_distance,
+        "距離最近的障礙\n{}mm ({})",
+        3000,
+        source,
     ):
-        pass
-    elif alarm:
-        alarm = False
-        Alarm.instance.stop()
+        return True
+    if alarming:
+        alarm.stop(source)
+    return False
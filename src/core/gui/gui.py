@@ -1,6 +1,5 @@
 import os
 import threading
-from time import sleep
 
 import cv2
 from PIL import Image
@@ -43,6 +42,10 @@ class SpeechThread(QThread):
 
 class RealSenseThread(QThread):
     frame_data_signal = pyqtSignal(str)
+    # 暫停中的攝影機（以回放檔案區分，None為即時攝影機），再次啟動時直接恢復
+    cameras = {}
+    # 最近一次啟動的執行緒（攝影機在執行緒結束時才暫停，再次啟動前要等它結束）
+    last_thread = None
 
     def __init__(self, config, run_func, file=None):
         super().__init__()
@@ -50,11 +53,25 @@ class RealSenseThread(QThread):
         self.run_func = run_func
         self.file = file
         self.is_running = False
+        self.rs_camera = None
+        # 停止時暫停攝影機而不關閉
+        self.pause_on_stop = config.env["realsense"].get("pause_on_stop", False)
 
     def run(self):
         try:
             self.is_running = True
-            self.rs_camera = RealsenseCamera(self.config, file=self.file)
+            previous = RealSenseThread.last_thread
+            RealSenseThread.last_thread = self
+            if previous is not None and previous is not self:
+                previous.wait()
+
+            self.rs_camera = RealSenseThread.cameras.get(self.file)
+            if self.rs_camera is not None:
+                self.rs_camera.resume()
+            else:
+                self.rs_camera = RealsenseCamera(self.config, file=self.file)
+                if self.pause_on_stop:
+                    RealSenseThread.cameras[self.file] = self.rs_camera
             Gui.instance.toggle_camera_btn.setText('停止')
             Gui.instance.statusbar.showMessage('深度攝影機啟動完畢！')
             Gui.instance.is_streaming = True
@@ -68,21 +85,41 @@ class RealSenseThread(QThread):
                     print(e)
                     self.frame_data_signal.emit(f'錯誤: {e}')
 
+            if self.pause_on_stop:
+                # 目前這一幀處理完之後在這個執行緒暫停，攝影機保持運作
+                self.rs_camera.pause()
+
         except Exception as e:
             print(e)
             self.frame_data_signal.emit(f'錯誤: {e}')
 
     def stop(self):
         self.is_running = False
-        self.rs_camera.pipeline.stop()
-        sleep(0.5)
-        RealsenseCamera.instance = None
+        if self.pause_on_stop:
+            # 暫停由執行緒自己進行，最多等待0.5秒，介面不會被這一幀的處理卡住
+            self.wait(500)
+        else:
+            if self.rs_camera is not None:
+                self.rs_camera.stop()
+            # 等待迴圈結束（取代固定等待0.5秒）
+            self.wait(500)
+            RealsenseCamera.instance = None
         Gui.instance.toggle_camera_btn.setText('啟動')
         Gui.instance.statusbar.showMessage('深度攝影機已停止！')
         Gui.instance.is_streaming = False
         Gui.instance.toggle_camera_btn.setEnabled(True)
         Gui.instance.toggle_camera_btn.setChecked(False)
 
+    @staticmethod
+    def release_cameras():
+        """
+        關閉所有暫停中的攝影機
+        """
+        for rs_camera in RealSenseThread.cameras.values():
+            rs_camera.stop()
+        RealSenseThread.cameras = {}
+
+
 class VideoCaptureThread(QThread):
     frame_data_signal = pyqtSignal(str)
 
@@ -221,6 +258,12 @@ class Gui(QMainWindow):
         return handle_click
 
     def closeEvent(self, event):
+        if not self.is_video_capture:
+            if self.realsense_thread.is_running:
+                self.realsense_thread.is_running = False
+                self.realsense_thread.wait()
+            RealSenseThread.release_cameras()
+
         if self.stop:
             self.stop()
 
@@ -277,7 +320,7 @@ class Gui(QMainWindow):
                 if self.is_video_capture:
                     file_name, _ = QFileDialog.getOpenFileName(self, "選擇要回放的檔案", "", "Video Files (*.mp4 *.avi *.mkv *.mov)")
                 else:
-                    file_name, _ = QFileDialog.getOpenFileName(self, "選擇要回放的檔案", "", "Bag Files (*.bag)")
+                    file_name, _ = QFileDialog.getOpenFileName(self, "選擇要回放的檔案", "", "Bag Files (*.bag);;Session Files (session.json)")
 
                 if not file_name:
                     self.replay_btn.setChecked(False)
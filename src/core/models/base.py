@@ -1,10 +1,10 @@
-from typing import Optional, Dict, Any
+import threading
+from typing import Optional, Dict, Any, Sequence
 
 import numpy as np
 
 from .utils import draw_masks, draw_box, draw_text
 from ..realsense_camera.utils import get_middle_dist
-from ..toml_config import TOMLConfig
 
 
 class DetectionModel:
@@ -23,6 +23,11 @@ class DetectionModel:
         :param model_path: 模型檔案路徑
         """
         self.instance = self
+        self.config_env = config.env["config"]
+        # 多台攝影機共用同一個模型時，同一時間只執行一次推論
+        # （從ModelRegistry載入時改為使用共用模型的鎖）
+        self.lock = threading.Lock()
+        self.handle = None
         self.load_env(config)
         if load_at_init:
             self.model_path = model_path
@@ -58,6 +63,7 @@ class DetectionModel:
             prediction_list: any,
             depth_data: np.ndarray = None,
             mask_alpha: float = 0.4,
+            names: Sequence[str] = None,
     ):
         """
         繪製預測結果
@@ -65,6 +71,7 @@ class DetectionModel:
         :param prediction_list: 預測結果
         :param depth_data: 深度資料
         :param mask_alpha: 遮罩透明度
+        :param names: 標籤顯示的類別名稱（例如中文名稱，預設為模型的類別名稱）
         """
         det_img = image.copy()
 
@@ -85,10 +92,10 @@ class DetectionModel:
             draw_box(det_img, box, color)
 
             # 如果debug模式為關閉狀態，則不顯示標籤，只顯示框線
-            if not TOMLConfig.instance.env["config"]["debug"]:
+            if not self.config_env["debug"]:
                 continue
 
-            label = self.category[class_id]
+            label = names[class_id] if names is not None else self.category[class_id]
             if track_id is not None:
                 caption = f"ID: {track_id} {label} {int(score * 100)}%"
             else:
@@ -0,0 +1,43 @@
+from typing import Any
+
+from .base import DetectionModel
+from .quantization import model_precision
+
+BACKENDS = ("ultralytics", "onnxruntime")
+
+
+def create_detection_model(
+    config: Any, model_path: str, sliced: bool = False
+) -> DetectionModel:
+    """
+    依照設定檔[yolo]的backend建立物件偵測模型（只匯入使用到的後端）
+    :param config: toml設定檔
+    :param model_path: 模型檔案路徑
+    :param sliced: 是否切片預測（小物件，例如行人號誌）
+    """
+    backend = config.env["yolo"].get("backend", "ultralytics")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detection backend: {backend}")
+
+    precision = model_precision(config.env["yolo"], model_path)
+    if backend != "onnxruntime" and precision != "fp32":
+        raise ValueError('Quantized inference requires backend = "onnxruntime"')
+
+    if backend == "onnxruntime":
+        from .yolov8onnx import (
+            Yolov8OnnxDetectionModel,
+            Yolov8OnnxSlicedDetectionModel,
+        )
+
+        if sliced:
+            return Yolov8OnnxSlicedDetectionModel(config, model_path)
+        return Yolov8OnnxDetectionModel(config, model_path)
+
+    if sliced:
+        from .yolov8sahi import Yolov8SahiDetectionModel
+
+        return Yolov8SahiDetectionModel(config, model_path)
+
+    from .yolov8 import Yolov8DetectionModel
+
+    return Yolov8DetectionModel(config, model_path)
@@ -0,0 +1,57 @@
+import numpy as np
+
+from .utils import box_iou
+
+
+class IouTracker:
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 30):
+        """
+        以IoU配對前後幀的框的簡單追蹤器（不依賴ultralytics的追蹤器，ONNX Runtime使用）
+        :param iou_threshold: 與上一次位置的IoU超過此值才視為同一個物體
+        :param max_age: 連續幾幀沒有配對到就移除追蹤
+        """
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.next_id = 1
+        self.ids = np.zeros(0, np.int64)
+        self.boxes = np.zeros((0, 4), np.float32)
+        self.class_ids = np.zeros(0, np.int64)
+        self.ages = np.zeros(0, np.int64)
+
+    def update(self, boxes: np.ndarray, class_ids: np.ndarray) -> np.ndarray:
+        """
+        配對這一幀的框並回傳追蹤編號
+        :param boxes: (N, 4) x1, y1, x2, y2
+        :param class_ids: (N,)
+        :return: (N,) 追蹤編號
+        """
+        track_ids = np.zeros(len(boxes), np.int64)
+        matched = np.zeros(len(self.ids), bool)
+
+        if len(boxes) > 0 and len(self.ids) > 0:
+            ious = box_iou(boxes, self.boxes)
+            # 不同類別的框不配對
+            ious[class_ids[:, None] != self.class_ids[None, :]] = 0
+            # 依IoU由高到低貪婪配對
+            for flat in np.argsort(-ious, axis=None):
+                detection, track = np.unravel_index(flat, ious.shape)
+                if ious[detection, track] < self.iou_threshold:
+                    break
+                if track_ids[detection] or matched[track]:
+                    continue
+                track_ids[detection] = self.ids[track]
+                matched[track] = True
+
+        # 沒有配對到的追蹤變老，超過max_age移除
+        self.ages[matched] = 0
+        self.ages[~matched] += 1
+        alive = ~matched & (self.ages <= self.max_age)
+        new = track_ids == 0
+        track_ids[new] = np.arange(self.next_id, self.next_id + np.count_nonzero(new))
+        self.next_id += int(np.count_nonzero(new))
+
+        self.ids = np.concatenate((self.ids[alive], track_ids))
+        self.boxes = np.concatenate((self.boxes[alive], boxes.astype(np.float32)))
+        self.class_ids = np.concatenate((self.class_ids[alive], class_ids))
+        self.ages = np.concatenate((self.ages[alive], np.zeros(len(boxes), np.int64)))
+        return track_ids
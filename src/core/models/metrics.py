@@ -0,0 +1,113 @@
+import os
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .utils import box_iou
+
+# 一張圖片的預測結果：框 (N, 4)、分數 (N,) 與類別 (N,)
+Detections = Tuple[np.ndarray, np.ndarray, np.ndarray]
+# 一張圖片的標註：框 (M, 4) 與類別 (M,)
+Labels = Tuple[np.ndarray, np.ndarray]
+
+
+def load_labels(label_path: str, img_shape) -> Labels:
+    """
+    讀取YOLO格式的標註（每行為 類別 中心x 中心y 寬 高，座標為0~1）
+    :param label_path: 標註檔案路徑（不存在時視為沒有物體）
+    :param img_shape: 圖片大小
+    :return: 圖片座標的框 x1, y1, x2, y2 與類別
+    """
+    if not os.path.exists(label_path):
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.int64)
+
+    rows = np.loadtxt(label_path, ndmin=2, dtype=np.float32)
+    if rows.size == 0:
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.int64)
+
+    img_height, img_width = img_shape[:2]
+    xy = rows[:, 1:3] * (img_width, img_height)
+    wh = rows[:, 3:5] * (img_width, img_height)
+    boxes = np.concatenate((xy - wh / 2, xy + wh / 2), axis=1)
+    return boxes, rows[:, 0].astype(np.int64)
+
+
+def average_precision(recall: np.ndarray, precision: np.ndarray) -> float:
+    """
+    精確率-召回率曲線下的面積（所有點內插，與VOC/COCO相同）
+    """
+    recall = np.concatenate(([0.0], recall, [1.0]))
+    precision = np.concatenate(([1.0], precision, [0.0]))
+    # 精確率改為右側的最大值，使曲線單調遞減
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    changes = np.flatnonzero(recall[1:] != recall[:-1])
+    return float(np.sum((recall[changes + 1] - recall[changes]) * precision[changes + 1]))
+
+
+def mean_average_precision(
+    detections: Sequence[Detections],
+    labels: Sequence[Labels],
+    iou_thresholds: Sequence[float] = (0.5,),
+) -> float:
+    """
+    所有圖片的mAP（有標註的類別取平均，多個IoU閥值時再取平均，例如mAP50-95）
+    :param detections: 每張圖片的預測結果
+    :param labels: 每張圖片的標註
+    :param iou_thresholds: 預測框與標註框IoU超過此值才算正確
+    """
+    classes = np.unique(np.concatenate([label[1] for label in labels] or [[]]))
+    if len(classes) == 0:
+        return 0.0
+
+    results = []
+    for iou_threshold in iou_thresholds:
+        # 每個預測是否正確（每個標註只能被分數最高的預測配對一次）
+        scores, class_ids, correct = [], [], []
+        for (boxes, image_scores, image_classes), (true_boxes, true_classes) in zip(
+            detections, labels
+        ):
+            order = np.argsort(-image_scores, kind="stable")
+            boxes, image_scores, image_classes = (
+                boxes[order],
+                image_scores[order],
+                image_classes[order],
+            )
+            matched = np.zeros(len(true_boxes), bool)
+            image_correct = np.zeros(len(boxes), bool)
+            if len(boxes) > 0 and len(true_boxes) > 0:
+                ious = box_iou(boxes, true_boxes)
+                ious[image_classes[:, None] != true_classes[None, :]] = 0
+                for index in range(len(boxes)):
+                    candidates = np.where(matched, 0, ious[index])
+                    best = int(np.argmax(candidates))
+                    if candidates[best] >= iou_threshold:
+                        matched[best] = True
+                        image_correct[index] = True
+            scores.append(image_scores)
+            class_ids.append(image_classes)
+            correct.append(image_correct)
+
+        scores = np.concatenate(scores)
+        class_ids = np.concatenate(class_ids)
+        correct = np.concatenate(correct)
+        order = np.argsort(-scores, kind="stable")
+        class_ids, correct = class_ids[order], correct[order]
+
+        precisions = []
+        for class_id in classes:
+            true_count = sum(np.count_nonzero(label[1] == class_id) for label in labels)
+            hits = correct[class_ids == class_id]
+            true_positives = np.cumsum(hits)
+            recall = true_positives / true_count
+            precision = true_positives / np.arange(1, len(hits) + 1)
+            precisions.append(average_precision(recall, precision))
+        results.append(np.mean(precisions))
+
+    return float(np.mean(results))
+
+
+def as_labels(detections: List[Detections]) -> List[Labels]:
+    """
+    以預測結果作為標註（比較量化模型與FP32模型的一致性）
+    """
+    return [(boxes, class_ids) for boxes, _, class_ids in detections]
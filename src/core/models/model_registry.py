@@ -0,0 +1,158 @@
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+# 模型的索引：(模型檔案的絕對路徑, 推論後端, 精度)
+ModelKey = Tuple[str, str, str]
+
+
+def resident_memory() -> int:
+    """
+    目前程序的常駐記憶體（位元組，無法取得時為0）
+    """
+    if sys.platform == "win32":
+        return _windows_working_set()
+
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    # 沒有/proc時（例如macOS）使用最高常駐記憶體，resource只有POSIX系統有
+    try:
+        import resource
+    except ImportError:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS的單位為位元組，其他系統為KB
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _windows_working_set() -> int:
+    """
+    Windows程序的工作集大小（位元組）
+    """
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    if not kernel32.K32GetProcessMemoryInfo(
+        kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+    ):
+        return 0
+    return counters.WorkingSetSize
+
+
+def weights_memory(model: Any) -> int:
+    """
+    模型權重佔用的記憶體（位元組，不是PyTorch模型時為0）
+    """
+    parameters = getattr(model, "parameters", None)
+    if not callable(parameters):
+        return 0
+    try:
+        return sum(p.numel() * p.element_size() for p in parameters())
+    except (AttributeError, TypeError):
+        return 0
+
+
+class ModelHandle:
+    def __init__(self, key: ModelKey, model: Any, memory: int):
+        """
+        共用的模型：同一份權重在程序中只載入一次，所有包裝共用同一個鎖
+        :param key: 模型的索引
+        :param model: 載入的模型
+        :param memory: 載入時增加的常駐記憶體（位元組）
+        """
+        self.key = key
+        self.model = model
+        self.memory = memory
+        self.weights = weights_memory(model)
+        # 同一時間只執行一次推論（多台攝影機、多個偵測器共用同一個模型）
+        self.lock = threading.Lock()
+        # 包裝之間共用的狀態（例如每個影像來源的追蹤器）
+        self.state = {}
+        self.users = 0
+
+    @property
+    def path(self):
+        return self.key[0]
+
+
+class ModelRegistry:
+    lock = threading.Lock()
+    handles: Dict[ModelKey, ModelHandle] = {}
+
+    @staticmethod
+    def make_key(path: str, backend: str, precision: str) -> ModelKey:
+        return os.path.abspath(path), backend, precision
+
+    @classmethod
+    def get(
+        cls,
+        path: str,
+        loader: Callable[[], Any],
+        backend: str = "ultralytics",
+        precision: str = "fp32",
+    ) -> ModelHandle:
+        """
+        取得共用的模型，第一次使用時才以loader載入
+        :param path: 模型檔案路徑
+        :param loader: 載入模型的函式
+        :param backend: 推論後端
+        :param precision: 精度
+        """
+        key = cls.make_key(path, backend, precision)
+        with cls.lock:
+            handle = cls.handles.get(key)
+            if handle is None:
+                before = resident_memory()
+                model = loader()
+                handle = ModelHandle(key, model, max(resident_memory() - before, 0))
+                cls.handles[key] = handle
+                print(
+                    f"Model loaded: {path} ({backend}, {precision}, "
+                    f"{handle.memory / 2 ** 20:.1f} MB)"
+                )
+            handle.users += 1
+            return handle
+
+    @classmethod
+    def memory_report(cls) -> List[Tuple[ModelKey, int, int, int]]:
+        """
+        每個模型的記憶體使用量
+        :return: (模型的索引, 載入時增加的常駐記憶體, 權重大小, 使用中的包裝數量)
+        """
+        with cls.lock:
+            return [
+                (key, handle.memory, handle.weights, handle.users)
+                for key, handle in cls.handles.items()
+            ]
+
+    @classmethod
+    def print_memory_report(cls):
+        for (path, backend, precision), memory, weights, users in cls.memory_report():
+            print(
+                f"{path} ({backend}, {precision}): "
+                f"RSS {memory / 2 ** 20:.1f} MB, weights {weights / 2 ** 20:.1f} MB, "
+                f"{users} user(s)"
+            )
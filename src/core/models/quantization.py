@@ -0,0 +1,165 @@
+import os
+from typing import Any, Iterator, List
+
+import cv2
+import numpy as np
+
+from ..realsense_camera.session import SESSION_META, SessionReader
+from .utils import letterbox_blob
+
+PRECISIONS = ("fp32", "int8_dynamic", "int8_static")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def model_precision(yolo_env: Any, model_path: str) -> str:
+    """
+    模型使用的精度（[yolo]的precision可以是一個字串，或以[yolo]的模型欄位名稱分別設定）
+    :param yolo_env: [yolo]設定
+    :param model_path: 模型檔案路徑
+    """
+    precision = yolo_env.get("precision", "fp32")
+    if isinstance(precision, dict):
+        name = next(
+            (key for key, value in yolo_env.items() if value == model_path), None
+        )
+        precision = precision.get(name, "fp32")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+    return precision
+
+
+def load_images(path: str, count: int = 0) -> Iterator[np.ndarray]:
+    """
+    讀取資料夾中的圖片，或SessionRecorder錄製資料中的彩度幀（BGR）
+    :param path: 圖片資料夾或錄製資料的資料夾
+    :param count: 最多讀取幾張（0為全部，錄製資料會平均取樣）
+    """
+    if os.path.exists(os.path.join(path, SESSION_META)):
+        reader = SessionReader(path)
+        if not reader.has_stream("color"):
+            raise ValueError(f"錄製資料 {path} 沒有彩度影像")
+        step = max(len(reader) // count, 1) if count else 1
+        for index in range(0, len(reader), step)[: count or None]:
+            yield np.ascontiguousarray(reader.image("color", index))
+        return
+
+    names = sorted(
+        name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    for name in names[: count or None]:
+        image = cv2.imread(os.path.join(path, name))
+        if image is not None:
+            yield image
+
+
+class CalibrationImages:
+    def __init__(self, input_name: str, input_size, path: str, count: int):
+        """
+        靜態量化的校正資料（與推論時相同的前處理，ONNX Runtime的CalibrationDataReader介面）
+        :param input_name: 模型輸入名稱
+        :param input_size: 輸入大小 (高, 寬)
+        :param path: 圖片資料夾或錄製資料的資料夾
+        :param count: 校正使用的幀數
+        """
+        self.blobs = [
+            {input_name: letterbox_blob(image, input_size)[0]}
+            for image in load_images(path, count)
+        ]
+        if not self.blobs:
+            raise FileNotFoundError(f"校正資料 {path} 沒有任何圖片")
+        self.index = 0
+
+    def get_next(self):
+        if self.index >= len(self.blobs):
+            return None
+        self.index += 1
+        return self.blobs[self.index - 1]
+
+    def rewind(self):
+        self.index = 0
+
+
+def head_nodes(model: Any) -> List[str]:
+    """
+    最後一層卷積之後的輸出處理節點（框座標與類別分數合併在同一個輸出，
+    量化成同一個範圍時分數會失去精度，這些節點保持FP32）
+    :param model: onnx.ModelProto
+    """
+    producers = {
+        output: node for node in model.graph.node for output in node.output
+    }
+    pending = [output.name for output in model.graph.output]
+    names = set()
+    while pending:
+        node = producers.get(pending.pop())
+        if node is None or node.name in names or node.op_type == "Conv":
+            continue
+        names.add(node.name)
+        pending.extend(node.input)
+    return sorted(names)
+
+
+def quantize_onnx(
+    onnx_path: str,
+    precision: str,
+    calibration: str = "",
+    count: int = 100,
+    imgsz: int = 640,
+) -> str:
+    """
+    將FP32的ONNX模型量化為INT8並快取在模型旁邊（FP32模型比量化檔新時才重新量化）
+    :param onnx_path: FP32的ONNX檔案路徑
+    :param precision: 精度（fp32直接回傳原本的檔案）
+    :param calibration: int8_static校正用的圖片資料夾或錄製資料
+    :param count: 校正使用的幀數
+    :param imgsz: 模型輸入大小不固定時，校正圖片使用的輸入大小
+    :return: 量化後的ONNX檔案路徑
+    """
+    if precision == "fp32":
+        return onnx_path
+
+    stem = os.path.splitext(onnx_path)[0]
+    output_path = f"{stem}_{precision}.onnx"
+    if os.path.exists(output_path) and os.path.getmtime(
+        output_path
+    ) >= os.path.getmtime(onnx_path):
+        return output_path
+
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime import quantization
+
+    # 先做形狀推論與圖最佳化，量化的結果比較穩定（不固定的維度不需要符號形狀推論也能量化）
+    prepared_path = f"{stem}_prepared.onnx"
+    quantization.quant_pre_process(onnx_path, prepared_path, skip_symbolic_shape=True)
+    try:
+        if precision == "int8_dynamic":
+            quantization.quantize_dynamic(
+                prepared_path, output_path, weight_type=quantization.QuantType.QUInt8
+            )
+        else:
+            if not calibration:
+                raise ValueError("int8_static需要設定[yolo]的calibration")
+            model_input = ort.InferenceSession(
+                onnx_path, providers=["CPUExecutionProvider"]
+            ).get_inputs()[0]
+            # 匯出時沒有固定大小的維度為字串
+            input_size = tuple(model_input.shape[2:4])
+            if not all(isinstance(size, int) for size in input_size):
+                input_size = (imgsz, imgsz)
+            nodes_to_exclude = head_nodes(onnx.load(prepared_path))
+            quantization.quantize_static(
+                prepared_path,
+                output_path,
+                CalibrationImages(model_input.name, input_size, calibration, count),
+                quant_format=quantization.QuantFormat.QDQ,
+                per_channel=True,
+                activation_type=quantization.QuantType.QUInt8,
+                weight_type=quantization.QuantType.QInt8,
+                nodes_to_exclude=nodes_to_exclude,
+            )
+    finally:
+        os.remove(prepared_path)
+
+    print(f"Model quantized: {output_path}")
+    return output_path
@@ -0,0 +1,151 @@
+import math
+from typing import Any, Callable, List, Tuple
+
+import numpy as np
+
+from .utils import box_intersection
+
+# 一張圖片的預測結果：框 (N, 4)、分數 (N,) 與類別 (N,)
+Detections = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def slice_boxes(
+    img_height: int,
+    img_width: int,
+    slice_height: int,
+    slice_width: int,
+    overlap_height_ratio: float,
+    overlap_width_ratio: float,
+) -> np.ndarray:
+    """
+    切片的位置（與sahi.slicing.get_slice_bboxes相同，邊緣的切片往內移動保持完整大小）
+    :return: (K, 4) x1, y1, x2, y2，由上到下、由左到右
+    """
+
+    def starts(size, slice_size, overlap_ratio):
+        step = slice_size - int(overlap_ratio * slice_size)
+        count = 1 + max(math.ceil((size - slice_size) / step), 0)
+        ends = np.minimum(np.arange(count) * step + slice_size, size)
+        return np.maximum(ends - slice_size, 0), ends
+
+    x1, x2 = starts(img_width, slice_width, overlap_width_ratio)
+    y1, y2 = starts(img_height, slice_height, overlap_height_ratio)
+    columns, rows = np.meshgrid(np.arange(len(x1)), np.arange(len(y1)))
+    columns, rows = columns.ravel(), rows.ravel()
+    return np.stack((x1[columns], y1[rows], x2[columns], y2[rows]), axis=1)
+
+
+def greedy_nmm(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    class_ids: np.ndarray,
+    match_threshold: float = 0.5,
+) -> Detections:
+    """
+    合併相鄰切片重複偵測到的物體（與SAHI預設的GREEDYNMM與IOS相同）：
+    分數最高的框合併同類別、交集佔較小框比例超過閥值的框，合併後的框為聯集
+    :param boxes: (N, 4) x1, y1, x2, y2
+    :param scores: (N,)
+    :param class_ids: (N,)
+    :param match_threshold: 交集除以較小框的面積超過此值時合併
+    """
+    order = np.argsort(-scores, kind="stable")
+    boxes, scores, class_ids = boxes[order], scores[order], class_ids[order]
+    areas = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1)
+
+    merged_boxes = []
+    keep = []
+    remaining = np.arange(len(boxes))
+    while len(remaining) > 0:
+        index, others = remaining[0], remaining[1:]
+        intersection = box_intersection(boxes[index : index + 1], boxes[others])[0]
+        smaller = np.maximum(np.minimum(areas[index], areas[others]), 1e-9)
+        match = (intersection / smaller >= match_threshold) & (
+            class_ids[others] == class_ids[index]
+        )
+        group = boxes[np.concatenate(([index], others[match]))]
+        merged_boxes.append(
+            np.concatenate((group[:, :2].min(axis=0), group[:, 2:].max(axis=0)))
+        )
+        keep.append(index)
+        remaining = others[~match]
+
+    keep = np.array(keep, np.intp)
+    return (
+        np.array(merged_boxes, np.float32).reshape(-1, 4),
+        scores[keep],
+        class_ids[keep],
+    )
+
+
+def sliced_detect(
+    detect_batch: Callable[[List[np.ndarray]], List[Detections]],
+    img: np.ndarray,
+    slice_height: int,
+    slice_width: int,
+    overlap_height_ratio: float,
+    overlap_width_ratio: float,
+    batch_size: int = 0,
+    standard_prediction: bool = True,
+    match_threshold: float = 0.5,
+) -> Detections:
+    """
+    切片預測：所有切片（與整張圖片）組成批次一起推論，再將結果移回原圖座標並合併
+    :param detect_batch: 批次預測的函式（回傳每張圖片的框、分數與類別）
+    :param img: 圖片
+    :param slice_height: 切片高度
+    :param slice_width: 切片寬度
+    :param overlap_height_ratio: 高度重疊比例
+    :param overlap_width_ratio: 寬度重疊比例
+    :param batch_size: 每次推論的圖片數量（0為全部一起推論）
+    :param standard_prediction: 是否同時預測整張圖片（大物體不會被切開）
+    :param match_threshold: 合併重複偵測的閥值
+    """
+    img_height, img_width = img.shape[:2]
+    tiles = slice_boxes(
+        img_height,
+        img_width,
+        slice_height,
+        slice_width,
+        overlap_height_ratio,
+        overlap_width_ratio,
+    )
+    images = [np.ascontiguousarray(img[y1:y2, x1:x2]) for x1, y1, x2, y2 in tiles]
+    offsets = tiles[:, [0, 1, 0, 1]].astype(np.float32)
+    if standard_prediction:
+        images.append(img)
+        offsets = np.concatenate((offsets, np.zeros((1, 4), np.float32)))
+
+    batch_size = batch_size or len(images)
+    detections = []
+    for start in range(0, len(images), batch_size):
+        detections.extend(detect_batch(images[start : start + batch_size]))
+
+    boxes = np.concatenate(
+        [d[0].reshape(-1, 4) + offset for d, offset in zip(detections, offsets)]
+    )
+    scores = np.concatenate([d[1] for d in detections])
+    class_ids = np.concatenate([d[2] for d in detections]).astype(np.int64)
+    return greedy_nmm(boxes, scores, class_ids, match_threshold)
+
+
+def sliced_predict(model: Any, img: np.ndarray, sahi_env: Any, **kwargs):
+    """
+    以設定檔[sahi]的切片設定預測（參數可以覆寫設定）
+    :param model: 有detect_batch的檢測模型
+    :param img: 圖片
+    :param sahi_env: [sahi]設定
+    :return: (類別, 框, 分數) 的列表
+    """
+    setting = {
+        "slice_height": sahi_env.get("slice_height", 256),
+        "slice_width": sahi_env.get("slice_width", 256),
+        "overlap_height_ratio": sahi_env.get("overlap_height_ratio", 0.2),
+        "overlap_width_ratio": sahi_env.get("overlap_width_ratio", 0.2),
+        "batch_size": sahi_env.get("batch_size", 0),
+        "standard_prediction": sahi_env.get("standard_prediction", True),
+        "match_threshold": sahi_env.get("match_threshold", 0.5),
+    }
+    setting.update({key: value for key, value in kwargs.items() if value is not None})
+    boxes, scores, class_ids = sliced_detect(model.detect_batch, img, **setting)
+    return list(zip(class_ids.tolist(), boxes, scores.tolist()))
@@ -3,6 +3,9 @@ from typing import Tuple, Any, Optional, Dict
 import cv2
 import numpy as np
 
+from src.utils.glyph_atlas import GlyphAtlas
+
+
 def draw_box(
     image: np.ndarray,
     box: np.ndarray,
@@ -22,26 +25,17 @@ def draw_text(
     text_thickness: int = 2,
 ) -> np.ndarray:
     x1, y1, x2, y2 = box.astype(int)
-    (tw, th), _ = cv2.getTextSize(
-        text=text,
-        fontFace=cv2.FONT_HERSHEY_SIMPLEX,
-        fontScale=font_size,
-        thickness=text_thickness,
+
+    # 使用字元圖集繪製，類別名稱的中文字也可以正常顯示
+    atlas = GlyphAtlas.get(
+        font_size, text_thickness, cv2.FONT_HERSHEY_SIMPLEX, cv2.LINE_AA
     )
+    tw, th = atlas.text_size(text)
     th = int(th * 1.2)
 
     cv2.rectangle(image, (x1, y1), (x1 + tw, y1 + th), color, -1)
 
-    return cv2.putText(
-        image,
-        text,
-        (x1, y1 + th),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        font_size,
-        (255, 255, 255),
-        text_thickness,
-        cv2.LINE_AA,
-    )
+    return atlas.put_text(image, text, (x1, y1 + th), (255, 255, 255))
 
 
 def draw_masks(
@@ -61,3 +55,112 @@ def draw_masks(
         cv2.rectangle(mask_img, (x1, y1), (x2, y2), color, -1)
 
     return cv2.addWeighted(mask_img, mask_alpha, image, 1 - mask_alpha, 0)
+
+
+def letterbox(
+    image: np.ndarray, size: Tuple[int, int], color: int = 114
+) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    等比例縮放並在兩側補邊到模型的輸入大小（與ultralytics的LetterBox相同）
+    :param image: 原始圖片
+    :param size: 輸入大小 (高, 寬)
+    :param color: 補邊的顏色
+    :return: 縮放後的圖片、縮放比例與左上角的補邊 (x, y)
+    """
+    img_height, img_width = image.shape[:2]
+    ratio = min(size[0] / img_height, size[1] / img_width)
+    new_width, new_height = round(img_width * ratio), round(img_height * ratio)
+    pad_x, pad_y = (size[1] - new_width) / 2, (size[0] - new_height) / 2
+
+    if (new_width, new_height) != (img_width, img_height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    left, top = round(pad_x - 0.1), round(pad_y - 0.1)
+    right, bottom = round(pad_x + 0.1), round(pad_y + 0.1)
+    image = cv2.copyMakeBorder(
+        image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(color,) * 3
+    )
+    return image, ratio, (left, top)
+
+
+def letterbox_blob(image: np.ndarray, size: Tuple[int, int]):
+    """
+    模型的輸入：補邊縮放、BGR轉RGB並正規化為 (1, 3, 高, 寬) 的float32
+    :param image: 原始圖片（BGR）
+    :param size: 輸入大小 (高, 寬)
+    :return: 輸入、縮放比例與左上角的補邊 (x, y)
+    """
+    image, ratio, pad = letterbox(image, size)
+    return cv2.dnn.blobFromImage(image, 1 / 255, swapRB=True), ratio, pad
+
+
+def box_intersection(boxes: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """
+    兩組框兩兩之間的交集面積
+    :param boxes: (N, 4) x1, y1, x2, y2
+    :param others: (M, 4) x1, y1, x2, y2
+    :return: (N, M)
+    """
+    top_left = np.maximum(boxes[:, None, :2], others[None, :, :2])
+    bottom_right = np.minimum(boxes[:, None, 2:], others[None, :, 2:])
+    return np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+
+
+def box_iou(boxes: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """
+    兩組框兩兩之間的IoU
+    :param boxes: (N, 4) x1, y1, x2, y2
+    :param others: (M, 4) x1, y1, x2, y2
+    :return: (N, M)
+    """
+    intersection = box_intersection(boxes, others)
+    area = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1)
+    other_area = np.prod(others[:, 2:] - others[:, :2], axis=1)
+    return intersection / np.maximum(area[:, None] + other_area[None, :] - intersection, 1e-9)
+
+
+def nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    iou_threshold: float,
+    max_det: int = 300,
+) -> np.ndarray:
+    """
+    非極大值抑制（不分類別）
+    :param boxes: (N, 4) x1, y1, x2, y2
+    :param scores: (N,)
+    :param iou_threshold: 與保留的框IoU超過此值的框會被移除
+    :param max_det: 最多保留幾個框
+    :return: 保留的框的索引（依分數由高到低）
+    """
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while len(order) > 0 and len(keep) < max_det:
+        index = order[0]
+        keep.append(index)
+        ious = box_iou(boxes[index : index + 1], boxes[order[1:]])[0]
+        order = order[1:][ious <= iou_threshold]
+    return np.array(keep, np.intp)
+
+
+def update_track_history(
+    track_history: Dict[int, list], track_ids, boxes: np.ndarray, max_length: int = 30
+):
+    """
+    將這一幀的框加入追蹤記錄（依追蹤編號分組，每個編號只加入與裁切一次）
+    :param track_history: 追蹤記錄（追蹤編號 -> 框的列表，通常為defaultdict(list)）
+    :param track_ids: 每個框的追蹤編號
+    :param boxes: (N, 4) x1, y1, x2, y2
+    :param max_length: 每個編號只保留最近幾幀
+    """
+    track_ids = np.asarray(track_ids, np.int64)
+    if len(track_ids) == 0:
+        return
+
+    order = np.argsort(track_ids, kind="stable")
+    unique_ids, starts = np.unique(track_ids[order], return_index=True)
+    groups = np.split(np.asarray(boxes)[order], starts[1:])
+    for track_id, group in zip(unique_ids.tolist(), groups):
+        track = track_history[track_id]
+        track.extend(group)
+        if len(track) > max_length:
+            del track[:-max_length]
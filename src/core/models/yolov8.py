@@ -1,9 +1,25 @@
-from typing import Any
+import copy
+from typing import Any, List
 
 import numpy as np
 from ultralytics import YOLO
+from ultralytics.utils import callbacks
 
 from .base import DetectionModel
+from .model_registry import ModelRegistry
+from .utils import update_track_history
+
+
+def prediction_model(model: Any):
+    """
+    共用權重但有自己predictor的YOLO（同一個模型也用來追蹤時，
+    追蹤器註冊在模型上的callback不會影響一般的預測）
+    """
+    model = copy.copy(model)
+    model.predictor = None
+    model.callbacks = callbacks.get_default_callbacks()
+    model.overrides = dict(model.overrides)
+    return model
 
 
 class Yolov8DetectionModel(DetectionModel):
@@ -13,12 +29,12 @@ class Yolov8DetectionModel(DetectionModel):
             self.confidence_threshold = self.yolo_env["confidence_threshold"]
 
     def load_model(self):
-        """ "
-        檢測模型已經初始化並成功設定為 self.model
-        （需要利用self.model_path、self.config_path和self.device）
         """
-        self.set_model(YOLO(self.model_path))
-        print(f"Model loaded: {self.model_path}")
+        從ModelRegistry取得共用的模型（相同的權重只載入一次）
+        """
+        self.handle = ModelRegistry.get(self.model_path, lambda: YOLO(self.model_path))
+        self.lock = self.handle.lock
+        self.set_model(self.handle.model)
 
     def set_model(self, model: Any):
         """
@@ -26,55 +42,108 @@ class Yolov8DetectionModel(DetectionModel):
         :param model: A YOLOv8 model
         """
 
-        self.model = YOLO(self.model_path)
+        self.model = model
         self.category = self.model.names
+        # 每個影像來源的追蹤器（共用模型時所有包裝都要看到同一份記錄）
+        self.tracking = self.handle.state if self.handle is not None else {}
+        self.tracking.setdefault("trackers", {})
+        self.tracking.setdefault("active_stream", None)
 
     @staticmethod
     def _process_object_prediction(prediction_list: Any, track_history):
         """
-        處理物件預測結果
+        處理物件預測結果（每個結果的所有框一次複製到NumPy，不逐一讀取張量）
         :param prediction_list: 物件預測結果
+        :param track_history: 追蹤記錄
         """
-        class_ids = []
-        boxes = []
-        scores = []
-        track_ids = []
+        predictions = []
 
         for result in prediction_list:
-            detection_count = result.boxes.shape[0]
-            for i in range(detection_count):
-                class_id = int(result.boxes.cls[i].item())
-                box = result.boxes.xyxy[i].cpu().numpy()
-                score = float(result.boxes.conf[i].item())
-                track_id = 0
+            # 沒有追蹤編號的結果不回傳
+            if result.boxes.id is None or track_history is None:
+                continue
 
-                if result.boxes.id is None:
-                    continue
+            # 追蹤結果的每一列為 x1, y1, x2, y2, 追蹤編號, 信心度, 類別
+            data = result.boxes.data.cpu().numpy()
+            boxes = data[:, :4]
+            track_ids = data[:, -3].astype(np.int64).tolist()
+            scores = data[:, -2].tolist()
+            class_ids = data[:, -1].astype(np.int64).tolist()
 
-                if track_history is not None:
-                    track_id = result.boxes.id[i].int().cpu().item()
-                    track = track_history[track_id]
+            update_track_history(track_history, track_ids, boxes)
 
-                    track.append(box)  # x, y center point
-                    if len(track) > 30:  # retain 90 tracks for 90 frames
-                        track.pop(0)
+            predictions.extend(zip(class_ids, boxes, scores, track_ids))
 
-                    track_ids.append(track_id)
+        return predictions
 
-                class_ids.append(class_id)
-                boxes.append(box)
-                scores.append(score)
+    def _use_trackers(self, stream: Any):
+        """
+        切換為某個影像來源的追蹤器（追蹤器保存在ultralytics的predictor上，
+        多台攝影機共用模型時每台攝影機需要各自的追蹤器）
+        """
+        trackers = self.tracking["trackers"]
+        active_stream = self.tracking["active_stream"]
+        predictor = getattr(self.model, "predictor", None)
+        if predictor is None or stream == active_stream:
+            self.tracking["active_stream"] = stream
+            return
+
+        if hasattr(predictor, "trackers"):
+            trackers[active_stream] = predictor.trackers
+            del predictor.trackers
+        # 沒有追蹤器時ultralytics會在下一次追蹤時建立新的追蹤器
+        if stream in trackers:
+            predictor.trackers = trackers[stream]
+        self.tracking["active_stream"] = stream
+
+    def detect_batch(self, images: List[np.ndarray]):
+        """
+        一次推論預測多張圖片中的物件（不追蹤）
+        :param images: 圖片
+        :return: 每張圖片的框 (N, 4)、分數 (N,) 與類別 (N,)
+        """
+        with self.lock:
+            if "prediction_model" not in self.tracking:
+                self.tracking["prediction_model"] = prediction_model(self.model)
+            results = self.tracking["prediction_model"].predict(
+                images,
+                conf=self.confidence_threshold,
+                iou=0.5,
+                agnostic_nms=True,
+                verbose=False,
+            )
 
-        return list(zip(class_ids, boxes, scores, track_ids))
+        detections = []
+        for result in results:
+            # 預測結果的每一列為 x1, y1, x2, y2, 信心度, 類別
+            data = result.boxes.data.cpu().numpy()
+            detections.append((data[:, :4], data[:, -2], data[:, -1].astype(np.int64)))
+        return detections
 
-    def __call__(self, img: np.ndarray, track_history):
+    def predict(self, img: np.ndarray):
         """
-        預測圖片中的物件（track函數必須傳入 persist=True ，否則畫面都是單獨運算）
+        預測圖片中的物件（不追蹤）
         :param img: 圖片
+        :return: (類別, 框, 分數) 的列表
         """
+        boxes, scores, class_ids = self.detect_batch([img])[0]
+        return list(zip(class_ids.tolist(), boxes, scores.tolist()))
 
-        return self._process_object_prediction(
-            self.model.track(
+    def __call__(self, img: np.ndarray, track_history=None, stream: Any = None):
+        """
+        預測圖片中的物件（track函數必須傳入 persist=True ，否則畫面都是單獨運算）
+        :param img: 圖片
+        :param track_history: 追蹤記錄（None為不追蹤，回傳 (類別, 框, 分數)）
+        :param stream: 影像來源（共用模型時用來區分每台攝影機的追蹤器，預設為這個包裝）
+        """
+        if track_history is None:
+            return self.predict(img)
+
+        if stream is None:
+            stream = self
+        with self.lock:
+            self._use_trackers(stream)
+            results = self.model.track(
                 img,
                 conf=self.confidence_threshold,
                 iou=0.5,
@@ -82,6 +151,6 @@ class Yolov8DetectionModel(DetectionModel):
                 verbose=False,
                 persist=True,
                 tracker='botsort.yaml'
-            ),
-            track_history
-        )
+            )
+
+        return self._process_object_prediction(results, track_history)
@@ -0,0 +1,251 @@
+import ast
+import os
+from typing import Any, List
+
+import numpy as np
+
+from .base import DetectionModel
+from .iou_tracker import IouTracker
+from .model_registry import ModelRegistry
+from .quantization import model_precision, quantize_onnx
+from .slicer import sliced_predict
+from .utils import letterbox_blob, nms, update_track_history
+
+
+def onnx_export_path(model_path: str, imgsz: int = 640, dynamic: bool = False) -> str:
+    """
+    匯出的ONNX檔案路徑（.onnx檔直接使用）
+    :param model_path: 模型檔案路徑
+    :param imgsz: 輸入大小
+    :param dynamic: 批次維度不固定（切片預測一次推論所有切片）
+    """
+    if model_path.endswith(".onnx"):
+        return model_path
+    suffix = "_dynamic" if dynamic else ""
+    return f"{os.path.splitext(model_path)[0]}_{imgsz}{suffix}.onnx"
+
+
+def export_onnx(model_path: str, imgsz: int = 640, dynamic: bool = False) -> str:
+    """
+    將.pt權重匯出為ONNX並快取在模型旁邊（權重比匯出檔新時才重新匯出）
+    :param model_path: 模型檔案路徑（.onnx檔直接使用）
+    :param imgsz: 輸入大小
+    :param dynamic: 批次維度不固定（切片預測一次推論所有切片）
+    :return: ONNX檔案路徑
+    """
+    onnx_path = onnx_export_path(model_path, imgsz, dynamic)
+    if onnx_path == model_path:
+        return model_path
+
+    if os.path.exists(onnx_path) and os.path.getmtime(onnx_path) >= os.path.getmtime(
+        model_path
+    ):
+        return onnx_path
+
+    # 只有匯出時需要ultralytics與PyTorch
+    from ultralytics import YOLO
+
+    # ultralytics的dynamic同時讓批次與輸入大小不固定，推論時仍以imgsz補邊縮放
+    exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=dynamic)
+    os.replace(exported, onnx_path)
+    print(f"Model exported: {onnx_path}")
+    return onnx_path
+
+
+class Yolov8OnnxDetectionModel(DetectionModel):
+    # 匯出批次維度不固定的模型（detect_batch一次推論多張圖片）
+    dynamic_batch_export = False
+
+    def load_env(self, config: Any):
+        self.yolo_env = config.env["yolo"]
+        self.imgsz = self.yolo_env.get("imgsz", 640)
+        self.iou_threshold = self.yolo_env.get("iou_threshold", 0.5)
+
+    def load_model(self):
+        """
+        從ModelRegistry取得共用的ONNX Runtime工作階段（第一次使用時匯出並載入）
+        """
+        import onnxruntime as ort
+
+        self.precision = model_precision(self.yolo_env, self.model_path)
+        export_path = onnx_export_path(
+            self.model_path, self.imgsz, self.dynamic_batch_export
+        )
+        loaded = {}
+
+        def load():
+            # 量化模型同樣快取在模型旁邊，校正只需要做一次
+            loaded["onnx_path"] = quantize_onnx(
+                export_onnx(self.model_path, self.imgsz, self.dynamic_batch_export),
+                self.precision,
+                self.yolo_env.get("calibration", ""),
+                self.yolo_env.get("calibration_count", 100),
+                self.imgsz,
+            )
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.intra_op_num_threads = self.yolo_env.get("onnx_threads", 0)
+            return ort.InferenceSession(
+                loaded["onnx_path"], options, providers=["CPUExecutionProvider"]
+            )
+
+        # 以匯出的檔案區分，固定批次與不固定批次的模型分別載入
+        self.handle = ModelRegistry.get(
+            export_path, load, backend="onnxruntime", precision=self.precision
+        )
+        self.handle.state.update(loaded)
+        # 實際載入的ONNX檔（量化時為量化後的檔案）
+        self.onnx_path = self.handle.state["onnx_path"]
+        self.lock = self.handle.lock
+        self.set_model(self.handle.model)
+        if self.yolo_env.get("confidence_threshold") is not None:
+            self.confidence_threshold = self.yolo_env["confidence_threshold"]
+
+    def set_model(self, model: Any):
+        """
+        設置ONNX Runtime工作階段
+        :param model: onnxruntime.InferenceSession
+        """
+        self.model = model
+        model_input = model.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        # 匯出時沒有固定大小的維度為字串
+        self.input_size = (
+            (height, width) if isinstance(height, int) else (self.imgsz, self.imgsz)
+        )
+        self.dynamic_batch = not isinstance(batch, int)
+
+        # ultralytics匯出時將類別名稱存在metadata
+        names = model.get_modelmeta().custom_metadata_map.get("names")
+        if names:
+            self.category = ast.literal_eval(names)
+        else:
+            num_classes = model.get_outputs()[0].shape[1] - 4
+            self.category = {i: str(i) for i in range(num_classes)}
+
+        # 每個影像來源的追蹤器（共用模型時所有包裝都要看到同一份記錄）
+        self.tracking = self.handle.state if self.handle is not None else {}
+        self.tracking.setdefault("trackers", {})
+
+    def _postprocess(self, output: np.ndarray, img_shape, ratio, pad):
+        """
+        輸出 (1, 4 + 類別數, N) 轉換為原始圖片座標的框，再進行非極大值抑制
+        """
+        predictions = output[0].T
+        class_scores = predictions[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+
+        keep = scores > self.confidence_threshold
+        predictions, class_ids, scores = predictions[keep], class_ids[keep], scores[keep]
+
+        # 中心點與寬高轉換為左上與右下，並去除補邊與縮放
+        xy, wh = predictions[:, :2], predictions[:, 2:4]
+        boxes = np.concatenate((xy - wh / 2, xy + wh / 2), axis=1)
+        boxes -= np.array([pad[0], pad[1], pad[0], pad[1]], np.float32)
+        boxes /= ratio
+        img_height, img_width = img_shape[:2]
+        np.clip(boxes[:, 0::2], 0, img_width, out=boxes[:, 0::2])
+        np.clip(boxes[:, 1::2], 0, img_height, out=boxes[:, 1::2])
+
+        keep = nms(boxes, scores, self.iou_threshold)
+        return boxes[keep], scores[keep], class_ids[keep]
+
+    def detect(self, img: np.ndarray):
+        """
+        預測圖片中的物件
+        :param img: 圖片（BGR）
+        :return: 框 (N, 4)、分數 (N,) 與類別 (N,)
+        """
+        blob, ratio, pad = letterbox_blob(img, self.input_size)
+        with self.lock:
+            output = self.model.run(None, {self.input_name: blob})[0]
+        return self._postprocess(output, img.shape, ratio, pad)
+
+    def detect_batch(self, images: List[np.ndarray]):
+        """
+        預測多張圖片中的物件（模型的批次維度不固定時一次推論，否則逐張推論）
+        :param images: 圖片（BGR）
+        :return: 每張圖片的框 (N, 4)、分數 (N,) 與類別 (N,)
+        """
+        if not self.dynamic_batch:
+            return [self.detect(img) for img in images]
+
+        inputs = [letterbox_blob(img, self.input_size) for img in images]
+        with self.lock:
+            output = self.model.run(
+                None, {self.input_name: np.concatenate([blob for blob, _, _ in inputs])}
+            )[0]
+        return [
+            self._postprocess(output[i : i + 1], img.shape, ratio, pad)
+            for i, (img, (_, ratio, pad)) in enumerate(zip(images, inputs))
+        ]
+
+    def predict(self, img: np.ndarray):
+        """
+        預測圖片中的物件（不追蹤）
+        :param img: 圖片
+        :return: (類別, 框, 分數) 的列表
+        """
+        boxes, scores, class_ids = self.detect(img)
+        return list(zip(class_ids.tolist(), boxes, scores.tolist()))
+
+    def __call__(self, img: np.ndarray, track_history=None, stream: Any = None):
+        """
+        預測圖片中的物件，有追蹤記錄時同時追蹤（與Yolov8DetectionModel相同的回傳格式）
+        :param img: 圖片
+        :param track_history: 追蹤記錄（None為不追蹤，回傳 (類別, 框, 分數)）
+        :param stream: 影像來源（共用模型時用來區分每台攝影機的追蹤器，預設為這個包裝）
+        """
+        if track_history is None:
+            return self.predict(img)
+
+        boxes, scores, class_ids = self.detect(img)
+
+        if stream is None:
+            stream = self
+        trackers = self.tracking["trackers"]
+        with self.lock:
+            if stream not in trackers:
+                trackers[stream] = IouTracker()
+            track_ids = trackers[stream].update(boxes, class_ids).tolist()
+
+        update_track_history(track_history, track_ids, boxes)
+
+        return list(zip(class_ids.tolist(), boxes, scores.tolist(), track_ids))
+
+
+class Yolov8OnnxSlicedDetectionModel(Yolov8OnnxDetectionModel):
+    # 所有切片組成一個批次推論
+    dynamic_batch_export = True
+
+    def load_env(self, config: Any):
+        super().load_env(config)
+        self.sahi_env = config.env["sahi"]
+
+    def __call__(
+        self,
+        img: np.ndarray,
+        slice_height: int = None,
+        slice_width: int = None,
+        overlap_height_ratio: float = None,
+        overlap_width_ratio: float = None,
+    ):
+        """
+        切片預測圖片中的物件（與Yolov8SahiDetectionModel相同的介面）
+        :param img: 圖片
+        :param slice_height: 切片高度
+        :param slice_width: 切片寬度
+        :param overlap_height_ratio: 高度重疊比例
+        :param overlap_width_ratio: 寬度重疊比例
+        """
+        return sliced_predict(
+            self,
+            img,
+            self.sahi_env,
+            slice_height=slice_height,
+            slice_width=slice_width,
+            overlap_height_ratio=overlap_height_ratio,
+            overlap_width_ratio=overlap_width_ratio,
+        )
@@ -0,0 +1,180 @@
+import threading
+from typing import Any, List
+
+import cv2
+import numpy as np
+
+from src.core.alarm.alarm import Alarm
+from src.core.detect_object.detect_object import DetectObject
+from src.core.detect_obstacle.detect_obstacle import DetectObstacle
+from src.core.models.base import DetectionModel
+from src.core.realsense_camera.realsense_camera import RealsenseCamera
+
+# 每台攝影機可以覆寫的設定區塊
+CAMERA_SECTIONS = ("realsense", "obstacle_detection", "depth_filter")
+
+
+class CameraConfig:
+    def __init__(self, config: Any, camera_env: dict, index: int = 0):
+        """
+        單一攝影機的設定：共用的設定加上[[cameras]]中這台攝影機覆寫的欄位
+        （與TOMLConfig有相同的env用法，可以直接傳給RealsenseCamera與各個偵測器）
+        :param config: toml設定檔
+        :param camera_env: [[cameras]]中的一項
+        :param index: 攝影機的順序（沒有設定名稱時使用）
+        """
+        self.name = camera_env.get("name", f"camera {index}")
+        self.env = dict(config.env)
+        for section in CAMERA_SECTIONS:
+            env = dict(config.env.get(section, {}))
+            env.update(camera_env.get(section, {}))
+            self.env[section] = env
+
+        for key in ("serial", "replay"):
+            if key in camera_env:
+                self.env["realsense"][key] = camera_env[key]
+
+
+class CameraPipeline:
+    def __init__(
+        self,
+        config: CameraConfig,
+        alarm: Alarm = None,
+        model: DetectionModel = None,
+    ):
+        """
+        一台攝影機的處理流程（取幀、姿態、障礙物偵測與物件偵測），在自己的執行緒執行
+        :param config: 這台攝影機的設定
+        :param alarm: 共用的警報
+        :param model: 共用的物件偵測模型（None為不偵測物件）
+        """
+        self.config = config
+        self.name = config.name
+        self.camera = RealsenseCamera(config)
+        self.detect_obstacle = DetectObstacle(config, self.camera, alarm)
+        self.detect_object = None
+        if model is not None:
+            self.detect_object = DetectObject(
+                config, config.env["yolo"]["model"], self.camera, model, alarm
+            )
+
+        self.lock = threading.Lock()
+        self.color_image = None  # 最新一幀的彩度圖片（行人號誌偵測使用）
+        self.prediction_list = []
+        self.frame_count = 0
+        self.error = None
+
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                self.process(self.camera.wait_for_frames())
+            except Exception as e:
+                if not self.running:
+                    break
+                self.error = e
+                print(f"{self.name}: {e}")
+
+    def process(self, frames: Any):
+        """
+        處理一組幀（NumPy與OpenCV在計算時會釋放GIL，多台攝影機可以同時使用多個核心）
+        """
+        depth_frame = frames.get_depth_frame()
+        color_frame = frames.get_color_frame()
+        if not depth_frame or not color_frame:
+            return
+
+        if not self.camera.combined_angle(frames):
+            return
+        self.camera.update_camera_height(depth_frame)
+
+        depth_image = np.asanyarray(depth_frame.get_data())
+        color_image = np.asanyarray(color_frame.get_data())
+        depth_colormap = None
+        debug_color_image = None
+        if self.config.env["config"]["debug"]:
+            depth_colormap = cv2.applyColorMap(
+                cv2.convertScaleAbs(depth_image, alpha=0.03), cv2.COLORMAP_JET
+            )
+            # 除錯畫面在顯示時才繪製，彩度圖片的緩衝區在那之前可能已被相機重複使用
+            debug_color_image = color_image.copy()
+
+        self.detect_obstacle(depth_frame, debug_color_image, depth_colormap)
+
+        prediction_list = []
+        if self.detect_object is not None:
+            prediction_list = self.detect_object(color_image, depth_frame)
+
+        with self.lock:
+            self.color_image = color_image
+            self.prediction_list = prediction_list
+            self.frame_count += 1
+
+    def latest(self):
+        """
+        最新一幀的繪製結果與物件偵測結果（除錯畫面在這裡才繪製）
+        """
+        with self.lock:
+            prediction_list = self.prediction_list
+        return self.detect_obstacle.debug_images(), prediction_list
+
+    def latest_color_image(self):
+        """
+        最新一幀彩度圖片的複本（還沒有處理過任何幀時為None）
+        """
+        with self.lock:
+            color_image = self.color_image
+        return color_image.copy() if color_image is not None else None
+
+    def stop(self):
+        self.running = False
+        self.camera.stop()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.detect_obstacle.stop()
+
+
+class MultiCamera:
+    def __init__(
+        self,
+        config: Any,
+        alarm: Alarm = None,
+        model: DetectionModel = None,
+    ):
+        """
+        同時執行多台攝影機（設定檔的[[cameras]]，沒有設定時為一台攝影機）
+        每台攝影機在自己的執行緒處理，共用同一個警報與物件偵測模型
+        :param config: toml設定檔
+        :param alarm: 共用的警報
+        :param model: 共用的物件偵測模型（None為不偵測物件）
+        """
+        cameras = config.env.get("cameras") or [{}]
+        self.pipelines: List[CameraPipeline] = []
+        try:
+            for index, camera_env in enumerate(cameras):
+                self.pipelines.append(
+                    CameraPipeline(CameraConfig(config, camera_env, index), alarm, model)
+                )
+        except Exception:
+            self.stop()
+            raise
+
+    @property
+    def obstacle_detectors(self) -> List[DetectObstacle]:
+        return [pipeline.detect_obstacle for pipeline in self.pipelines]
+
+    def start(self):
+        for pipeline in self.pipelines:
+            pipeline.start()
+
+    def stop(self):
+        for pipeline in self.pipelines:
+            pipeline.stop()
@@ -0,0 +1,120 @@
+from typing import Any
+
+import numpy as np
+
+from src.core.realsense_camera.camera_model import (
+    CameraIntrinsics,
+    CameraExtrinsics,
+    get_ray_grid,
+    project_points,
+)
+
+_EMPTY = np.iinfo(np.uint16).max
+
+
+class DepthAligner:
+    def __init__(
+        self,
+        depth_scale: float,
+        depth_intrin: CameraIntrinsics,
+        color_intrin: CameraIntrinsics,
+        depth_to_color_extrin: CameraExtrinsics,
+        decimation: int = 0,
+    ):
+        """
+        將深度圖片對齊到彩度圖片（與rs.align(rs.stream.color)相同的用途）
+        每個深度像素的射線在建立時就轉換到彩度攝影機座標，每幀只需要乘上深度再投影，
+        多個深度像素落在同一個位置時保留最近的深度
+        :param depth_scale: 深度單位（公尺）
+        :param depth_intrin: 深度攝影機內參
+        :param color_intrin: 彩度攝影機內參
+        :param depth_to_color_extrin: 深度攝影機到彩度攝影機的外參
+        :param decimation: 對齊後的圖片每decimation×decimation個彩度像素為一個像素，
+                           0為依照兩個攝影機的焦距自動選擇（避免深度像素不足產生空洞）
+        """
+        if decimation <= 0:
+            decimation = max(1, int(color_intrin.fx / depth_intrin.fx))
+
+        self.depth_intrin = depth_intrin
+        self.color_intrin = color_intrin
+        self.decimation = decimation
+        # 對齊後圖片的內參（視野與彩度圖片相同）
+        self.intrin = color_intrin.binned(decimation)
+        self.key = self.make_key(
+            depth_scale, depth_intrin, color_intrin, depth_to_color_extrin, decimation
+        )
+
+        # 深度原始值為1時，每個深度像素在彩度攝影機座標中的方向
+        # 以 (3, height * width) 存放，每幀的乘法都是連續的記憶體
+        rays = get_ray_grid(depth_intrin).reshape(-1, 3)
+        self.directions = np.ascontiguousarray(
+            (rays @ depth_to_color_extrin.rotation.T).T * np.float32(depth_scale)
+        )
+        self.translation = depth_to_color_extrin.translation
+        self.points = np.empty_like(self.directions)
+
+    @staticmethod
+    def make_key(
+        depth_scale, depth_intrin, color_intrin, depth_to_color_extrin, decimation
+    ):
+        return (
+            depth_scale,
+            depth_intrin.key,
+            color_intrin.key,
+            depth_to_color_extrin.key,
+            decimation,
+        )
+
+    def __call__(self, depth_image: np.ndarray) -> np.ndarray:
+        """
+        :param depth_image: 深度圖片（z16）
+        :return: 對齊後的深度圖片 (self.intrin.height, self.intrin.width)，
+                 彩度像素 (x, y) 的深度為 aligned[y // decimation, x // decimation]
+        """
+        depths = depth_image.reshape(-1)
+        # 所有像素一起計算比先挑出有深度的像素快（避免不連續的記憶體存取）
+        scale = depths.astype(np.float32)
+        for axis in range(3):
+            np.multiply(self.directions[axis], scale, out=self.points[axis])
+            self.points[axis] += self.translation[axis]
+
+        pixels = project_points(self.color_intrin, self.points.T)
+        with np.errstate(invalid="ignore"):
+            # 像素中心為整數座標，先四捨五入再合併為對齊後的像素
+            columns = np.floor((pixels[:, 0] + 0.5) / self.decimation)
+            rows = np.floor((pixels[:, 1] + 0.5) / self.decimation)
+            valid = np.flatnonzero(
+                (depths > 0)
+                & (columns >= 0)
+                & (columns < self.intrin.width)
+                & (rows >= 0)
+                & (rows < self.intrin.height)
+            )
+
+        aligned = np.full(self.intrin.height * self.intrin.width, _EMPTY, np.uint16)
+        indices = rows[valid].astype(np.intp) * self.intrin.width + columns[
+            valid
+        ].astype(np.intp)
+        # 前方的物體會遮住後方的物體
+        np.minimum.at(aligned, indices, depths[valid])
+        aligned[aligned == _EMPTY] = 0
+        return aligned.reshape(self.intrin.height, self.intrin.width)
+
+    def depth_at(self, aligned: np.ndarray, color_pixels: Any) -> np.ndarray:
+        """
+        取得彩度像素的深度（O(1)，超出圖片時為0）
+        :param aligned: 對齊後的深度圖片
+        :param color_pixels: 彩度像素點 (N, 2)
+        """
+        color_pixels = np.asarray(color_pixels, np.intp).reshape(-1, 2)
+        columns = color_pixels[:, 0] // self.decimation
+        rows = color_pixels[:, 1] // self.decimation
+        inside = (
+            (columns >= 0)
+            & (columns < self.intrin.width)
+            & (rows >= 0)
+            & (rows < self.intrin.height)
+        )
+        depths = np.zeros(len(color_pixels), aligned.dtype)
+        depths[inside] = aligned[rows[inside], columns[inside]]
+        return depths
@@ -0,0 +1,72 @@
+import json
+import os
+from typing import Optional, Sequence, Tuple
+
+from src.core.realsense_camera.camera_model import CameraIntrinsics, CameraExtrinsics
+
+# 深度比例、深度內參、彩度內參、深度到彩度外參、彩度到深度外參
+Calibration = Tuple[
+    float, CameraIntrinsics, CameraIntrinsics, CameraExtrinsics, CameraExtrinsics
+]
+
+
+def calibration_key(
+    device_id: str, streams: Sequence[str], firmware_version: str = ""
+) -> str:
+    """
+    快取的索引（同一台攝影機在相同的韌體與串流設定下相機參數通常不會改變，
+    重新校正之後由RealsenseSource.refresh_calibration更新）
+    :param device_id: 攝影機序號（回放時沒有序號則使用檔案路徑）
+    :param streams: 每個影像串流的設定，例如 "Depth:640x480:z16@15"
+    :param firmware_version: 韌體版本（更新韌體會重寫校正資料）
+    """
+    return "|".join([device_id, firmware_version, *sorted(streams)])
+
+
+class CalibrationCache:
+    def __init__(self, path: str):
+        """
+        保存在檔案中的相機參數快取，啟動攝影機時不需要再向裝置查詢
+        :param path: 快取檔案路徑（json）
+        """
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError):
+                # 快取損毀時重新查詢並覆寫
+                self.entries = {}
+
+    def get(self, key: str) -> Optional[Calibration]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return (
+            entry["depth_scale"],
+            CameraIntrinsics.from_dict(entry["depth_intrin"]),
+            CameraIntrinsics.from_dict(entry["color_intrin"]),
+            CameraExtrinsics.from_dict(entry["depth_to_color_extrin"]),
+            CameraExtrinsics.from_dict(entry["color_to_depth_extrin"]),
+        )
+
+    def put(self, key: str, calibration: Calibration):
+        depth_scale, depth_intrin, color_intrin, depth_to_color, color_to_depth = (
+            calibration
+        )
+        self.entries[key] = {
+            "depth_scale": depth_scale,
+            "depth_intrin": depth_intrin.to_dict(),
+            "color_intrin": color_intrin.to_dict(),
+            "depth_to_color_extrin": depth_to_color.to_dict(),
+            "color_to_depth_extrin": color_to_depth.to_dict(),
+        }
+
+        # 先寫入暫存檔再取代，避免寫到一半中斷時留下損毀的快取
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.entries, file, indent=2)
+        os.replace(temp_path, self.path)
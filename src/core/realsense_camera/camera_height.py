@@ -0,0 +1,89 @@
+import math
+from collections import deque
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from src.core.realsense_camera.camera_model import CameraIntrinsics, deproject_pixels
+
+
+class CameraHeightEstimator:
+    def __init__(self, rs_env: Any, publish: Callable[[int], None] = None):
+        """
+        持續估計攝影機高度：每一幀在深度圖片下方取固定數量的地板取樣點，
+        以IMU推算的上方計算攝影機到地板的距離，再取最近幾幀的中位數（不需要將攝影機朝正下方）
+        :param rs_env: 深度攝影機設定
+        :param publish: 高度變化超過容許值時呼叫的函式（參數為高度，公分）
+        """
+        self.patch_size = rs_env.get("camera_height_patch", 16)
+        self.window = deque(maxlen=rs_env.get("camera_height_window", 30))
+        self.tolerance = rs_env.get("camera_height_tolerance", 2)
+        self.min_height, self.max_height = rs_env.get("camera_height_range", [30, 200])
+        self.min_angle = rs_env.get("camera_height_min_angle", 15)
+        self.min_valid = rs_env.get("camera_height_min_valid", 0.3)
+        self.publish = publish
+
+        self.height = None  # 最近一次發布的高度（公分）
+        self.estimate = None  # 目前的估計值（公分）
+
+        self.intrin = None
+        self.pixels = None
+        self.rays = None
+
+    def _prepare(self, depth_intrin: CameraIntrinsics):
+        """
+        深度圖片下半部中央的固定取樣點與對應的射線（內參改變時重新計算）
+        """
+        if self.intrin == depth_intrin:
+            return
+        self.intrin = depth_intrin
+        xs = np.linspace(0.25, 0.75, self.patch_size) * (depth_intrin.width - 1)
+        ys = np.linspace(0.55, 0.95, self.patch_size) * (depth_intrin.height - 1)
+        grid_x, grid_y = np.meshgrid(xs.round(), ys.round())
+        self.pixels = np.stack((grid_x.ravel(), grid_y.ravel()), axis=-1).astype(np.int32)
+        self.rays = deproject_pixels(
+            depth_intrin, self.pixels, np.ones(len(self.pixels))
+        ).astype(np.float64)
+
+    def __call__(
+        self, depth_image: np.ndarray, depth_intrin: CameraIntrinsics, pitch: float
+    ) -> Optional[int]:
+        """
+        加入一幀並更新估計值（每幀的計算量固定）
+        :param depth_image: 深度圖片
+        :param depth_intrin: 深度攝影機內參
+        :param pitch: 攝影機俯仰角（-90為水平）
+        :return: 有發布新的高度時回傳高度（公分），否則為None
+        """
+        self._prepare(depth_intrin)
+
+        # 攝影機座標中朝上的方向（與depth_pixel_to_height相同的假設，不考慮翻滾角）
+        pitch_radians = math.radians(pitch + 90)
+        up = np.array([0, -math.cos(pitch_radians), math.sin(pitch_radians)])
+
+        depths = depth_image[self.pixels[:, 1], self.pixels[:, 0]].astype(np.float64)
+        along_up = self.rays @ up
+        # 只使用往下看超過min_angle的射線，接近水平的射線誤差太大
+        downward = -along_up / np.linalg.norm(self.rays, axis=1)
+        heights = -depths * along_up / 10
+
+        valid = (
+            (depths > 0)
+            & (downward >= math.sin(math.radians(self.min_angle)))
+            & (heights >= self.min_height)
+            & (heights <= self.max_height)
+        )
+        if np.count_nonzero(valid) < self.min_valid * len(valid):
+            return None
+
+        self.window.append(float(np.median(heights[valid])))
+        if len(self.window) < self.window.maxlen // 2:
+            return None
+        self.estimate = float(np.median(self.window))
+
+        if self.height is not None and abs(self.estimate - self.height) <= self.tolerance:
+            return None
+        self.height = round(self.estimate)
+        if self.publish is not None:
+            self.publish(self.height)
+        return self.height
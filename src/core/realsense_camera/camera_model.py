@@ -0,0 +1,375 @@
+from typing import Any, Sequence, Tuple
+
+import numpy as np
+
+# 支援的畸變模型（名稱與pyrealsense2的rs.distortion相同）
+DISTORTION_NONE = "none"
+BROWN_CONRADY = "brown_conrady"
+INVERSE_BROWN_CONRADY = "inverse_brown_conrady"
+MODIFIED_BROWN_CONRADY = "modified_brown_conrady"
+
+_ray_grids = {}
+
+
+class CameraIntrinsics:
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        ppx: float,
+        ppy: float,
+        fx: float,
+        fy: float,
+        model: str = DISTORTION_NONE,
+        coeffs: Sequence[float] = (0, 0, 0, 0, 0),
+    ):
+        """
+        攝影機內參（不依賴pyrealsense2）
+        :param width: 圖片寬度
+        :param height: 圖片高度
+        :param ppx: 主點x座標
+        :param ppy: 主點y座標
+        :param fx: x方向焦距
+        :param fy: y方向焦距
+        :param model: 畸變模型
+        :param coeffs: Brown-Conrady畸變係數 [k1, k2, p1, p2, k3]
+        """
+        if model not in (
+            DISTORTION_NONE,
+            BROWN_CONRADY,
+            INVERSE_BROWN_CONRADY,
+            MODIFIED_BROWN_CONRADY,
+        ):
+            raise ValueError(f"不支援的畸變模型: {model}")
+
+        self.width = int(width)
+        self.height = int(height)
+        self.ppx = float(ppx)
+        self.ppy = float(ppy)
+        self.fx = float(fx)
+        self.fy = float(fy)
+        self.model = model
+        self.coeffs = tuple(float(c) for c in coeffs)
+
+    @classmethod
+    def from_rs(cls, intrin: Any):
+        """
+        從pyrealsense2的rs.intrinsics建立內參
+        """
+        return cls(
+            intrin.width,
+            intrin.height,
+            intrin.ppx,
+            intrin.ppy,
+            intrin.fx,
+            intrin.fy,
+            intrin.model.name,
+            intrin.coeffs,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "width": self.width,
+            "height": self.height,
+            "ppx": self.ppx,
+            "ppy": self.ppy,
+            "fx": self.fx,
+            "fy": self.fy,
+            "model": self.model,
+            "coeffs": list(self.coeffs),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(**data)
+
+    def decimated(self, step: int):
+        """
+        每隔step個像素取一個後的內參（image[::step, ::step]）
+        """
+        if step <= 1:
+            return self
+        return CameraIntrinsics(
+            -(-self.width // step),
+            -(-self.height // step),
+            self.ppx / step,
+            self.ppy / step,
+            self.fx / step,
+            self.fy / step,
+            self.model,
+            self.coeffs,
+        )
+
+    def binned(self, factor: int):
+        """
+        每factor×factor個像素合併為一個後的內參（新像素的中心為合併區塊的中心）
+        """
+        if factor <= 1:
+            return self
+        return CameraIntrinsics(
+            self.width // factor,
+            self.height // factor,
+            (self.ppx - (factor - 1) / 2) / factor,
+            (self.ppy - (factor - 1) / 2) / factor,
+            self.fx / factor,
+            self.fy / factor,
+            self.model,
+            self.coeffs,
+        )
+
+    @property
+    def key(self):
+        return (
+            self.width,
+            self.height,
+            self.ppx,
+            self.ppy,
+            self.fx,
+            self.fy,
+            self.model,
+            self.coeffs,
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, CameraIntrinsics) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return (
+            f"CameraIntrinsics({self.width}x{self.height}, p=({self.ppx}, {self.ppy}), "
+            f"f=({self.fx}, {self.fy}), {self.model}, {list(self.coeffs)})"
+        )
+
+
+class CameraExtrinsics:
+    def __init__(self, rotation: np.ndarray, translation: np.ndarray):
+        """
+        攝影機外參（point_to = rotation @ point_from + translation）
+        :param rotation: 旋轉矩陣 (3, 3)
+        :param translation: 平移向量 (3,)，單位為公尺
+        """
+        self.rotation = np.asarray(rotation, np.float32).reshape(3, 3)
+        self.translation = np.asarray(translation, np.float32).reshape(3)
+
+    @classmethod
+    def from_rs(cls, extrin: Any):
+        """
+        從pyrealsense2的rs.extrinsics建立外參（rs的旋轉矩陣為column-major）
+        """
+        return cls(np.array(extrin.rotation).reshape(3, 3).T, extrin.translation)
+
+    def to_dict(self) -> dict:
+        return {
+            "rotation": self.rotation.tolist(),
+            "translation": self.translation.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data["rotation"], data["translation"])
+
+    def inverse(self):
+        rotation = self.rotation.T
+        return CameraExtrinsics(rotation, -rotation @ self.translation)
+
+    @property
+    def key(self):
+        return tuple(self.rotation.ravel().tolist()), tuple(self.translation.tolist())
+
+    def __eq__(self, other):
+        return isinstance(other, CameraExtrinsics) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+
+def _undistort(intrin: CameraIntrinsics, x: np.ndarray, y: np.ndarray):
+    """
+    反畸變需要迭代至收斂（與librealsense相同使用10次）
+    """
+    if intrin.model not in (BROWN_CONRADY, INVERSE_BROWN_CONRADY):
+        return x, y
+
+    coeffs = np.asarray(intrin.coeffs, np.float32)
+    inverse = intrin.model == INVERSE_BROWN_CONRADY
+    xo, yo = x, y
+    for _ in range(10):
+        r2 = x * x + y * y
+        icdist = 1 / (1 + ((coeffs[4] * r2 + coeffs[1]) * r2 + coeffs[0]) * r2)
+        xq, yq = (x / icdist, y / icdist) if inverse else (x, y)
+        delta_x = 2 * coeffs[2] * xq * yq + coeffs[3] * (r2 + 2 * xq * xq)
+        delta_y = 2 * coeffs[3] * xq * yq + coeffs[2] * (r2 + 2 * yq * yq)
+        x = (xo - delta_x) * icdist
+        y = (yo - delta_y) * icdist
+    return x, y
+
+
+def deproject_pixels(
+    intrin: CameraIntrinsics, pixels: np.ndarray, depths: np.ndarray
+) -> np.ndarray:
+    """
+    批次將像素座標與深度轉換為三維座標（與rs2_deproject_pixel_to_point相同的計算）
+    :param intrin: 攝影機內參
+    :param pixels: 像素座標 (..., 2)
+    :param depths: 深度 (...)
+    :return: 三維座標 (..., 3)
+    """
+    if intrin.model == MODIFIED_BROWN_CONRADY:
+        raise ValueError("無法從modified_brown_conrady的影像反投影")
+
+    pixels = np.asarray(pixels, np.float32)
+    depths = np.asarray(depths, np.float32)
+
+    x = (pixels[..., 0] - np.float32(intrin.ppx)) / np.float32(intrin.fx)
+    y = (pixels[..., 1] - np.float32(intrin.ppy)) / np.float32(intrin.fy)
+    x, y = _undistort(intrin, x, y)
+
+    return np.stack((depths * x, depths * y, np.broadcast_to(depths, x.shape)), axis=-1)
+
+
+def project_points(intrin: CameraIntrinsics, points: np.ndarray) -> np.ndarray:
+    """
+    批次將三維座標投影為像素座標（與rs2_project_point_to_pixel相同的計算）
+    :param intrin: 攝影機內參
+    :param points: 三維座標 (..., 3)
+    :return: 像素座標 (..., 2)，深度為0時為nan
+    """
+    points = np.asarray(points, np.float32)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = points[..., 0] / points[..., 2]
+        y = points[..., 1] / points[..., 2]
+
+    if intrin.model != DISTORTION_NONE:
+        coeffs = np.asarray(intrin.coeffs, np.float32)
+        r2 = x * x + y * y
+        f = 1 + coeffs[0] * r2 + coeffs[1] * r2 * r2 + coeffs[4] * r2 * r2 * r2
+        xf, yf = x * f, y * f
+
+        # Brown-Conrady的切向畸變使用未縮放的座標，其餘模型使用縮放後的座標
+        if intrin.model != BROWN_CONRADY:
+            x, y = xf, yf
+        dx = xf + 2 * coeffs[2] * x * y + coeffs[3] * (r2 + 2 * x * x)
+        dy = yf + 2 * coeffs[3] * x * y + coeffs[2] * (r2 + 2 * y * y)
+        x, y = dx, dy
+
+    return np.stack((x * intrin.fx + intrin.ppx, y * intrin.fy + intrin.ppy), axis=-1)
+
+
+def transform_points(extrin: CameraExtrinsics, points: np.ndarray) -> np.ndarray:
+    """
+    批次將三維座標轉換到另一個攝影機的座標系（與rs2_transform_point_to_point相同的計算）
+    :param extrin: 攝影機外參
+    :param points: 三維座標 (..., 3)
+    :return: 轉換後的三維座標 (..., 3)
+    """
+    points = np.asarray(points, np.float32)
+    return points @ extrin.rotation.T + extrin.translation
+
+
+def get_ray_grid(intrin: CameraIntrinsics) -> np.ndarray:
+    """
+    取得每個像素深度為1時的三維座標（每種解析度與內參只計算一次）
+    :param intrin: 攝影機內參
+    :return: 射線方向 (height, width, 3)
+    """
+    ray_grid = _ray_grids.get(intrin.key)
+    if ray_grid is None:
+        v, u = np.mgrid[0 : intrin.height, 0 : intrin.width]
+        pixels = np.stack((u, v), axis=-1)
+        ray_grid = deproject_pixels(intrin, pixels, np.ones(pixels.shape[:2]))
+        ray_grid.setflags(write=False)
+        _ray_grids[intrin.key] = ray_grid
+    return ray_grid
+
+
+def deproject_depth_pixels(
+    intrin: CameraIntrinsics, depth_pixels: np.ndarray, depths: np.ndarray
+) -> np.ndarray:
+    """
+    使用射線表將整數深度像素轉換為三維座標（結果與deproject_pixels相同）
+    :param intrin: 攝影機內參
+    :param depth_pixels: 圖片內的整數像素座標 (N, 2)
+    :param depths: 深度 (N,)
+    :return: 三維座標 (N, 3)
+    """
+    rays = get_ray_grid(intrin)[depth_pixels[:, 1], depth_pixels[:, 0]]
+    return rays * np.asarray(depths, np.float32)[:, None]
+
+
+def deproject_depth_image(
+    intrin: CameraIntrinsics, depth_image: np.ndarray, depth_scale: float = 1.0
+) -> np.ndarray:
+    """
+    將整張深度圖轉換為點雲
+    :param intrin: 深度攝影機內參
+    :param depth_image: 深度圖片
+    :param depth_scale: 深度單位
+    :return: 點雲 (height, width, 3)
+    """
+    depths = depth_image.astype(np.float32) * np.float32(depth_scale)
+    return get_ray_grid(intrin) * depths[..., None]
+
+
+def epipolar_line(
+    depth_intrin: CameraIntrinsics,
+    color_intrin: CameraIntrinsics,
+    color_to_depth: CameraExtrinsics,
+    from_pixel: Tuple[float, float],
+    depth_min: float,
+    depth_max: float,
+) -> np.ndarray:
+    """
+    取得彩度像素在深度圖上的極線（每次沿主軸移動一個像素，與librealsense的搜尋方式相同）
+    :return: 極線上的候選深度像素 (L, 2)
+    """
+    points = deproject_pixels(
+        color_intrin, np.array([from_pixel, from_pixel]), np.array([depth_min, depth_max])
+    )
+    start, end = project_points(depth_intrin, transform_points(color_to_depth, points))
+    bound = np.array([depth_intrin.width, depth_intrin.height], np.float32)
+    start, end = np.clip(start, 0, bound), np.clip(end, 0, bound)
+
+    delta = end - start
+    axis = 0 if abs(delta[0]) > abs(delta[1]) else 1
+    steps = int(abs(delta[axis])) + 1
+    step = delta / max(abs(delta[axis]), 1)
+    step[axis] = 1 if delta[axis] >= 0 else -1
+    return start + np.arange(steps, dtype=np.float32)[:, None] * step
+
+
+def project_color_pixel_to_depth_pixel(
+    depth_image: np.ndarray,
+    depth_scale: float,
+    depth_min: float,
+    depth_max: float,
+    depth_intrin: CameraIntrinsics,
+    color_intrin: CameraIntrinsics,
+    color_to_depth: CameraExtrinsics,
+    depth_to_color: CameraExtrinsics,
+    from_pixel: Tuple[float, float],
+) -> Tuple[float, float]:
+    """
+    沿著極線搜尋投影回彩度圖後最接近的深度像素（與rs2_project_color_pixel_to_depth_pixel相同）
+    :return: 深度像素座標，找不到時為 (-1, -1)
+    """
+    line = epipolar_line(
+        depth_intrin, color_intrin, color_to_depth, from_pixel, depth_min, depth_max
+    )
+    columns = np.minimum(line[:, 0].astype(np.int32), depth_intrin.width - 1)
+    rows = np.minimum(line[:, 1].astype(np.int32), depth_intrin.height - 1)
+    depths = depth_image[rows, columns].astype(np.float32) * np.float32(depth_scale)
+
+    has_depth = depths > 0
+    if not has_depth.any():
+        return -1, -1
+
+    line, depths = line[has_depth], depths[has_depth]
+    projected = project_points(
+        color_intrin,
+        transform_points(depth_to_color, deproject_pixels(depth_intrin, line, depths)),
+    )
+    dist = np.sum((projected - np.asarray(from_pixel, np.float32)) ** 2, axis=-1)
+    best = np.argmin(dist)
+    return float(line[best, 0]), float(line[best, 1])
@@ -0,0 +1,127 @@
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from src.core.realsense_camera.frame_source import motion_frames
+
+# IMU樣本 (時間戳記, 加速度儀 (x, y, z), 陀螺儀 (x, y, z))
+ImuSample = Tuple[float, Tuple[float, float, float], Tuple[float, float, float]]
+
+
+def imu_sample(frames: Any) -> Optional[ImuSample]:
+    """
+    從一組幀取出IMU樣本（沒有IMU幀時回傳None）
+    """
+    accel_frame, gyro_frame = motion_frames(frames)
+    if not accel_frame or not gyro_frame:
+        return None
+    accel = accel_frame.as_motion_frame().get_motion_data()
+    gyro = gyro_frame.as_motion_frame().get_motion_data()
+    return (
+        frames.get_timestamp(),
+        (accel.x, accel.y, accel.z),
+        (gyro.x, gyro.y, gyro.z),
+    )
+
+
+class LatestFrameCapture:
+    def __init__(self, read: Callable[[int], Any], timeout_ms: int = 5000):
+        """
+        在背景執行緒持續讀取幀，只保留最新的一組幀（單一緩衝區），
+        處理不及的舊幀會被丟棄並計數，但其中的IMU樣本都會保留
+        :param read: 讀取一組幀的函式（參數為等待時間，毫秒）
+        :param timeout_ms: 背景執行緒每次讀取的等待時間（毫秒）
+        """
+        self.read = read
+        self.timeout_ms = timeout_ms
+
+        self.condition = threading.Condition()
+        self.latest = None
+        self.imu_samples: List[ImuSample] = []
+        self.error = None
+
+        self.captured = 0  # 讀取到的幀數
+        self.delivered = 0  # 交給呼叫端的幀數
+        self.dropped = 0  # 沒有被處理就被新幀取代的幀數
+
+        self.running = False
+        self.thread = None
+        # 暫停時背景執行緒不讀取幀
+        self.active = threading.Event()
+        self.active.set()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.thread.start()
+
+    def _capture_loop(self):
+        while self.running:
+            if not self.active.wait(0.1):
+                continue
+            try:
+                frames = self.read(self.timeout_ms)
+                sample = imu_sample(frames)
+            except Exception as e:
+                if not self.running:
+                    break
+                with self.condition:
+                    self.error = e
+                    self.condition.notify_all()
+                # 讀取失敗時稍後重試（例如攝影機暫時沒有畫面）
+                time.sleep(0.1)
+                continue
+
+            with self.condition:
+                if self.latest is not None:
+                    self.dropped += 1
+                self.latest = frames
+                if sample is not None:
+                    self.imu_samples.append(sample)
+                self.captured += 1
+                self.condition.notify_all()
+
+    def get(self, timeout_ms: int = 5000):
+        """
+        取得最新的一組幀（沒有新幀時等待）
+        :param timeout_ms: 等待時間（毫秒）
+        :return: 最新的一組幀與上一次取得後累積的IMU樣本
+        """
+        deadline = time.monotonic() + timeout_ms / 1000
+        with self.condition:
+            while self.latest is None:
+                if self.error is not None:
+                    error, self.error = self.error, None
+                    raise error
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RuntimeError(f"Frame didn't arrive within {timeout_ms}")
+                self.condition.wait(remaining)
+
+            frames, self.latest = self.latest, None
+            imu_samples, self.imu_samples = self.imu_samples, []
+            self.delivered += 1
+        return frames, imu_samples
+
+    def pause(self):
+        self.active.clear()
+
+    def resume(self):
+        """
+        恢復背景讀取（丟棄暫停前留下的幀與IMU樣本）
+        """
+        with self.condition:
+            self.latest = None
+            self.imu_samples = []
+            self.error = None
+        self.active.set()
+
+    def stop(self):
+        """
+        停止背景讀取
+        （先將running設為False再停止幀來源，可以讓正在等待的讀取立即結束）
+        """
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(self.timeout_ms / 1000)
+            self.thread = None
@@ -0,0 +1,228 @@
+import math
+import random
+from typing import Any, Callable, Tuple
+
+import numpy as np
+
+from src.core.realsense_camera.camera_model import (
+    CameraIntrinsics,
+    CameraExtrinsics,
+    deproject_pixels,
+    transform_points,
+    project_points,
+    epipolar_line,
+)
+
+
+class ColorDepthCorrespondence:
+    def __init__(
+        self,
+        rs_env: Any,
+        depth_scale: float,
+        depth_intrin: CameraIntrinsics,
+        color_intrin: CameraIntrinsics,
+        color_to_depth_extrin: CameraExtrinsics,
+        depth_to_color_extrin: CameraExtrinsics,
+        color_pixels: np.ndarray,
+    ):
+        """
+        彩度像素對應深度像素的快取表
+        每個偵測點沿著極線（depth_min到depth_max）預先算好所有候選深度像素與其對應的深度，
+        每幀只需要讀取候選像素的深度，找出與預期深度最一致的候選點即可
+        :param rs_env: realsense設定
+        :param depth_scale: 深度單位（公尺）
+        :param depth_intrin: 深度攝影機內參
+        :param color_intrin: 彩度攝影機內參
+        :param color_to_depth_extrin: 彩度攝影機到深度攝影機的外參
+        :param depth_to_color_extrin: 深度攝影機到彩度攝影機的外參
+        :param color_pixels: 彩度像素點 (N, 2)
+        """
+        self.depth_scale = depth_scale
+        self.depth_min = rs_env["depth_min"]
+        self.depth_max = rs_env["depth_max"]
+        self.tolerance = rs_env.get("correspondence_tolerance", 1.0)
+        self.verify_interval = rs_env.get("correspondence_verify_interval", 30)
+
+        self.depth_intrin = depth_intrin
+        self.color_intrin = color_intrin
+        self.color_to_depth_extrin = color_to_depth_extrin
+        self.depth_to_color_extrin = depth_to_color_extrin
+        self.color_pixels = np.array(color_pixels, np.int32).reshape(-1, 2)
+        self.key = self.make_key(
+            rs_env, depth_scale, depth_intrin, color_intrin, color_to_depth_extrin
+        )
+
+        # 逆深度每變化1，彩度圖上大約移動多少像素（用來把深度誤差換算為像素誤差）
+        baseline = np.linalg.norm(color_to_depth_extrin.translation)
+        self.disparity_scale = color_intrin.fx * baseline
+
+        self.lookups = 0
+        self.hits = 0
+        self.verified = 0
+        self.total_error = 0.0
+        self.frame_count = 0
+
+        self._build()
+
+    @staticmethod
+    def make_key(rs_env, depth_scale, depth_intrin, color_intrin, color_to_depth_extrin):
+        return (
+            rs_env["depth_min"],
+            rs_env["depth_max"],
+            depth_scale,
+            depth_intrin.key,
+            color_intrin.key,
+            color_to_depth_extrin.key,
+        )
+
+    def is_valid_for(self, key, color_pixels: np.ndarray) -> bool:
+        """
+        檢查快取是否仍然適用（串流設定、深度範圍或偵測區域改變時需要重建）
+        """
+        return key == self.key and np.array_equal(self.color_pixels, color_pixels)
+
+    def _build(self):
+        """
+        建立每個偵測點的候選深度像素表
+        """
+        width, height = self.depth_intrin.width, self.depth_intrin.height
+
+        # 在逆深度上均勻取樣，極線上的位置與逆深度接近線性關係
+        inv_depths = np.linspace(1 / self.depth_min, 1 / self.depth_max, 32)
+        count = len(self.color_pixels)
+
+        # 一次計算所有偵測點在各取樣深度下投影到深度圖的位置 (N, 32, 2)
+        samples = project_points(
+            self.depth_intrin,
+            transform_points(
+                self.color_to_depth_extrin,
+                deproject_pixels(
+                    self.color_intrin,
+                    np.repeat(self.color_pixels[:, None], len(inv_depths), axis=1),
+                    np.broadcast_to(1 / inv_depths, (count, len(inv_depths))),
+                ),
+            ),
+        )
+
+        lines = []
+        for color_pixel, sample in zip(self.color_pixels.tolist(), samples):
+            line = epipolar_line(
+                self.depth_intrin,
+                self.color_intrin,
+                self.color_to_depth_extrin,
+                color_pixel,
+                self.depth_min,
+                self.depth_max,
+            )
+
+            # 依主軸位置內插每個候選像素對應的逆深度
+            delta = line[-1] - line[0]
+            axis = 0 if abs(delta[0]) > abs(delta[1]) else 1
+            order = np.argsort(sample[:, axis])
+            line_inv_depths = np.interp(
+                line[:, axis], sample[order, axis], inv_depths[order]
+            )
+            lines.append((line, line_inv_depths))
+
+        length = max(len(line) for line, _ in lines) if lines else 1
+
+        # 長度不足的極線以最後一個候選點補齊，補齊的候選點不參與比較
+        self.candidates = np.zeros((count, length, 2), np.int32)
+        self.candidate_inv_depths = np.zeros((count, length), np.float64)
+        self.candidate_mask = np.zeros((count, length), bool)
+        for i, (line, line_inv_depths) in enumerate(lines):
+            pad = length - len(line)
+            self.candidate_mask[i, : len(line)] = True
+            self.candidates[i] = np.pad(
+                line.astype(np.int32), ((0, pad), (0, 0)), mode="edge"
+            )
+            self.candidate_inv_depths[i] = np.pad(line_inv_depths, (0, pad), mode="edge")
+
+        self.candidates[..., 0] = np.clip(self.candidates[..., 0], 0, width - 1)
+        self.candidates[..., 1] = np.clip(self.candidates[..., 1], 0, height - 1)
+
+    def __call__(
+        self,
+        depth_image: np.ndarray,
+        fallback: Callable[[Tuple[int, int]], Tuple[int, int]],
+        indices: np.ndarray = None,
+        new_frame: bool = True,
+    ) -> np.ndarray:
+        """
+        查表取得偵測點對應的深度像素
+        :param depth_image: 深度圖片
+        :param fallback: 查表失敗時使用的精確投影函數
+        :param indices: 只查詢部分偵測點（預設為全部）
+        :param new_frame: 是否為這一幀的第一次查詢（同一幀分多次查詢時只計算一次幀數）
+        :return: 深度像素 (len(indices), 2)，找不到時為 (-1, -1)
+        """
+        if indices is None:
+            indices = np.arange(len(self.color_pixels))
+        color_pixels = self.color_pixels[indices]
+        candidates = self.candidates[indices]
+        count = len(indices)
+        if new_frame:
+            self.frame_count += 1
+
+        depths = depth_image[candidates[..., 1], candidates[..., 0]]
+        depths = depths.astype(np.float64) * self.depth_scale
+        has_depth = (depths > 0) & self.candidate_mask[indices]
+
+        # 計算每個候選點實際深度與預期深度的差距（換算為彩度圖上的像素）
+        with np.errstate(divide="ignore"):
+            error = np.abs(1 / depths - self.candidate_inv_depths[indices])
+        error *= self.disparity_scale
+        error[~has_depth] = np.inf
+
+        best = np.argmin(error, axis=1)
+        depth_pixels = candidates[np.arange(count), best]
+
+        # 極線上完全沒有深度資料時，精確搜尋也會失敗
+        no_depth = ~has_depth.any(axis=1)
+        depth_pixels[no_depth] = -1
+
+        # 最佳與次佳候選點的差距足夠大時，查表結果與精確搜尋一致
+        if error.shape[1] > 1:
+            smallest = np.partition(error, 1, axis=1)
+            with np.errstate(invalid="ignore"):
+                gap = smallest[:, 1] - smallest[:, 0]
+            gap[np.isnan(gap)] = 0
+        else:
+            gap = np.full(count, np.inf)
+
+        hits = no_depth | (gap >= self.tolerance)
+        self.lookups += count
+        self.hits += int(hits.sum())
+
+        for index in np.flatnonzero(~hits):
+            depth_pixels[index] = fallback(tuple(color_pixels[index].tolist()))
+
+        # 定期抽樣與精確投影比較，累積查表誤差
+        if (
+            new_frame
+            and self.verify_interval
+            and self.frame_count % self.verify_interval == 0
+        ):
+            sampled = np.flatnonzero(hits & ~no_depth)
+            for index in random.sample(list(sampled), min(4, len(sampled))):
+                exact = fallback(tuple(color_pixels[index].tolist()))
+                if exact[0] < 0:
+                    continue
+                self.total_error += math.dist(exact, depth_pixels[index])
+                self.verified += 1
+
+        return depth_pixels
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        查表命中率
+        """
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def accuracy_error(self) -> float:
+        """
+        查表結果與精確投影的平均像素誤差
+        """
+        return self.total_error / self.verified if self.verified else 0.0
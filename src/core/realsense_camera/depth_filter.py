@@ -0,0 +1,189 @@
+import time
+from typing import Any
+
+import cv2
+import numpy as np
+
+from src.core.realsense_camera.camera_model import CameraIntrinsics
+
+# 補洞方式（與librealsense的hole_filling_filter相同）
+FILL_FARTHEST = "farthest"  # 使用周圍最遠的深度
+FILL_NEAREST = "nearest"  # 使用周圍最近的深度
+
+_INVALID = np.iinfo(np.uint16).max
+
+
+class DepthFilter:
+    def __init__(self, filter_env: Any):
+        """
+        深度圖片後處理：降採樣、保留邊緣的空間平滑、時間持續與補洞
+        （順序與librealsense建議的相同）
+        :param filter_env: 深度後處理設定
+        """
+        self.decimation = filter_env.get("decimation", 1)
+        self.spatial = filter_env.get("spatial", False)
+        self.spatial_delta = filter_env.get("spatial_delta", 20)
+        self.spatial_radius = filter_env.get("spatial_radius", 2)
+        self.temporal = filter_env.get("temporal", False)
+        self.temporal_alpha = filter_env.get("temporal_alpha", 0.4)
+        self.temporal_delta = filter_env.get("temporal_delta", 20)
+        self.temporal_persistence = filter_env.get("temporal_persistence", 3)
+        self.hole_filling = filter_env.get("hole_filling", False)
+        self.hole_filling_mode = filter_env.get("hole_filling_mode", FILL_FARTHEST)
+        self.hole_filling_iterations = filter_env.get("hole_filling_iterations", 1)
+
+        if self.hole_filling_mode not in (FILL_FARTHEST, FILL_NEAREST):
+            raise ValueError(f"不支援的補洞方式: {self.hole_filling_mode}")
+
+        self.previous = None
+        self.previous_age = None
+
+        # 每個濾波器最近一次的耗時（毫秒）
+        self.timings = {}
+
+    @property
+    def enabled(self):
+        return (
+            self.decimation > 1 or self.spatial or self.temporal or self.hole_filling
+        )
+
+    def intrinsics(self, depth_intrin: CameraIntrinsics) -> CameraIntrinsics:
+        """
+        後處理後的深度內參（降採樣會改變圖片大小）
+        """
+        return depth_intrin.binned(self.decimation)
+
+    def __call__(self, depth_image: np.ndarray) -> np.ndarray:
+        """
+        :param depth_image: 深度圖片（z16）
+        :return: 後處理後的深度圖片（z16）
+        """
+        self.timings = {}
+        steps = (
+            ("decimation", self.decimation > 1, self._decimate),
+            ("spatial", self.spatial, self._spatial),
+            ("temporal", self.temporal, self._temporal),
+            ("hole_filling", self.hole_filling, self._fill_holes),
+        )
+        for name, enabled, step in steps:
+            if not enabled:
+                continue
+            start = time.perf_counter()
+            depth_image = step(depth_image)
+            self.timings[name] = (time.perf_counter() - start) * 1000
+        return depth_image
+
+    def reset(self):
+        """
+        清除時間平滑保留的上一幀（畫面不連續時使用，例如暫停後恢復）
+        """
+        self.previous = None
+        self.previous_age = None
+
+    def summary(self) -> str:
+        """
+        每個濾波器的耗時文字
+        """
+        return " ".join(f"{name} {cost:.1f}ms" for name, cost in self.timings.items())
+
+    def _decimate(self, depth_image: np.ndarray) -> np.ndarray:
+        """
+        每decimation×decimation個像素合併為一個，忽略沒有深度的像素
+        （2、3倍取有效像素的中位數，更大的倍數取平均，與librealsense相同）
+        """
+        n = self.decimation
+        height, width = depth_image.shape[0] // n, depth_image.shape[1] // n
+        # 區塊中每個位置的像素各為一張小圖
+        views = [
+            depth_image[i : height * n : n, j : width * n : n]
+            for i in range(n)
+            for j in range(n)
+        ]
+        counts = sum((view > 0).astype(np.uint8) for view in views)
+
+        if n > 3:
+            sums = sum(view.astype(np.uint32) for view in views)
+            return (sums // np.maximum(counts, 1)).astype(np.uint16)
+
+        # 沒有深度的像素視為最大值，排序後會在最後面
+        views = [np.where(view == 0, _INVALID, view).astype(np.uint16) for view in views]
+        if n == 2:
+            # 四個數只需要最小與第二小的值（排序網路）
+            low1, high1 = np.minimum(views[0], views[1]), np.maximum(views[0], views[1])
+            low2, high2 = np.minimum(views[2], views[3]), np.maximum(views[2], views[3])
+            first = np.minimum(low1, low2)
+            second = np.minimum(np.maximum(low1, low2), np.minimum(high1, high2))
+            median = np.where(counts > 2, second, first)
+        else:
+            ordered = np.sort(np.stack(views), axis=0)
+            median = np.take_along_axis(
+                ordered, (np.maximum(counts, 1)[None] - 1) // 2, axis=0
+            )[0]
+        median[counts == 0] = 0
+        return median
+
+    def _spatial(self, depth_image: np.ndarray) -> np.ndarray:
+        """
+        雙邊濾波：深度差超過spatial_delta的像素幾乎不互相影響，因此可以保留邊緣，
+        沒有深度的像素與周圍差距很大也不會被平均進來
+        """
+        depth = depth_image.astype(np.float32)
+        smoothed = cv2.bilateralFilter(
+            depth,
+            self.spatial_radius * 2 + 1,
+            self.spatial_delta,
+            self.spatial_radius,
+        )
+        return np.where(depth_image > 0, smoothed + 0.5, 0).astype(np.uint16)
+
+    def _temporal(self, depth_image: np.ndarray) -> np.ndarray:
+        """
+        與上一幀的深度做指數平滑（深度差小於temporal_delta時），
+        這一幀沒有深度的像素沿用上一幀的深度，最多temporal_persistence幀
+        """
+        depth = depth_image.astype(np.float32)
+        if self.previous is None or self.previous.shape != depth.shape:
+            self.previous = depth
+            self.previous_age = np.zeros(depth.shape, np.uint8)
+            return depth_image
+
+        previous = self.previous
+        valid = depth > 0
+        previous_valid = previous > 0
+
+        smooth = (
+            valid & previous_valid & (np.abs(depth - previous) < self.temporal_delta)
+        )
+        output = np.where(
+            smooth,
+            self.temporal_alpha * depth + (1 - self.temporal_alpha) * previous,
+            depth,
+        )
+
+        persist = (
+            ~valid & previous_valid & (self.previous_age < self.temporal_persistence)
+        )
+        output[persist] = previous[persist]
+        self.previous_age = np.where(persist, self.previous_age + 1, 0).astype(np.uint8)
+        self.previous = output
+        return (output + 0.5).astype(np.uint16)
+
+    def _fill_holes(self, depth_image: np.ndarray) -> np.ndarray:
+        """
+        以周圍3×3像素的最遠或最近深度補上沒有深度的像素
+        """
+        kernel = np.ones((3, 3), np.uint8)
+        depth_image = depth_image.copy()
+        for _ in range(self.hole_filling_iterations):
+            holes = depth_image == 0
+            if not holes.any():
+                break
+            if self.hole_filling_mode == FILL_FARTHEST:
+                filled = cv2.dilate(depth_image, kernel)
+            else:
+                filled = cv2.erode(
+                    np.where(holes, _INVALID, depth_image).astype(np.uint16), kernel
+                )
+                filled[filled == _INVALID] = 0
+            depth_image[holes] = filled[holes]
+        return depth_image
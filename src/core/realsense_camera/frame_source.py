@@ -0,0 +1,597 @@
+import os
+import queue
+import time
+from collections import namedtuple
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from src.core.realsense_camera.calibration_cache import (
+    CalibrationCache,
+    calibration_key,
+)
+from src.core.realsense_camera.camera_model import CameraIntrinsics, CameraExtrinsics
+from src.core.realsense_camera.session import (
+    SESSION_META,
+    SessionReader,
+    SessionWriter,
+)
+from src.core.realsense_camera.utils import default_setting, intrin_and_extrin
+
+# 與pyrealsense2的rs.vector相同的欄位
+MotionData = namedtuple("MotionData", ["x", "y", "z"])
+
+
+def motion_frames(frames: Any):
+    """
+    依串流類型取得一組幀中的加速度儀與陀螺儀幀
+    （深度與彩度分開處理時可能只有深度，IMU幀的位置不固定）
+    :param frames: 幀來源回傳的幀
+    :return: 加速度儀幀與陀螺儀幀（沒有時為None）
+    """
+    if hasattr(frames, "get_accel_frame"):
+        return frames.get_accel_frame(), frames.get_gyro_frame()
+
+    import pyrealsense2 as rs
+
+    accel = frames.first_or_default(rs.stream.accel)
+    gyro = frames.first_or_default(rs.stream.gyro)
+    return accel or None, gyro or None
+
+
+class FrameSource:
+    def __init__(self):
+        """
+        幀來源（彩度、深度、IMU與相機參數）
+        wait_for_frames回傳的幀需要與pyrealsense2的rs.composite_frame有相同的用法：
+        get_depth_frame()、get_color_frame()、get_timestamp()與get_frame_number()，
+        IMU幀以motion_frames依串流類型取得
+        """
+        self.depth_scale = 0.001
+        self.depth_intrin: Optional[CameraIntrinsics] = None
+        self.color_intrin: Optional[CameraIntrinsics] = None
+        self.depth_to_color_extrin: Optional[CameraExtrinsics] = None
+        self.color_to_depth_extrin: Optional[CameraExtrinsics] = None
+        # IMU資料是否已經由幀來源以原生頻率回傳（不需要再從幀中取出）
+        self.native_imu = False
+
+    def wait_for_frames(self, timeout_ms: int = 5000):
+        """
+        取得下一幀
+        :param timeout_ms: 等待時間（毫秒）
+        """
+        raise NotImplementedError()
+
+    def pause(self):
+        """
+        暫停取幀（攝影機保持運作，恢復時不需要重新初始化）
+        """
+        pass
+
+    def resume(self):
+        """
+        恢復取幀（暫停期間的舊幀不會被回傳）
+        """
+        pass
+
+    def stop(self):
+        """
+        停止幀來源
+        """
+        pass
+
+    def refresh_calibration(self):
+        """
+        重新取得相機參數（攝影機重新校正之後使用）
+        """
+        pass
+
+
+class RealsenseSource(FrameSource):
+    def __init__(
+        self,
+        setting: Any = None,
+        imu_callback: Callable = None,
+        calibration_cache: str = "",
+    ):
+        """
+        即時的RealSense攝影機
+        :param setting: 深度攝影機設置（rs.config）
+        :param imu_callback: 以原生頻率接收每一筆IMU資料的函式 (timestamp, accel, gyro)，
+                             有提供時IMU資料不再等待與影像同步，幀中的IMU為最新的一筆
+        :param calibration_cache: 相機參數快取檔路徑（空字串為每次向裝置查詢）
+        """
+        super().__init__()
+        import pyrealsense2 as rs
+
+        self.rs = rs
+        self.pipeline = rs.pipeline()
+        self.config = setting or default_setting()
+        self.imu_callback = imu_callback
+        self.native_imu = imu_callback is not None
+
+        if self.native_imu:
+            self.framesets = queue.Queue(maxsize=1)
+            self.accel_frame = None
+            self.gyro_frame = None
+            self.profile = self.pipeline.start(self.config, self._on_frame)
+        else:
+            self.profile = self.pipeline.start(self.config)
+
+        (
+            self.depth_scale,
+            self.depth_intrin,
+            self.color_intrin,
+            self.depth_to_color_extrin,
+            self.color_to_depth_extrin,
+        ) = self._calibration(calibration_cache)
+
+    def _device_id(self, device: Any) -> str:
+        return device.get_info(self.rs.camera_info.serial_number)
+
+    def _firmware_version(self, device: Any) -> str:
+        if device.supports(self.rs.camera_info.firmware_version):
+            return device.get_info(self.rs.camera_info.firmware_version)
+        return ""
+
+    def _calibration(self, cache_path: str):
+        """
+        取得深度比例與相機參數（快取中有相同序號、韌體與串流設定時直接使用，不向裝置查詢，
+        on-chip或tare校正寫入裝置之後要呼叫refresh_calibration更新）
+        """
+        device = self.profile.get_device()
+        self.calibration_cache = self.calibration_key = None
+        if cache_path:
+            streams = []
+            for stream in self.profile.get_streams():
+                if not stream.is_video_stream_profile():
+                    continue
+                video = stream.as_video_stream_profile()
+                streams.append(
+                    f"{stream.stream_name()}:{video.width()}x{video.height()}:"
+                    f"{stream.format().name}@{stream.fps()}"
+                )
+            self.calibration_cache = CalibrationCache(cache_path)
+            self.calibration_key = calibration_key(
+                self._device_id(device), streams, self._firmware_version(device)
+            )
+            calibration = self.calibration_cache.get(self.calibration_key)
+            if calibration is not None:
+                return calibration
+        return self._query_calibration()
+
+    def _query_calibration(self):
+        """
+        向裝置查詢深度比例與相機參數，並更新快取
+        """
+        depth_scale = self.profile.get_device().first_depth_sensor().get_depth_scale()
+        calibration = (depth_scale, *intrin_and_extrin(self.profile))
+        if self.calibration_cache is not None:
+            self.calibration_cache.put(self.calibration_key, calibration)
+        return calibration
+
+    def refresh_calibration(self):
+        """
+        重新向裝置查詢相機參數並覆寫快取（on-chip或tare校正寫入裝置之後呼叫）
+        """
+        (
+            self.depth_scale,
+            self.depth_intrin,
+            self.color_intrin,
+            self.depth_to_color_extrin,
+            self.color_to_depth_extrin,
+        ) = self._query_calibration()
+
+    def _on_frame(self, frame):
+        """
+        librealsense的callback（在SDK的執行緒執行）
+        """
+        if frame.is_frameset():
+            frame.keep()
+            # 只保留最新的一組幀
+            try:
+                self.framesets.get_nowait()
+            except queue.Empty:
+                pass
+            self.framesets.put(frame.as_frameset())
+            return
+
+        if not frame.is_motion_frame():
+            return
+        data = frame.as_motion_frame().get_motion_data()
+        vector = (data.x, data.y, data.z)
+        timestamp = frame.get_timestamp()
+        recorded = RecordedFrame(
+            np.array(vector, np.float32), timestamp, frame.get_frame_number()
+        )
+        if frame.get_profile().stream_type() == self.rs.stream.accel:
+            self.accel_frame = recorded
+            self.imu_callback(timestamp, accel=vector)
+        else:
+            self.gyro_frame = recorded
+            self.imu_callback(timestamp, gyro=vector)
+
+    def wait_for_frames(self, timeout_ms: int = 5000):
+        if not self.native_imu:
+            return self.pipeline.wait_for_frames(timeout_ms)
+
+        try:
+            frames = self.framesets.get(timeout=timeout_ms / 1000)
+        except queue.Empty:
+            raise RuntimeError(f"Frame didn't arrive within {timeout_ms}")
+        # 與其他幀來源相同，frames[2]與frames[3]為加速度儀與陀螺儀
+        latest = {2: self.accel_frame, 3: self.gyro_frame}
+        return ReplacedFrameset(
+            frames,
+            {index: frame for index, frame in latest.items() if frame is not None},
+        )
+
+    def resume(self):
+        # 丟棄暫停期間累積的幀
+        if self.native_imu:
+            try:
+                self.framesets.get_nowait()
+            except queue.Empty:
+                pass
+        else:
+            while self.pipeline.poll_for_frames():
+                pass
+
+    def stop(self):
+        self.pipeline.stop()
+
+
+class BagSource(RealsenseSource):
+    def __init__(self, file: str, calibration_cache: str = ""):
+        """
+        透過librealsense回放.bag檔案（不即時播放，每一幀都會處理到）
+        :param file: bag檔案路徑
+        :param calibration_cache: 相機參數快取檔路徑
+        """
+        self.file = file
+        super().__init__(default_setting(file), calibration_cache=calibration_cache)
+
+        # 直接使用已啟動的裝置，不需要再解析一次設定
+        self.playback = self.profile.get_device().as_playback()
+        self.playback.set_real_time(False)
+
+    def _device_id(self, device: Any) -> str:
+        # 錄製時沒有保存序號的檔案以檔案路徑區分
+        if device.supports(self.rs.camera_info.serial_number):
+            return device.get_info(self.rs.camera_info.serial_number)
+        return os.path.abspath(self.file)
+
+    def pause(self):
+        self.playback.pause()
+
+    def resume(self):
+        self.playback.resume()
+
+
+class RecordedFrame:
+    def __init__(self, data: np.ndarray, timestamp: float, frame_number: int):
+        """
+        錄製資料中的單一影像或IMU幀
+        """
+        self.data = data
+        self.timestamp = timestamp
+        self.frame_number = frame_number
+
+    def __bool__(self):
+        return self.data is not None
+
+    def get_data(self):
+        return self.data
+
+    def get_timestamp(self):
+        return self.timestamp
+
+    def get_frame_number(self):
+        return self.frame_number
+
+    def as_motion_frame(self):
+        return self
+
+    def get_motion_data(self):
+        return MotionData(*self.data.tolist())
+
+
+class RecordedFrameset:
+    def __init__(
+        self,
+        depth: np.ndarray,
+        color: np.ndarray,
+        accel: np.ndarray,
+        gyro: np.ndarray,
+        timestamp: float,
+        frame_number: int,
+    ):
+        """
+        錄製資料中的一組幀（順序與攝影機相同：深度、彩度、加速度儀、陀螺儀）
+        """
+        self.timestamp = timestamp
+        self.frame_number = frame_number
+        self.frames = [
+            RecordedFrame(data, timestamp, frame_number)
+            for data in (depth, color, accel, gyro)
+        ]
+
+    def __getitem__(self, index: int):
+        return self.frames[index]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def size(self):
+        return len(self.frames)
+
+    def get_depth_frame(self):
+        return self.frames[0]
+
+    def get_color_frame(self):
+        return self.frames[1]
+
+    def get_accel_frame(self):
+        return self.frames[2] or None
+
+    def get_gyro_frame(self):
+        return self.frames[3] or None
+
+    def get_timestamp(self):
+        return self.timestamp
+
+    def get_frame_number(self):
+        return self.frame_number
+
+    def keep(self):
+        # 資料已經在記憶體中，不需要像rs.frame一樣保留
+        pass
+
+
+class ReplacedFrameset:
+    def __init__(self, frames: Any, replacements: Dict[int, Any]):
+        """
+        取代部分幀的一組幀，其餘幀與資訊沿用原本的幀
+        :param frames: 幀來源回傳的幀
+        :param replacements: 要取代的幀（索引與RecordedFrameset相同：0深度、1彩度、2加速度儀、3陀螺儀）
+        """
+        self.frames = frames
+        self.replacements = replacements
+
+    def __getitem__(self, index: int):
+        if index in self.replacements:
+            return self.replacements[index]
+        return self.frames[index]
+
+    def __len__(self):
+        return self.size()
+
+    def size(self):
+        return max([self.frames.size(), *(index + 1 for index in self.replacements)])
+
+    def get_depth_frame(self):
+        if 0 in self.replacements:
+            return self.replacements[0]
+        return self.frames.get_depth_frame()
+
+    def get_color_frame(self):
+        if 1 in self.replacements:
+            return self.replacements[1]
+        return self.frames.get_color_frame()
+
+    def get_accel_frame(self):
+        if 2 in self.replacements:
+            return self.replacements[2]
+        return motion_frames(self.frames)[0]
+
+    def get_gyro_frame(self):
+        if 3 in self.replacements:
+            return self.replacements[3]
+        return motion_frames(self.frames)[1]
+
+    def get_timestamp(self):
+        return self.frames.get_timestamp()
+
+    def get_frame_number(self):
+        return self.frames.get_frame_number()
+
+    def keep(self):
+        self.frames.keep()
+
+
+class SessionSource(FrameSource):
+    def __init__(self, directory: str, real_time: bool = True, loop: bool = True):
+        """
+        回放SessionRecorder錄製的資料（不需要RealSense SDK與攝影機）
+        :param directory: 錄製資料的資料夾
+        :param real_time: 依照錄製時的時間間隔播放，否則以最快速度播放
+        :param loop: 播放完畢後從頭開始
+        """
+        super().__init__()
+        self.directory = directory
+        self.real_time = real_time
+        self.loop = loop
+
+        self.reader = SessionReader(directory)
+        if len(self.reader) == 0:
+            raise FileNotFoundError(f"錄製資料 {directory} 沒有任何幀")
+
+        meta = self.reader.meta
+        self.depth_scale = meta["depth_scale"]
+        self.depth_intrin = CameraIntrinsics.from_dict(meta["depth_intrin"])
+        self.color_intrin = CameraIntrinsics.from_dict(meta["color_intrin"])
+        self.depth_to_color_extrin = CameraExtrinsics.from_dict(
+            meta["depth_to_color_extrin"]
+        )
+        self.color_to_depth_extrin = CameraExtrinsics.from_dict(
+            meta["color_to_depth_extrin"]
+        )
+
+        # 重新播放時時間戳記加上整段錄製資料的長度，讓時間戳記持續遞增
+        timestamps = self.reader.index["timestamp"]
+        interval = (timestamps[-1] - timestamps[0]) / max(len(timestamps) - 1, 1)
+        self.duration = float(timestamps[-1] - timestamps[0] + interval)
+
+        self.index = 0
+        self.time_offset = 0.0
+        self.start_timestamp = None
+        self.start_time = None
+
+    def __len__(self):
+        return len(self.reader)
+
+    def seek(self, index: int):
+        """
+        跳到指定的幀（下一次wait_for_frames回傳此幀）
+        :param index: 幀索引
+        """
+        if not 0 <= index < len(self.reader):
+            raise IndexError(f"幀索引 {index} 超出範圍 0~{len(self.reader) - 1}")
+        self.index = index
+        self.start_time = None
+
+    def resume(self):
+        # 從暫停的位置繼續播放，不補上暫停的時間
+        self.start_time = None
+
+    def wait_for_frames(self, timeout_ms: int = 5000):
+        if self.index >= len(self.reader):
+            if not self.loop:
+                raise RuntimeError("錄製資料已播放完畢")
+            self.index = 0
+            self.time_offset += self.duration
+            self.start_time = None
+
+        frames = self.read(self.index, self.time_offset)
+        self.index += 1
+
+        if self.real_time:
+            self._wait_until(frames.get_timestamp())
+        return frames
+
+    def read(self, index: int, time_offset: float = 0.0) -> RecordedFrameset:
+        """
+        讀取指定的幀（影像為記憶體映射檔的view）
+        :param index: 幀索引
+        :param time_offset: 加到時間戳記的偏移（毫秒）
+        """
+        entry = self.reader.index[index]
+        return RecordedFrameset(
+            self.reader.image("depth", index),
+            self.reader.image("color", index),
+            entry["accel"],
+            entry["gyro"],
+            float(entry["timestamp"]) + time_offset,
+            int(entry["frame_number"]),
+        )
+
+    def _wait_until(self, timestamp: float):
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+            self.start_timestamp = timestamp
+            return
+        delay = (timestamp - self.start_timestamp) / 1000 - (
+            time.perf_counter() - self.start_time
+        )
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SessionRecorder:
+    def __init__(
+        self,
+        directory: str,
+        source: FrameSource,
+        depth: bool = True,
+        color: bool = True,
+        color_decimation: int = 1,
+        chunk_size: int = 300,
+    ):
+        """
+        將幀錄製為分段的記憶體映射檔（格式見session.py）
+        :param directory: 錄製資料的資料夾
+        :param source: 幀來源（用來保存相機參數）
+        :param depth: 錄製深度
+        :param color: 錄製彩度
+        :param color_decimation: 彩度每隔幾個像素取一個（內參會一併縮小）
+        :param chunk_size: 每個分段檔案的幀數
+        """
+        self.depth = depth
+        self.color = color
+        # 最近一筆IMU資料（只有深度的幀沒有IMU時沿用）
+        self.accel = None
+        self.gyro = None
+
+        meta = {
+            "depth_scale": source.depth_scale,
+            "depth_intrin": source.depth_intrin.to_dict(),
+            "color_intrin": source.color_intrin.decimated(color_decimation).to_dict(),
+            "depth_to_color_extrin": source.depth_to_color_extrin.to_dict(),
+            "color_to_depth_extrin": source.color_to_depth_extrin.to_dict(),
+        }
+        self.writer = SessionWriter(
+            directory, meta, chunk_size, depth, color, color_decimation
+        )
+
+    @property
+    def count(self):
+        return self.writer.count
+
+    def write(self, frames: Any):
+        """
+        錄製一組幀（缺少要錄製的深度或彩度，或還沒有收到IMU資料時不錄製）
+        :param frames: 幀來源回傳的幀
+        """
+        accel_frame, gyro_frame = motion_frames(frames)
+        if accel_frame:
+            self.accel = accel_frame.as_motion_frame().get_motion_data()
+        if gyro_frame:
+            self.gyro = gyro_frame.as_motion_frame().get_motion_data()
+
+        depth_frame = frames.get_depth_frame()
+        color_frame = frames.get_color_frame()
+        if (self.depth and not depth_frame) or (self.color and not color_frame):
+            return
+        if self.accel is None or self.gyro is None:
+            return
+
+        self.writer.write(
+            frames.get_timestamp(),
+            frames.get_frame_number(),
+            (self.accel.x, self.accel.y, self.accel.z),
+            (self.gyro.x, self.gyro.y, self.gyro.z),
+            np.asanyarray(depth_frame.get_data()) if self.depth else None,
+            np.asanyarray(color_frame.get_data()) if self.color else None,
+        )
+
+    def close(self):
+        self.writer.close()
+
+
+def create_frame_source(
+    rs_env: Any, file: str = None, setting: Any = None, imu_callback: Callable = None
+):
+    """
+    依照設定建立幀來源
+    :param rs_env: 深度攝影機設定
+    :param file: 回放的檔案（.bag檔、錄製資料的資料夾或其中的session.json）
+    :param setting: 深度攝影機設置（rs.config）
+    :param imu_callback: 即時攝影機以原生頻率接收IMU資料的函式
+    """
+    file = file or rs_env.get("replay", "")
+    real_time = rs_env.get("replay_real_time", True)
+    calibration_cache = rs_env.get("calibration_cache", "")
+
+    if file and os.path.basename(file) == SESSION_META:
+        return SessionSource(os.path.dirname(file), real_time)
+    if file and os.path.isdir(file):
+        return SessionSource(file, real_time)
+    if file:
+        return BagSource(file, calibration_cache)
+
+    setting = setting or default_setting(rs_env=rs_env)
+    # 同時連接多台攝影機時以序號指定
+    serial = rs_env.get("serial", "")
+    if serial:
+        setting.enable_device(serial)
+    return RealsenseSource(setting, imu_callback, calibration_cache)
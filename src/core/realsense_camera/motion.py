@@ -2,75 +2,92 @@ import math
 
 import cv2
 
-first = True
-alpha = 0.98
-total_gyro_angle_y = -180
-
-accel_angle_x: float
-accel_angle_y: float
-accel_angle_z: float
-last_ts_gyro: float
-
-
-def get_motion(frames):
-    global first, alpha, total_gyro_angle_y, accel_angle_z, accel_angle_x, accel_angle_y, last_ts_gyro
-    # 取得IMU資料
-    accel = frames[2].as_motion_frame().get_motion_data()
-    gyro = frames[3].as_motion_frame().get_motion_data()
-
-    timestamp = frames.get_timestamp()
-
-    # 計算第一幀（防止缺失陀螺儀資料）
-    if first:
-        first = False
-        last_ts_gyro = timestamp
-
-        # 計算加速度儀
-        accel_angle_z = math.degrees(math.atan2(accel.y, accel.z))
-        accel_angle_x = math.degrees(
+from src.core.realsense_camera.frame_source import motion_frames
+
+
+class MotionFilter:
+    def __init__(self, alpha: float = 0.98):
+        """
+        以每一組幀中的IMU資料計算攝影機姿態（互補濾波）
+        每台攝影機使用自己的濾波器，多台攝影機的姿態不會互相覆蓋
+        :param alpha: 陀螺儀角度的權重
+        """
+        self.alpha = alpha
+        self.first = True
+        self.total_gyro_angle_y = -180
+        self.accel_angle_x = 0.0
+        self.accel_angle_y = 0.0
+        self.accel_angle_z = 0.0
+        self.last_ts_gyro = 0.0
+        self.last_motion = None
+
+    def __call__(self, frames):
+        """
+        計算這一組幀的姿態
+        :param frames: 深度攝影機幀
+        :return: 俯仰角、偏航角與滾轉角（第一幀回傳None）
+        """
+        # 取得IMU資料（只有深度的幀沒有IMU時沿用上一次的姿態）
+        accel_frame, gyro_frame = motion_frames(frames)
+        if not accel_frame or not gyro_frame:
+            return self.last_motion
+        accel = accel_frame.as_motion_frame().get_motion_data()
+        gyro = gyro_frame.as_motion_frame().get_motion_data()
+
+        timestamp = frames.get_timestamp()
+
+        # 計算第一幀（防止缺失陀螺儀資料）
+        if self.first:
+            self.first = False
+            self.last_ts_gyro = timestamp
+
+            # 計算加速度儀
+            self.accel_angle_z = math.degrees(math.atan2(accel.y, accel.z))
+            self.accel_angle_x = math.degrees(
+                math.atan2(accel.x, math.sqrt(accel.y * accel.y + accel.z * accel.z))
+            )
+            self.accel_angle_y = math.degrees(math.pi)
+
+            return
+
+        # 從第二幀開始計算
+
+        # 陀螺儀計算
+        dt_gyro = (timestamp - self.last_ts_gyro) / 1000
+        self.last_ts_gyro = timestamp
+
+        gyro_angle_x = gyro.x * dt_gyro
+        gyro_angle_y = gyro.y * dt_gyro
+        gyro_angle_z = gyro.z * dt_gyro
+
+        dangleX = gyro_angle_x * 57.2958
+        dangleY = gyro_angle_y * 57.2958
+        dangleZ = gyro_angle_z * 57.2958
+
+        total_gyro_angle_x = self.accel_angle_x + dangleX
+        # total_gyro_angle_y = accel_angle_y + dangleY
+        self.total_gyro_angle_y = self.accel_angle_y + dangleY + self.total_gyro_angle_y
+        total_gyro_angle_z = self.accel_angle_z + dangleZ
+
+        # 加速度儀計算
+        self.accel_angle_z = math.degrees(math.atan2(accel.y, accel.z))
+        self.accel_angle_x = math.degrees(
             math.atan2(accel.x, math.sqrt(accel.y * accel.y + accel.z * accel.z))
         )
-        accel_angle_y = math.degrees(math.pi)
-
-        return
-
-    # 從第二幀開始計算
-
-    # 陀螺儀計算
-    dt_gyro = (timestamp - last_ts_gyro) / 1000
-    last_ts_gyro = timestamp
-
-    gyro_angle_x = gyro.x * dt_gyro
-    gyro_angle_y = gyro.y * dt_gyro
-    gyro_angle_z = gyro.z * dt_gyro
-
-    dangleX = gyro_angle_x * 57.2958
-    dangleY = gyro_angle_y * 57.2958
-    dangleZ = gyro_angle_z * 57.2958
-
-    total_gyro_angle_x = accel_angle_x + dangleX
-    # total_gyro_angle_y = accel_angle_y + dangleY
-    total_gyro_angle_y = accel_angle_y + dangleY + total_gyro_angle_y
-    total_gyro_angle_z = accel_angle_z + dangleZ
-
-    # 加速度儀計算
-    accel_angle_z = math.degrees(math.atan2(accel.y, accel.z))
-    accel_angle_x = math.degrees(
-        math.atan2(accel.x, math.sqrt(accel.y * accel.y + accel.z * accel.z))
-    )
-    # accel_angle_y = math.degrees(math.pi)
-    accel_angle_y = 0
+        # accel_angle_y = math.degrees(math.pi)
+        self.accel_angle_y = 0
 
-    # 結合陀螺儀和加速度儀角度
-    combined_angle_x = total_gyro_angle_x * alpha + accel_angle_x * (1 - alpha)
-    combined_angle_z = total_gyro_angle_z * alpha + accel_angle_z * (1 - alpha)
-    combined_angle_y = total_gyro_angle_y
+        # 結合陀螺儀和加速度儀角度
+        alpha = self.alpha
+        combined_angle_x = total_gyro_angle_x * alpha + self.accel_angle_x * (1 - alpha)
+        combined_angle_z = total_gyro_angle_z * alpha + self.accel_angle_z * (1 - alpha)
 
-    pitch = combined_angle_z
-    yaw = total_gyro_angle_y
-    roll = combined_angle_x
+        pitch = combined_angle_z
+        yaw = self.total_gyro_angle_y
+        roll = combined_angle_x
 
-    return pitch, yaw, roll
+        self.last_motion = pitch, yaw, roll
+        return self.last_motion
 
 
 def draw_motion(image, pitch, yaw, roll):
@@ -0,0 +1,208 @@
+import math
+import queue
+import threading
+from typing import Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _up_vector(q: Tuple[float, float, float, float]) -> Tuple[float, float, float]:
+    """
+    世界座標的上方 (0, 0, 1) 在攝影機座標中的方向（旋轉矩陣的第三列）
+    四元數 (w, x, y, z) 為攝影機座標轉世界座標
+    """
+    w, x, y, z = q
+    return 2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)
+
+
+def _wrap(angle):
+    """
+    將角度限制在 [-180, 180)
+    """
+    return (angle + 180) % 360 - 180
+
+
+class OrientationEstimator:
+    def __init__(self, rs_env: Any):
+        """
+        以四元數互補濾波（Mahony）融合每一筆加速度儀與陀螺儀資料，估計攝影機姿態，
+        並保留最近的姿態記錄，讓任何一幀都可以用時間戳記取得插值後的姿態
+        角度的定義與motion.MotionFilter相同（俯仰角-90度為水平，偏航角為陀螺儀累積的水平轉向）
+        :param rs_env: 深度攝影機設定
+        """
+        self.gain = rs_env.get("imu_fusion_gain", 1.0)
+        self.history_size = rs_env.get("imu_history", 512)
+
+        self.quaternion = None
+        self.accel = None
+        self.last_gyro_timestamp = None
+        self.yaw = 0.0
+
+        # 長度為兩倍的環形緩衝區，每筆資料寫入兩次，最近history_size筆永遠是連續的一段
+        self.lock = threading.Lock()
+        self.timestamps = np.zeros(self.history_size * 2)
+        self.poses = np.zeros((self.history_size * 2, 3))
+        self.head = 0
+        self.count = 0
+
+        self.samples = queue.SimpleQueue()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """
+        在背景執行緒處理push進來的IMU資料（用於攝影機以原生頻率回傳IMU資料時）
+        """
+        self.running = True
+        self.thread = threading.Thread(target=self._update_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.samples.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def push(
+        self,
+        timestamp: float,
+        accel: Optional[Sequence[float]] = None,
+        gyro: Optional[Sequence[float]] = None,
+    ):
+        """
+        加入一筆IMU資料（不會阻塞，由背景執行緒處理）
+        """
+        self.samples.put((timestamp, accel, gyro))
+
+    def _update_loop(self):
+        while self.running:
+            sample = self.samples.get()
+            if sample is None:
+                break
+            self.update(*sample)
+
+    def update(
+        self,
+        timestamp: float,
+        accel: Optional[Sequence[float]] = None,
+        gyro: Optional[Sequence[float]] = None,
+    ):
+        """
+        融合一筆IMU資料
+        :param timestamp: 時間戳記（毫秒）
+        :param accel: 加速度儀 (x, y, z)，只有陀螺儀資料時為None
+        :param gyro: 陀螺儀 (x, y, z)（弧度/秒），只有加速度儀資料時為None
+        """
+        # IMU頻率很高，使用純量計算避免小陣列的額外成本
+        if accel is not None:
+            norm = math.sqrt(accel[0] ** 2 + accel[1] ** 2 + accel[2] ** 2)
+            if norm > 0:
+                self.accel = (accel[0] / norm, accel[1] / norm, accel[2] / norm)
+                if self.quaternion is None:
+                    self.quaternion = self._align_up(self.accel)
+                    self._record(timestamp)
+
+        if gyro is None or self.quaternion is None:
+            return
+
+        if self.last_gyro_timestamp is None or timestamp <= self.last_gyro_timestamp:
+            self.last_gyro_timestamp = timestamp
+            return
+        dt = (timestamp - self.last_gyro_timestamp) / 1000
+        self.last_gyro_timestamp = timestamp
+
+        up_x, up_y, up_z = _up_vector(self.quaternion)
+        gx, gy, gz = float(gyro[0]), float(gyro[1]), float(gyro[2])
+
+        # 水平轉向：攝影機角速度在世界座標垂直軸上的分量（向右轉為正）
+        self.yaw -= math.degrees((up_x * gx + up_y * gy + up_z * gz) * dt)
+
+        # 以加速度儀量到的上方與目前姿態推算的上方之間的差異（外積）修正陀螺儀
+        if self.accel is not None:
+            ax, ay, az = self.accel
+            gx += self.gain * (ay * up_z - az * up_y)
+            gy += self.gain * (az * up_x - ax * up_z)
+            gz += self.gain * (ax * up_y - ay * up_x)
+
+        # q = q * (1, ω dt / 2)
+        hx, hy, hz = gx * dt / 2, gy * dt / 2, gz * dt / 2
+        w, x, y, z = self.quaternion
+        w, x, y, z = (
+            w - x * hx - y * hy - z * hz,
+            x + w * hx + y * hz - z * hy,
+            y + w * hy - x * hz + z * hx,
+            z + w * hz + x * hy - y * hx,
+        )
+        norm = math.sqrt(w * w + x * x + y * y + z * z)
+        self.quaternion = (w / norm, x / norm, y / norm, z / norm)
+        self._record(timestamp)
+
+    @staticmethod
+    def _align_up(up: Tuple[float, float, float]) -> Tuple[float, float, float, float]:
+        """
+        將攝影機座標的上方轉到世界座標上方 (0, 0, 1) 的最小旋轉
+        """
+        # 旋轉軸為 up × (0, 0, 1)
+        axis_x, axis_y = up[1], -up[0]
+        sin = math.hypot(axis_x, axis_y)
+        cos = up[2]
+        if sin < 1e-9:
+            return (1.0, 0.0, 0.0, 0.0) if cos > 0 else (0.0, 1.0, 0.0, 0.0)
+        half = math.atan2(sin, cos) / 2
+        scale = math.sin(half) / sin
+        return math.cos(half), axis_x * scale, axis_y * scale, 0.0
+
+    def _pose(self) -> Tuple[float, float, float]:
+        # 攝影機座標中的上方（與加速度儀靜止時的方向相同）
+        up_x, up_y, up_z = _up_vector(self.quaternion)
+        pitch = math.degrees(math.atan2(up_y, up_z))
+        roll = math.degrees(math.atan2(up_x, math.sqrt(up_y * up_y + up_z * up_z)))
+        return pitch, self.yaw, roll
+
+    def _record(self, timestamp: float):
+        pose = self._pose()
+        with self.lock:
+            for index in (self.head, self.head + self.history_size):
+                self.timestamps[index] = timestamp
+                self.poses[index] = pose
+            self.head = (self.head + 1) % self.history_size
+            self.count = min(self.count + 1, self.history_size)
+
+    @property
+    def latest(self) -> Optional[Tuple[float, float, float]]:
+        """
+        最新的姿態 (pitch, yaw, roll)
+        """
+        with self.lock:
+            if self.count == 0:
+                return None
+            return tuple(self.poses[self.head + self.history_size - 1].tolist())
+
+    def pose_at(self, timestamp: float) -> Optional[Tuple[float, float, float]]:
+        """
+        取得某個時間點的姿態（在記錄範圍內線性插值，超出範圍時使用最近的一筆，固定成本）
+        :param timestamp: 時間戳記（毫秒）
+        :return: (pitch, yaw, roll)，還沒有資料時為None
+        """
+        with self.lock:
+            if self.count == 0:
+                return None
+            end = self.head + self.history_size
+            start = end - self.count
+            timestamps = self.timestamps[start:end]
+            index = int(np.searchsorted(timestamps, timestamp))
+            if index == 0:
+                return tuple(self.poses[start].tolist())
+            if index == self.count:
+                return tuple(self.poses[end - 1].tolist())
+
+            before = self.poses[start + index - 1].tolist()
+            after = self.poses[start + index].tolist()
+            t0, t1 = float(timestamps[index - 1]), float(timestamps[index])
+
+        weight = (timestamp - t0) / (t1 - t0) if t1 > t0 else 1.0
+        pitch = _wrap(before[0] + _wrap(after[0] - before[0]) * weight)
+        yaw = before[1] + (after[1] - before[1]) * weight
+        roll = before[2] + (after[2] - before[2]) * weight
+        return pitch, yaw, roll
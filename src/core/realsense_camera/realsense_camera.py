@@ -1,53 +1,111 @@
 import math
+import threading
 from typing import Tuple, Any
 
 import cv2
 import numpy as np
-import pyrealsense2 as rs
 
-from src.core.realsense_camera.motion import get_motion, draw_motion
+from src.core.realsense_camera.align import DepthAligner
+from src.core.realsense_camera.camera_height import CameraHeightEstimator
+from src.core.realsense_camera.camera_model import (
+    deproject_depth_pixels,
+    project_points,
+    project_color_pixel_to_depth_pixel,
+)
+from src.core.realsense_camera.capture import LatestFrameCapture, imu_sample
+from src.core.realsense_camera.correspondence import ColorDepthCorrespondence
+from src.core.realsense_camera.depth_filter import DepthFilter
+from src.core.realsense_camera.frame_source import (
+    FrameSource,
+    RecordedFrame,
+    ReplacedFrameset,
+    SessionRecorder,
+    create_frame_source,
+)
+from src.core.realsense_camera.motion import MotionFilter, draw_motion
+from src.core.realsense_camera.orientation import OrientationEstimator
 from src.core.realsense_camera.utils import (
     is_pixel_inside_image,
     get_rotation_matrix,
-    intrin_and_extrin,
-    default_setting,
 )
 
 
 class RealsenseCamera:
     instance = None
 
-    def __init__(self, config: Any, file=None, setting=None):
+    def __init__(
+        self, config: Any, file=None, setting=None, source: FrameSource = None
+    ):
         """
         初始化RealSense相機
         :param config: toml設定檔
+        :param file: 回放的檔案（.bag檔或錄製資料的資料夾）
         :param setting: 深度攝影機設置
+        :param source: 幀來源（預設依照設定檔建立）
         """
         RealsenseCamera.instance = self
 
         self.rs_env = config.env["realsense"]
-        self.pipeline = rs.pipeline()
-        self.config = setting or default_setting(file)
-        self.profile = self.pipeline.start(self.config)
 
-        if file:
-            device = self.config.resolve(self.pipeline).get_device()
-            playback = device.as_playback()
-            playback.set_real_time(False)
+        # 融合每一筆IMU資料的姿態估計（關閉時以每一幀的IMU資料計算，每台攝影機有自己的濾波器）
+        self.orientation = None
+        self.motion_filter = MotionFilter()
+        imu_callback = None
+        if self.rs_env.get("imu_fusion", False):
+            self.orientation = OrientationEstimator(self.rs_env)
+            imu_callback = self.orientation.push
+
+        self.source = source or create_frame_source(
+            self.rs_env, file, setting, imu_callback
+        )
+        if self.orientation is not None and self.source.native_imu:
+            self.orientation.start()
+        # 只有RealSense攝影機與.bag檔有pipeline
+        self.pipeline = getattr(self.source, "pipeline", None)
 
         self.pitch = 0
         self.yaw = 0
         self.roll = 0
 
-        depth_sensor = self.profile.get_device().first_depth_sensor()
-        self.depth_scale = depth_sensor.get_depth_scale()
+        # 深度後處理（降採樣時深度內參也要跟著縮小）
+        self.depth_filter = DepthFilter(config.env.get("depth_filter", {}))
 
-        (
-            self.depth_intrin,
-            self.color_intrin,
-            self.depth_to_color_extrin,
-            self.color_to_depth_extrin,
-        ) = intrin_and_extrin(self.profile)
+        self.aligned_depth = None
+        self._load_calibration()
+
+        # 持續估計攝影機高度，變化超過容許值時更新障礙物偵測設定
+        self.od_env = config.env.get("obstacle_detection")
+        self.height_estimator = None
+        if self.rs_env.get("auto_camera_height", False):
+            self.height_estimator = CameraHeightEstimator(
+                self.rs_env, self._set_camera_height
+            )
+
+        record = self.rs_env.get("record", "")
+        self.recorder = None
+        if record:
+            self.recorder = SessionRecorder(
+                record,
+                self.source,
+                depth=self.rs_env.get("record_depth", True),
+                color=self.rs_env.get("record_color", True),
+                color_decimation=self.rs_env.get("record_color_decimation", 1),
+            )
+
+        # 深度與彩度分開處理：wait_for_frames每一幀都回傳（包含只有深度的幀），
+        # 有彩度的幀另外交給wait_for_color_frames，在另一個執行緒以彩度的fps處理
+        self.split_streams = self.rs_env.get("split_streams", False)
+        self.color_condition = threading.Condition()
+        self.color_frames = None
+        self.color_count = 0  # 收到的彩度幀數
+        self.color_delivered = 0  # 已交給wait_for_color_frames的彩度幀數
+
+        # 上一次取得幀之後的IMU樣本（使用背景讀取時包含被丟棄的幀）
+        self.imu_samples = []
+        self.capture = None
+        if self.rs_env.get("capture_thread", False):
+            self.capture = LatestFrameCapture(self._read_frames)
+            self.capture.start()
 
     @property
     def motion(self):
@@ -57,18 +115,181 @@ class RealsenseCamera:
     def motion_radians(self):
         return math.radians(self.pitch), math.radians(self.yaw), math.radians(self.roll)
 
-    def __exit__(self):
+    def _read_frames(self, timeout_ms: int):
+        frames = self.source.wait_for_frames(timeout_ms)
+        if self.recorder is not None:
+            self.recorder.write(frames)
+        return frames
+
+    def wait_for_frames(self, timeout_ms: int = 5000):
+        """
+        從幀來源取得下一幀（有設定錄製時同時錄製原始的幀，再進行深度後處理）
+        使用背景讀取時回傳最新的一組幀，處理不及的舊幀會被丟棄
+        :param timeout_ms: 等待時間（毫秒）
+        """
+        if self.capture is not None:
+            frames, self.imu_samples = self.capture.get(timeout_ms)
+        else:
+            frames = self._read_frames(timeout_ms)
+            sample = imu_sample(frames)
+            self.imu_samples = [sample] if sample is not None else []
+
+        # 幀來源沒有以原生頻率回傳IMU資料時（回放），依序融合幀中的IMU資料
+        if self.orientation is not None and not self.source.native_imu:
+            for timestamp, accel, gyro in self.imu_samples:
+                self.orientation.update(timestamp, accel, gyro)
+
+        depth_frame = frames.get_depth_frame()
+        if self.depth_filter.enabled and depth_frame:
+            depth_image = self.depth_filter(np.asanyarray(depth_frame.get_data()))
+            frames = ReplacedFrameset(
+                frames,
+                {
+                    0: RecordedFrame(
+                        depth_image, frames.get_timestamp(), frames.get_frame_number()
+                    )
+                },
+            )
+
+        if self.split_streams:
+            self._publish_color_frames(frames)
+        elif self.aligner is not None:
+            self.aligned_depth = self._align(frames)
+        return frames
+
+    def _align(self, frames):
+        depth_frame = frames.get_depth_frame()
+        if not depth_frame:
+            return None
+        return self.aligner(np.asanyarray(depth_frame.get_data()))
+
+    def _publish_color_frames(self, frames):
+        """
+        保存最新一組有彩度的幀，並喚醒等待彩度幀的執行緒
+        """
+        if not frames.get_color_frame():
+            return
+        # 幀離開wait_for_frames之後還會在另一個執行緒使用，需要保留幀的記憶體
+        frames.keep()
+        with self.color_condition:
+            self.color_frames = frames
+            self.color_count += 1
+            self.color_condition.notify_all()
+
+    def wait_for_color_frames(self, timeout_ms: int = 5000):
+        """
+        深度與彩度分開處理時，取得最新一組有彩度的幀（包含同時取得的深度幀）
+        處理不及時只會拿到最新的一組，需要另一個執行緒持續呼叫wait_for_frames
+        :param timeout_ms: 等待時間（毫秒）
+        """
+        with self.color_condition:
+            if not self.color_condition.wait_for(
+                lambda: self.color_count > self.color_delivered, timeout_ms / 1000
+            ):
+                raise RuntimeError(f"Color frame didn't arrive within {timeout_ms}")
+            frames = self.color_frames
+            self.color_delivered = self.color_count
+
+        # 只有彩度的執行緒使用對齊後的深度圖片，深度的迴圈不需要花時間對齊
+        if self.aligner is not None:
+            self.aligned_depth = self._align(frames)
+        return frames
+
+    def color_depth_image(self, depth_image: np.ndarray) -> np.ndarray:
+        """
+        以彩度座標查詢深度時使用的深度圖片（有開啟對齊時為這一幀對齊後的深度圖片，
+        視野與彩度圖片相同，依圖片大小等比例換算座標即可）
+        :param depth_image: 這一幀的深度圖片
+        """
+        if self.aligned_depth is not None:
+            return self.aligned_depth
+        return depth_image
+
+    @property
+    def dropped_frames(self):
+        """
+        背景讀取時沒有被處理就被丟棄的幀數
+        """
+        return self.capture.dropped if self.capture is not None else 0
+
+    def pause(self):
+        """
+        暫停取幀，攝影機與姿態估計保持運作，恢復時不需要重新啟動攝影機
+        """
+        if self.capture is not None:
+            self.capture.pause()
+        self.source.pause()
+        if RealsenseCamera.instance is self:
+            RealsenseCamera.instance = None
+
+    def resume(self):
+        """
+        恢復取幀（暫停前的畫面不會再被處理）
+        """
+        RealsenseCamera.instance = self
+        self.source.resume()
+        self.depth_filter.reset()
+        with self.color_condition:
+            self.color_delivered = self.color_count
+        if self.capture is not None:
+            self.capture.resume()
+
+    def _load_calibration(self):
+        """
+        從幀來源取得相機參數，並重新建立使用相機參數的對應表與深度對齊
         """
-        停止深度攝影機
+        self.depth_scale = self.source.depth_scale
+        self.depth_intrin = self.depth_filter.intrinsics(self.source.depth_intrin)
+        self.color_intrin = self.source.color_intrin
+        self.depth_to_color_extrin = self.source.depth_to_color_extrin
+        self.color_to_depth_extrin = self.source.color_to_depth_extrin
+
+        self.correspondence = None
+
+        # 將每一幀的深度對齊到彩度圖片，彩度座標可以直接查詢深度
+        self.aligner = None
+        if self.rs_env.get("align_depth", False):
+            self.aligner = DepthAligner(
+                self.depth_scale,
+                self.depth_intrin,
+                self.color_intrin,
+                self.depth_to_color_extrin,
+                self.rs_env.get("align_decimation", 0),
+            )
+
+    def refresh_calibration(self):
+        """
+        攝影機重新校正（on-chip或tare校正）之後重新查詢相機參數，並更新相機參數快取
+        """
+        self.source.refresh_calibration()
+        self._load_calibration()
+
+    def stop(self):
+        """
+        停止深度攝影機（並結束錄製）
         """
-        self.pipeline.stop()
+        if self.capture is not None:
+            self.capture.running = False
+        self.source.stop()
+        if self.capture is not None:
+            self.capture.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.orientation is not None:
+            self.orientation.stop()
+
+    def __exit__(self):
+        self.stop()
 
     def combined_angle(self, frames):
         """
-        計算深度攝影機的姿態
+        計算深度攝影機的姿態（開啟IMU融合時以幀的時間戳記取得插值後的姿態）
         @param frames: 深度攝影機幀
         """
-        camera_motion = get_motion(frames)
+        if self.orientation is not None:
+            camera_motion = self.orientation.pose_at(frames.get_timestamp())
+        else:
+            camera_motion = self.motion_filter(frames)
         if camera_motion:
             self.pitch, self.yaw, self.roll = camera_motion
             return camera_motion
@@ -86,45 +307,131 @@ class RealsenseCamera:
         if not is_pixel_inside_image(depth_image, depth_pixel):
             return
 
-        # 從深度圖片中獲取深度
-        dist = depth_image[depth_pixel[1], depth_pixel[0]]
-        # 將彩度圖像素點轉換為深度像素點
-        depth_point = rs.rs2_deproject_pixel_to_point(
-            self.depth_intrin, depth_pixel, dist
+        heights, dists, lateral_dists, depth_points, _ = self.depth_pixels_to_height(
+            depth_image, [depth_pixel], base_height
+        )
+        return heights[0], int(dists[0]), int(lateral_dists[0]), depth_points[0]
+
+    def depth_pixels_to_height(
+        self,
+        depth_image: np.ndarray,
+        depth_pixels: np.ndarray,
+        base_height,
+        floor_plane: Tuple[np.ndarray, float] = None,
+    ):
+        """
+        批次計算多個深度像素點距離地板的高度（與depth_pixel_to_height相同的計算）
+        :param depth_image: 深度圖片
+        :param depth_pixels: 深度像素點 (N, 2)
+        :param base_height: 攝影機的基本高度
+        :param floor_plane: 地板平面 (normal, offset)，有提供時高度改為點到平面的有號距離
+        :return: 高度、水平距離、橫向距離、三維座標與是否在圖片內的遮罩
+        """
+        depth_pixels = np.asarray(depth_pixels, np.int32).reshape(-1, 2)
+        img_height, img_width = depth_image.shape[:2]
+
+        # 檢查像素是否在圖片內
+        valid = (
+            (depth_pixels[:, 0] >= 0)
+            & (depth_pixels[:, 0] < img_width)
+            & (depth_pixels[:, 1] >= 0)
+            & (depth_pixels[:, 1] < img_height)
+        )
+
+        # 從深度圖片中獲取深度（圖片外的點深度為0）
+        dist = np.zeros(len(depth_pixels), np.float64)
+        dist[valid] = depth_image[depth_pixels[valid, 1], depth_pixels[valid, 0]]
+
+        depth_points = deproject_depth_pixels(
+            self.depth_intrin, np.where(valid[:, None], depth_pixels, 0), dist
         )
+        depth_points_64 = depth_points.astype(np.float64)
 
         # 計算角度（俯仰角和偏航角）
-        elevation = np.arctan2(depth_point[1], depth_point[2])
-        azimuth = np.arctan2(depth_point[0], depth_point[2])
+        elevation = np.arctan2(depth_points_64[:, 1], depth_points_64[:, 2])
+        azimuth = np.arctan2(depth_points_64[:, 0], depth_points_64[:, 2])
         pitch_angle_radians = math.radians(self.pitch + 90) - elevation
 
-        # 距離計算攝影機到點的水平距離
-        horizontal_dist = dist * math.cos(pitch_angle_radians)
-
-        # 使用三角函數計算高低差
-        height = dist * math.sin(pitch_angle_radians) / 10 + base_height
-        # 計算橫向距離
-        lateral_distance = horizontal_dist * math.sin(azimuth)
+        horizontal_dist = dist * np.cos(pitch_angle_radians)
+        if floor_plane is None:
+            height = dist * np.sin(pitch_angle_radians) / 10 + base_height
+        else:
+            normal, offset = floor_plane
+            height = (depth_points_64 @ normal + offset) / 10
+        lateral_distance = horizontal_dist * np.sin(azimuth)
 
-        return height, int(abs(horizontal_dist)), int(lateral_distance), depth_point
+        return (
+            height,
+            np.abs(horizontal_dist).astype(np.int64),
+            lateral_distance.astype(np.int64),
+            depth_points,
+            valid,
+        )
 
     def project_color_pixel_to_depth_pixel(
         self, data: np.ndarray, from_pixel: Tuple[int, int]
     ):
-        depth_pixel = rs.rs2_project_color_pixel_to_depth_pixel(
-            data,
+        depth_pixel = project_color_pixel_to_depth_pixel(
+            np.asanyarray(data),
             self.depth_scale,
             self.rs_env["depth_min"],
             self.rs_env["depth_max"],
             self.depth_intrin,
             self.color_intrin,
-            self.depth_to_color_extrin,
             self.color_to_depth_extrin,
+            self.depth_to_color_extrin,
             from_pixel,
         )
 
-        if depth_pixel:
-            return int(depth_pixel[0]), int(depth_pixel[1])
+        return int(depth_pixel[0]), int(depth_pixel[1])
+
+    def project_color_pixels_to_depth_pixels(
+        self,
+        data: np.ndarray,
+        color_pixels: np.ndarray,
+        indices: np.ndarray = None,
+        new_frame: bool = True,
+    ) -> np.ndarray:
+        """
+        批次將彩度像素點投影到深度像素點（預設使用對應快取表）
+        :param data: 深度資料
+        :param color_pixels: 彩度像素點 (N, 2)
+        :param indices: 只投影部分像素點（預設為全部）
+        :param new_frame: 是否為這一幀的第一次投影（同一幀分多次投影時傳入False）
+        :return: 深度像素點 (len(indices), 2)，無法投影時為 (-1, -1)
+        """
+        def project(pixel):
+            return self.project_color_pixel_to_depth_pixel(data, pixel)
+
+        if not self.rs_env.get("correspondence_cache", True):
+            pixels = np.asarray(color_pixels)
+            if indices is not None:
+                pixels = pixels[indices]
+            return np.array(
+                [project(tuple(pixel)) for pixel in pixels.tolist()], np.int32
+            ).reshape(-1, 2)
+
+        key = ColorDepthCorrespondence.make_key(
+            self.rs_env,
+            self.depth_scale,
+            self.depth_intrin,
+            self.color_intrin,
+            self.color_to_depth_extrin,
+        )
+        if self.correspondence is None or not self.correspondence.is_valid_for(
+            key, color_pixels
+        ):
+            self.correspondence = ColorDepthCorrespondence(
+                self.rs_env,
+                self.depth_scale,
+                self.depth_intrin,
+                self.color_intrin,
+                self.color_to_depth_extrin,
+                self.depth_to_color_extrin,
+                color_pixels,
+            )
+
+        return self.correspondence(np.asanyarray(data), project, indices, new_frame)
 
     def draw_motion(self, image):
         return draw_motion(image, self.pitch, self.yaw, self.roll)
@@ -141,10 +448,7 @@ class RealsenseCamera:
         # 使用攝影機姿態將相對座標轉換為世界座標
         world_point = np.dot(get_rotation_matrix(self.motion_radians), world_point)
         # 將世界座標轉換為畫面像素座標
-        pixel = rs.rs2_project_point_to_pixel(
-            self.depth_intrin,
-            world_point,
-        )
+        pixel = project_points(self.depth_intrin, world_point)
 
         # 檢查世界座標是否為有效的數字
         if math.isnan(pixel[0]) or math.isnan(pixel[1]):
@@ -173,5 +477,21 @@ class RealsenseCamera:
             return pixel, camera_height
         return None, None
 
+    def update_camera_height(self, depth_frame):
+        """
+        以目前的姿態持續更新攝影機高度（需要先呼叫combined_angle）
+        :param depth_frame: 深度幀
+        :return: 有更新時回傳新的攝影機高度（公分）
+        """
+        if self.height_estimator is None or not depth_frame:
+            return None
+        return self.height_estimator(
+            np.asanyarray(depth_frame.get_data()), self.depth_intrin, self.pitch
+        )
+
+    def _set_camera_height(self, camera_height: int):
+        if self.od_env is not None:
+            self.od_env["camera_height"] = camera_height
+
     def draw_bottom_point(self, image, bottom_point):
         return cv2.circle(image, bottom_point, 10, (255, 255, 255), -1)
@@ -0,0 +1,188 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+SESSION_META = "session.json"
+SESSION_INDEX = "index.bin"
+SESSION_VERSION = 2
+
+# 每一幀在索引檔中的紀錄（IMU資料直接存在索引中）
+INDEX_DTYPE = np.dtype(
+    [
+        ("timestamp", np.float64),
+        ("frame_number", np.int64),
+        ("accel", np.float32, 3),
+        ("gyro", np.float32, 3),
+    ]
+)
+
+
+def _chunk_path(directory: str, stream: str, chunk: int) -> str:
+    return os.path.join(directory, f"{stream}_{chunk:05d}.bin")
+
+
+class SessionWriter:
+    def __init__(
+        self,
+        directory: str,
+        meta: dict,
+        chunk_size: int = 300,
+        depth: bool = True,
+        color: bool = True,
+        color_decimation: int = 1,
+    ):
+        """
+        將幀寫入分段的記憶體映射檔（每個串流每chunk_size幀一個檔案）與幀索引
+        :param directory: 錄製資料的資料夾
+        :param meta: 相機參數等額外資訊（寫入session.json）
+        :param chunk_size: 每個分段檔案的幀數
+        :param depth: 錄製深度
+        :param color: 錄製彩度
+        :param color_decimation: 彩度每隔幾個像素取一個（降低寫入量）
+        """
+        self.directory = directory
+        self.meta = dict(meta)
+        self.chunk_size = chunk_size
+        self.color_decimation = color_decimation
+        self.streams = [
+            stream for stream, enabled in (("depth", depth), ("color", color)) if enabled
+        ]
+
+        os.makedirs(directory, exist_ok=True)
+        self.index_file = open(os.path.join(directory, SESSION_INDEX), "wb")
+        self.chunks = {}
+        self.count = 0
+
+    def write(
+        self,
+        timestamp: float,
+        frame_number: int,
+        accel,
+        gyro,
+        depth: Optional[np.ndarray] = None,
+        color: Optional[np.ndarray] = None,
+    ):
+        """
+        寫入一幀
+        :param timestamp: 時間戳記（毫秒）
+        :param frame_number: 幀編號
+        :param accel: 加速度儀 (x, y, z)
+        :param gyro: 陀螺儀 (x, y, z)
+        :param depth: 深度圖片
+        :param color: 彩度圖片
+        """
+        images = {"depth": depth, "color": color}
+        if "color" in self.streams and self.color_decimation > 1:
+            images["color"] = color[:: self.color_decimation, :: self.color_decimation]
+
+        if self.count == 0:
+            self._write_meta(images)
+
+        chunk, slot = divmod(self.count, self.chunk_size)
+        for stream in self.streams:
+            if slot == 0:
+                self._open_chunk(stream, chunk, images[stream])
+            self.chunks[stream][slot] = images[stream]
+
+        entry = np.zeros(1, INDEX_DTYPE)
+        entry["timestamp"] = timestamp
+        entry["frame_number"] = frame_number
+        entry["accel"] = accel
+        entry["gyro"] = gyro
+        self.index_file.write(entry.tobytes())
+        self.count += 1
+
+    def _write_meta(self, images):
+        self.meta["version"] = SESSION_VERSION
+        self.meta["chunk_size"] = self.chunk_size
+        self.meta["color_decimation"] = self.color_decimation
+        self.meta["streams"] = {
+            stream: {"shape": list(images[stream].shape), "dtype": images[stream].dtype.str}
+            for stream in self.streams
+        }
+        with open(os.path.join(self.directory, SESSION_META), "w", encoding="utf-8") as file:
+            json.dump(self.meta, file, indent=2)
+
+    def _open_chunk(self, stream: str, chunk: int, image: np.ndarray):
+        previous = self.chunks.get(stream)
+        if previous is not None:
+            previous.flush()
+        self.chunks[stream] = np.memmap(
+            _chunk_path(self.directory, stream, chunk),
+            image.dtype,
+            "w+",
+            shape=(self.chunk_size, *image.shape),
+        )
+
+    def close(self):
+        """
+        結束錄製（最後一個分段檔案會截短到實際的幀數）
+        """
+        if self.index_file.closed:
+            return
+        self.index_file.close()
+
+        files = []
+        for chunk in self.chunks.values():
+            chunk.flush()
+            files.append((chunk.filename, chunk[0].nbytes))
+        # 釋放記憶體映射後才能截短檔案
+        chunk = None
+        self.chunks = {}
+
+        used = self.count % self.chunk_size
+        if used:
+            for path, frame_bytes in files:
+                os.truncate(path, used * frame_bytes)
+
+
+class SessionReader:
+    def __init__(self, directory: str):
+        """
+        讀取SessionWriter錄製的資料，影像為記憶體映射檔的view（不會複製資料）
+        :param directory: 錄製資料的資料夾
+        """
+        self.directory = directory
+        with open(os.path.join(directory, SESSION_META), encoding="utf-8") as file:
+            self.meta = json.load(file)
+
+        if self.meta.get("version") != SESSION_VERSION:
+            raise ValueError(f"不支援的錄製資料版本: {self.meta.get('version')}")
+
+        self.index = np.fromfile(os.path.join(directory, SESSION_INDEX), INDEX_DTYPE)
+        self.chunk_size = self.meta["chunk_size"]
+        self.streams = {
+            stream: (tuple(info["shape"]), np.dtype(info["dtype"]))
+            for stream, info in self.meta["streams"].items()
+        }
+        # 每個串流只保留目前與上一個分段的記憶體映射（已回傳的影像仍然有效）
+        self.chunks = {stream: {} for stream in self.streams}
+
+    def __len__(self):
+        return len(self.index)
+
+    def has_stream(self, stream: str) -> bool:
+        return stream in self.streams
+
+    def image(self, stream: str, index: int) -> Optional[np.ndarray]:
+        """
+        取得某一幀的影像（O(1)，沒有錄製此串流時回傳None）
+        """
+        if stream not in self.streams:
+            return None
+        chunk, slot = divmod(index, self.chunk_size)
+        chunks = self.chunks[stream]
+        data = chunks.pop(chunk, None)
+        if data is None:
+            shape, dtype = self.streams[stream]
+            # 寫入時複製，呼叫端可以在影像上繪圖而不會修改檔案
+            data = np.memmap(
+                _chunk_path(self.directory, stream, chunk), dtype, "c"
+            ).reshape(-1, *shape)
+        # 最近使用的分段放在最後，超過兩個時釋放最舊的分段
+        chunks[chunk] = data
+        if len(chunks) > 2:
+            del chunks[next(iter(chunks))]
+        return data[slot]
@@ -3,16 +3,36 @@ import random
 from typing import Tuple
 
 import numpy as np
-import pyrealsense2 as rs
 
+try:
+    import pyrealsense2 as rs
+except ImportError:  # 回放錄製資料時不需要RealSense SDK
+    rs = None
 
-def default_setting(file=None):
+from src.core.realsense_camera.camera_model import CameraIntrinsics, CameraExtrinsics
+
+
+def default_setting(file=None, rs_env=None):
+    """
+    深度攝影機設置
+    :param file: 回放的.bag檔
+    :param rs_env: 深度攝影機設定（depth_profile與color_profile為 [寬, 高, fps]）
+    """
+    rs_env = rs_env or {}
     config = rs.config()
     if file:
         config.enable_device_from_file(file, repeat_playback=True)
     else:
-        config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 15)
-        config.enable_stream(rs.stream.color, 1280, 720, rs.format.bgr8, 15)
+        depth_width, depth_height, depth_fps = rs_env.get("depth_profile", [640, 480, 15])
+        color_width, color_height, color_fps = rs_env.get(
+            "color_profile", [1280, 720, 15]
+        )
+        config.enable_stream(
+            rs.stream.depth, depth_width, depth_height, rs.format.z16, depth_fps
+        )
+        config.enable_stream(
+            rs.stream.color, color_width, color_height, rs.format.bgr8, color_fps
+        )
         config.enable_stream(rs.stream.accel)
         config.enable_stream(rs.stream.gyro)
     return config
@@ -35,7 +55,12 @@ def intrin_and_extrin(profile: any):
         .as_video_stream_profile()
         .get_extrinsics_to(profile.get_stream(rs.stream.depth))
     )
-    return depth_intrin, color_intrin, depth_to_color_extrin, color_to_depth_extrin
+    return (
+        CameraIntrinsics.from_rs(depth_intrin),
+        CameraIntrinsics.from_rs(color_intrin),
+        CameraExtrinsics.from_rs(depth_to_color_extrin),
+        CameraExtrinsics.from_rs(color_to_depth_extrin),
+    )
 
 
 def is_pixel_inside_image(image: np.ndarray, pixel: Tuple[int, int]) -> bool:
@@ -81,6 +106,10 @@ def get_rotation_matrix(motion_radians: (int, int, int)):
 def project_color_pixel_to_depth_pixel(
     depth_data: np.ndarray, color_data: np.ndarray, color_pixel: Tuple[int, int]
 ):
+    """
+    依圖片大小等比例換算像素座標
+    （只有深度圖片已對齊到彩度圖片時才準確，見RealsenseCamera.color_depth_image）
+    """
     depth_shape, color_shape = depth_data.shape[:2], color_data.shape[:2]
     w, h = depth_shape[1] / color_shape[1], depth_shape[0] / color_shape[0]
     return int(color_pixel[0] * w), int(color_pixel[1] * h)
@@ -93,13 +122,13 @@ def get_middle_dist(image: np.ndarray, box, depth_data, rand_num):
 
     for i in range(rand_num):
         bias = random.randint(-min_val // 4, min_val // 4)
-        color_pixel = mid_pos[1] + bias, mid_pos[0] + bias
+        color_pixel = mid_pos[0] + bias, mid_pos[1] + bias
         depth_pixel = project_color_pixel_to_depth_pixel(depth_data, image, color_pixel)
 
         if not is_pixel_inside_image(depth_data, depth_pixel):
             continue
 
-        dist = depth_data[depth_pixel]
+        dist = depth_data[depth_pixel[1], depth_pixel[0]]
 
         if dist:
             distance_list.append(dist)
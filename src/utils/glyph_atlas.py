@@ -0,0 +1,387 @@
+import os
+import string
+from collections import OrderedDict
+from typing import Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# 繪製中文字使用的字型（依序尋找第一個存在的檔案）
+CJK_FONT_PATHS = [
+    "C:/Windows/Fonts/msjh.ttc",
+    "C:/Windows/Fonts/mingliu.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",
+    "/System/Library/Fonts/PingFang.ttc",
+]
+
+
+def find_cjk_font():
+    for path in CJK_FONT_PATHS:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+class Glyph:
+    def __init__(self, mask: np.ndarray, advance: float, left: int, top: int):
+        """
+        單一字元的遮罩
+        :param mask: 字元遮罩（0-255）
+        :param advance: 字元寬度（下一個字元的起點）
+        :param left: 遮罩左上角相對於字元起點的x偏移
+        :param top: 遮罩左上角相對於基線的y偏移
+        """
+        self.mask = mask
+        self.advance = advance
+        self.left = left
+        self.top = top
+
+
+class Label:
+    def __init__(self, mask: np.ndarray, left: int, top: int, size: Tuple[int, int]):
+        """
+        組合好的文字遮罩
+        :param mask: 文字遮罩（0-255）
+        :param left: 遮罩左上角相對於文字起點的x偏移
+        :param top: 遮罩左上角相對於基線的y偏移
+        :param size: 與cv2.getTextSize相同的文字大小 (寬, 高)
+        """
+        self.mask = mask
+        self.left = left
+        self.top = top
+        self.size = size
+        self.binary = bool(np.all((mask == 0) | (mask == 255)))
+
+        # 有筆畫的像素相對於文字起點的座標，批次繪製時使用
+        ys, xs = np.nonzero(mask)
+        self.ys = (ys + top).astype(np.int32)
+        self.xs = (xs + left).astype(np.int32)
+
+
+class GlyphAtlas:
+    # 字型大小由圖片大小決定，圖片大小不固定時只保留最近使用的圖集
+    atlases = OrderedDict()
+    max_atlases = 8
+    cjk_font_path = None  # 指定中文字型，未指定時自動尋找
+    max_labels = 2048
+
+    @classmethod
+    def get(
+        cls,
+        font_scale: float,
+        thickness: int = 1,
+        font_face: int = cv2.FONT_HERSHEY_SIMPLEX,
+        line_type: int = cv2.LINE_8,
+    ):
+        """
+        取得指定字型大小的字元圖集（最近使用的設定會被快取）
+        """
+        key = (round(font_scale, 4), thickness, font_face, line_type)
+        atlas = cls.atlases.get(key)
+        if atlas is not None:
+            cls.atlases.move_to_end(key)
+            return atlas
+
+        atlas = cls.atlases[key] = cls(font_scale, thickness, font_face, line_type)
+        if len(cls.atlases) > cls.max_atlases:
+            cls.atlases.popitem(last=False)
+        return atlas
+
+    def __init__(
+        self,
+        font_scale: float,
+        thickness: int = 1,
+        font_face: int = cv2.FONT_HERSHEY_SIMPLEX,
+        line_type: int = cv2.LINE_8,
+    ):
+        """
+        預先繪製字元遮罩，繪製文字時只需要用陣列切片貼上
+        ASCII字元使用cv2.putText繪製，其他字元（中文）使用PIL與中文字型繪製
+        :param font_scale: 字型大小
+        :param thickness: 線條粗細
+        :param font_face: cv2字型
+        :param line_type: cv2線條類型
+        """
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self.font_face = font_face
+        self.line_type = line_type
+
+        (_, self.text_height), self.baseline = cv2.getTextSize(
+            "0", font_face, font_scale, thickness
+        )
+        self.padding = max(thickness, 1) + 2
+
+        self.glyphs = {}
+        self.labels = OrderedDict()
+        self.cjk_font = None
+
+        for char in string.printable[:95]:
+            self.glyphs[char] = self._render_ascii(char)
+
+        (width, _), _ = cv2.getTextSize("0", font_face, font_scale, thickness)
+        self.extra_width = width - int(round(self.glyphs["0"].advance))
+
+        # ASCII字元的寬度與筆畫像素座標表，批次繪製時以字元編碼查表
+        # （每個字元的像素補齊到相同長度，所有字元可以一次計算）
+        self.advances = np.zeros(128)
+        pixels = {}
+        for char, glyph in self.glyphs.items():
+            ys, xs = np.nonzero(glyph.mask)
+            self.advances[ord(char)] = glyph.advance
+            pixels[ord(char)] = (ys + glyph.top, xs + glyph.left)
+        length = max(len(ys) for ys, _ in pixels.values())
+        self.glyph_ys = np.zeros((128, length), np.int32)
+        self.glyph_xs = np.zeros((128, length), np.int32)
+        self.glyph_mask = np.zeros((128, length), bool)
+        for code, (ys, xs) in pixels.items():
+            self.glyph_ys[code, : len(ys)] = ys
+            self.glyph_xs[code, : len(xs)] = xs
+            self.glyph_mask[code, : len(ys)] = True
+
+    def _render_ascii(self, char: str) -> Glyph:
+        (width, _), _ = cv2.getTextSize(char, self.font_face, self.font_scale, self.thickness)
+        (repeated, _), _ = cv2.getTextSize(
+            char * 16, self.font_face, self.font_scale, self.thickness
+        )
+        advance = (repeated - width) / 15
+
+        pad = self.padding
+        top = self.text_height + pad
+        mask = np.zeros((top + self.baseline + pad, width + pad * 2), np.uint8)
+        cv2.putText(
+            mask,
+            char,
+            (pad, top),
+            self.font_face,
+            self.font_scale,
+            255,
+            self.thickness,
+            self.line_type,
+        )
+        if self.line_type != cv2.LINE_AA:
+            mask = np.where(mask >= 128, 255, 0).astype(np.uint8)
+        return Glyph(mask, advance, -pad, -top)
+
+    def _render_cjk(self, char: str) -> Glyph:
+        if self.cjk_font is None:
+            path = GlyphAtlas.cjk_font_path or find_cjk_font()
+            if path is None:
+                return self.glyphs["?"]
+            # 中文字的高度與cv2字型的大寫字母高度相近
+            self.cjk_font = ImageFont.truetype(path, max(int(self.text_height * 1.25), 1))
+
+        pad = self.padding
+        left, top, right, bottom = self.cjk_font.getbbox(char, anchor="ls")
+        image = Image.new("L", (right - left + pad * 2, bottom - top + pad * 2), 0)
+        ImageDraw.Draw(image).text(
+            (pad - left, pad - top), char, fill=255, font=self.cjk_font, anchor="ls"
+        )
+        return Glyph(
+            np.asarray(image), self.cjk_font.getlength(char), left - pad, top - pad
+        )
+
+    def glyph(self, char: str) -> Glyph:
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            glyph = self.glyphs[char] = self._render_cjk(char)
+        return glyph
+
+    def label(self, text: str) -> Label:
+        """
+        取得組合好的文字遮罩（最近使用的文字會被快取）
+        """
+        label = self.labels.get(text)
+        if label is not None:
+            self.labels.move_to_end(text)
+            return label
+
+        glyphs = [self.glyph(char) for char in text]
+        offsets = np.concatenate(([0], np.cumsum([g.advance for g in glyphs])))
+        starts = np.round(offsets[:-1]).astype(int)
+
+        if glyphs:
+            left = min(start + g.left for start, g in zip(starts, glyphs))
+            top = min(g.top for g in glyphs)
+            right = max(start + g.left + g.mask.shape[1] for start, g in zip(starts, glyphs))
+            bottom = max(g.top + g.mask.shape[0] for g in glyphs)
+        else:
+            left = top = right = bottom = 0
+
+        mask = np.zeros((bottom - top, right - left), np.uint8)
+        for start, g in zip(starts, glyphs):
+            x, y = start + g.left - left, g.top - top
+            region = mask[y : y + g.mask.shape[0], x : x + g.mask.shape[1]]
+            np.maximum(region, g.mask, out=region)
+
+        # 寬度與cv2.getTextSize相近（字元寬度總和加上線條粗細）
+        width = int(round(offsets[-1])) + self.extra_width if glyphs else 0
+        label = Label(mask, left, top, (width, self.text_height))
+
+        self.labels[text] = label
+        if len(self.labels) > self.max_labels:
+            self.labels.popitem(last=False)
+        return label
+
+    def text_size(self, text: str) -> Tuple[int, int]:
+        """
+        文字大小（與cv2.getTextSize的回傳值相同格式，不含基線）
+        """
+        if text.isascii():
+            return cv2.getTextSize(
+                text, self.font_face, self.font_scale, self.thickness
+            )[0]
+        return self.label(text).size
+
+    def put_text(
+        self,
+        image: np.ndarray,
+        text: str,
+        org: Tuple[int, int],
+        color: Tuple[int, ...],
+    ) -> np.ndarray:
+        """
+        將文字貼到圖片上（與cv2.putText相同，org為文字左下角的基線位置）
+        單一ASCII文字直接使用cv2.putText（比組合遮罩快），圖集只用來繪製中文等其他字元
+        :param image: 圖片
+        :param text: 文字
+        :param org: 文字起點
+        :param color: 顏色
+        :return: 圖片
+        """
+        if text.isascii():
+            return cv2.putText(
+                image,
+                text,
+                (int(org[0]), int(org[1])),
+                self.font_face,
+                self.font_scale,
+                color,
+                self.thickness,
+                self.line_type,
+            )
+
+        label = self.label(text)
+        height, width = image.shape[:2]
+        x, y = int(org[0]) + label.left, int(org[1]) + label.top
+        mask_height, mask_width = label.mask.shape
+
+        # 裁切超出圖片的部分
+        x1, y1 = max(x, 0), max(y, 0)
+        x2, y2 = min(x + mask_width, width), min(y + mask_height, height)
+        if x1 >= x2 or y1 >= y2:
+            return image
+
+        mask = label.mask[y1 - y : y2 - y, x1 - x : x2 - x]
+        region = image[y1:y2, x1:x2]
+        color = np.asarray(color, np.float32)[: image.shape[2] if image.ndim == 3 else 1]
+
+        if label.binary:
+            if image.ndim == 3:
+                region[mask > 0] = color
+            else:
+                region[mask > 0] = color[0]
+        else:
+            alpha = mask.astype(np.float32) / 255
+            if image.ndim == 3:
+                alpha = alpha[..., None]
+            else:
+                color = color[0]
+            region[:] = region * (1 - alpha) + color * alpha + 0.5
+        return image
+
+    def _layout(self, texts):
+        """
+        計算每個字元在所屬文字中的起點
+        :return: 字元編碼、每個字元屬於第幾個文字、字元起點與每個文字的寬度
+        """
+        lengths = np.fromiter(map(len, texts), np.int64, len(texts))
+        codes = np.frombuffer("".join(texts).encode("ascii"), np.uint8)
+        text_index = np.repeat(np.arange(len(texts)), lengths)
+
+        advances = self.advances[codes]
+        ends = np.cumsum(advances)
+        firsts = np.cumsum(lengths) - lengths
+        text_starts = np.concatenate(([0], ends))[firsts]
+        starts = np.round(ends - advances - text_starts[text_index]).astype(np.int32)
+
+        totals = np.concatenate(([0], ends))[firsts + lengths] - text_starts
+        widths = np.where(lengths > 0, np.round(totals) + self.extra_width, 0)
+        return codes, text_index, starts, widths.astype(np.int32)
+
+    def _is_batchable(self, texts) -> bool:
+        return self.line_type != cv2.LINE_AA and "".join(texts).isascii()
+
+    def text_sizes(self, texts) -> np.ndarray:
+        """
+        一次計算多個文字的大小
+        :return: (N, 2) 的寬與高
+        """
+        if self._is_batchable(texts):
+            widths = self._layout(texts)[3]
+        else:
+            widths = np.array([self.text_size(text)[0] for text in texts], np.int32)
+        return np.stack((widths, np.full(len(texts), self.text_height, np.int32)), axis=-1)
+
+    def put_texts(
+        self,
+        image: np.ndarray,
+        texts,
+        orgs: np.ndarray,
+        colors,
+    ) -> np.ndarray:
+        """
+        一次將多個文字貼到圖片上
+        ASCII文字直接以字元查表，所有字元的像素一次寫入，不需要逐一處理每個文字
+        :param image: 圖片
+        :param texts: 文字
+        :param orgs: 每個文字的起點 (N, 2)，與cv2.putText相同為左下角的基線位置
+        :param colors: 顏色，可以是單一顏色或每個文字各自的顏色 (N, 3)
+        :return: 圖片
+        """
+        if len(texts) == 0:
+            return image
+
+        orgs = np.asarray(orgs, np.int32).reshape(-1, 2)
+        colors = np.asarray(colors, image.dtype)
+        uniform = colors.ndim == 1
+        if uniform:
+            colors = np.broadcast_to(colors, (len(texts), len(colors)))
+
+        # 抗鋸齒或中文字需要逐一繪製
+        if not self._is_batchable(texts):
+            for text, org, color in zip(texts, orgs.tolist(), colors.tolist()):
+                self.put_text(image, text, org, color)
+            return image
+
+        codes, text_index, starts, _ = self._layout(texts)
+        height, width = image.shape[:2]
+        xs = (orgs[text_index, 0] + starts)[:, None] + self.glyph_xs[codes]
+        ys = orgs[text_index, 1][:, None] + self.glyph_ys[codes]
+        inside = (
+            self.glyph_mask[codes] & (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        )
+        xs, ys = xs[inside], ys[inside]
+        if uniform:
+            pixel_colors = colors[0]
+        else:
+            pixel_colors = np.broadcast_to(
+                colors[text_index][:, None], (*inside.shape, colors.shape[1])
+            )[inside]
+
+        if not image.flags.c_contiguous:
+            image[ys, xs] = pixel_colors
+            return image
+
+        # 每個像素視為一個值寫入（一次寫入所有通道，比逐列寫入快）
+        pixels = image.reshape(height * width, -1)
+        pixel_dtype = np.dtype((np.void, pixels.shape[1] * pixels.itemsize))
+        pixel_colors = np.ascontiguousarray(pixel_colors, image.dtype)
+        pixels.view(pixel_dtype)[ys * width + xs, 0] = pixel_colors.view(
+            pixel_dtype
+        ).reshape(-1)
+        return image